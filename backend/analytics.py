@@ -0,0 +1,202 @@
+"""Support SLA analytics: reply, resolution and backlog-age percentiles.
+
+The ticket and reply timestamps for a window are copied out of Postgres in
+bulk (``COPY ... TO STDOUT`` as CSV, parsed by pandas) and every metric is
+computed on whole columns: first replies with one group-by minimum,
+durations as array arithmetic, percentiles with a grouped quantile per
+(company, priority). Nothing loops over rows in Python.
+
+Windows end on an ``ANALYTICS_BUCKET_SECONDS`` boundary, so all requests in
+the same bucket share one cached result; concurrent requests for an
+uncached bucket wait on the same computation.
+"""
+import asyncio
+import importlib.util
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, Query
+from starlette.concurrency import run_in_threadpool
+
+import db
+from auth import require_admin
+
+ANALYTICS_BUCKET_SECONDS = int(os.environ.get("ANALYTICS_BUCKET_SECONDS", "300"))
+ANALYTICS_MAX_DAYS = int(os.environ.get("ANALYTICS_MAX_DAYS", "365"))
+# pyarrow's multithreaded CSV reader parses the COPY output several times faster
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") else "c"
+PERCENTILES = (0.5, 0.9, 0.95)
+METRICS = ("first_reply_hours", "resolution_hours", "backlog_age_hours")
+
+# Both queries number the window's tickets by id, so replies arrive already
+# pointing at their ticket's row instead of carrying a uuid to match in Python
+TICKETS_QUERY = """
+    SELECT company_id, priority,
+           extract(epoch FROM created_at),
+           extract(epoch FROM coalesce(resolved_at, closed_at)),
+           coalesce(status IN ('resolved', 'closed'), false)
+    FROM support_tickets
+    WHERE created_at >= to_timestamp($1) AND created_at < to_timestamp($2)
+    ORDER BY id
+"""
+# Only public replies from someone other than the requester count as a response
+REPLIES_QUERY = """
+    WITH window_tickets AS (
+        SELECT id, created_by, row_number() OVER (ORDER BY id) - 1 AS position
+        FROM support_tickets
+        WHERE created_at >= to_timestamp($1) AND created_at < to_timestamp($2)
+    )
+    SELECT t.position, extract(epoch FROM r.created_at)
+    FROM ticket_replies r
+    JOIN window_tickets t ON t.id = r.ticket_id
+    WHERE NOT coalesce(r.is_internal, false) AND r.created_by <> t.created_by
+"""
+
+router = APIRouter(prefix="/api/admin/analytics", dependencies=[Depends(require_admin)])
+
+
+def compute_sla(tickets: pd.DataFrame, reply_ticket: np.ndarray, reply_at: np.ndarray, now: float) -> list:
+    """Percentiles per (company, priority) plus an overall row.
+
+    ``tickets`` has ``company_id``, ``priority``, ``created_at``, ``done_at``
+    (epoch seconds, NaN while unresolved) and ``closed`` columns.
+    ``reply_ticket`` holds each reply's row position in ``tickets``.
+    """
+    created = tickets["created_at"].to_numpy(dtype=np.float64)
+    closed = tickets["closed"].to_numpy(dtype=bool)
+
+    first_reply = np.full(len(tickets), np.nan)
+    if len(reply_ticket):
+        earliest = pd.Series(reply_at).groupby(reply_ticket, sort=False).min()
+        first_reply[earliest.index.to_numpy()] = earliest.to_numpy()
+
+    hours = pd.DataFrame(
+        {
+            "company_id": tickets["company_id"].fillna(""),
+            "priority": tickets["priority"].fillna("medium"),
+            "first_reply_hours": (first_reply - created) / 3600,
+            "resolution_hours": np.where(closed, tickets["done_at"].to_numpy(dtype=np.float64) - created, np.nan) / 3600,
+            "backlog_age_hours": np.where(closed, np.nan, now - created) / 3600,
+            "open": ~closed,
+        }
+    )
+
+    def summarize(groups) -> pd.DataFrame:
+        quantiles = groups[list(METRICS)].quantile(list(PERCENTILES)).unstack()
+        quantiles.columns = [f"{metric}:p{round(q * 100)}" for metric, q in quantiles.columns]
+        counts = groups.agg(tickets=("open", "size"), open=("open", "sum"))
+        return counts.join(quantiles)
+
+    per_group = summarize(hours.groupby(["company_id", "priority"], sort=True))
+    overall = summarize(hours.assign(company_id="*", priority="*").groupby(["company_id", "priority"]))
+    table = pd.concat([per_group, overall])
+
+    results = []
+    for (company_id, priority), row in zip(table.index, table.itertuples(index=False)):
+        values = dict(zip(table.columns, row))
+        entry = {
+            "company_id": company_id or None,
+            "priority": priority,
+            "tickets": int(values["tickets"]),
+            "open": int(values["open"]),
+        }
+        for metric in METRICS:
+            entry[metric] = {}
+            for q in PERCENTILES:
+                value = values[f"{metric}:p{round(q * 100)}"]
+                entry[metric][f"p{round(q * 100)}"] = None if np.isnan(value) else round(float(value), 2)
+        results.append(entry)
+    return results
+
+
+async def _copy_csv(conn, query: str, *args) -> io.BytesIO:
+    buffer = io.BytesIO()
+    await conn.copy_from_query(query, *args, output=buffer, format="csv")
+    buffer.seek(0)
+    return buffer
+
+
+def _read_csv(buffer: io.BytesIO, dtype: dict, **kwargs) -> pd.DataFrame:
+    if not buffer.getbuffer().nbytes:
+        return pd.DataFrame({name: pd.Series(dtype=kind) for name, kind in dtype.items()})
+    return pd.read_csv(buffer, names=list(dtype), dtype=dtype, engine=CSV_ENGINE, **kwargs)
+
+
+def _frames(tickets_csv: io.BytesIO, replies_csv: io.BytesIO):
+    tickets = _read_csv(
+        tickets_csv,
+        {"company_id": str, "priority": str, "created_at": np.float64, "done_at": np.float64, "closed": bool},
+        true_values=["t"],
+        false_values=["f"],
+    )
+    replies = _read_csv(replies_csv, {"position": np.int64, "created_at": np.float64})
+    return tickets, replies["position"].to_numpy(), replies["created_at"].to_numpy()
+
+
+async def load_and_compute(since: float, until: float) -> list:
+    pool = db.require_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            tickets_csv = await _copy_csv(conn, TICKETS_QUERY, since, until)
+            replies_csv = await _copy_csv(conn, REPLIES_QUERY, since, until)
+
+    def compute():
+        tickets, reply_ticket, reply_at = _frames(tickets_csv, replies_csv)
+        return compute_sla(tickets, reply_ticket, reply_at, until)
+
+    return await run_in_threadpool(compute)
+
+
+class SlaCache:
+    """Results per (lookback, bucket); entries from older buckets are dropped."""
+
+    def __init__(self, bucket_seconds: int = ANALYTICS_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self._results = {}
+
+    async def get(self, days: int, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        until = now - now % self.bucket_seconds
+        key = (days, until)
+        future = self._results.get(key)
+        if future is None:
+            for stale in [k for k in self._results if k[1] < until]:
+                del self._results[stale]
+            future = asyncio.ensure_future(load_and_compute(until - days * 86400, until))
+            self._results[key] = future
+            future.add_done_callback(lambda f: self._forget_failure(key, f))
+        groups = await asyncio.shield(future)
+        return {"window_start": until - days * 86400, "window_end": until, "groups": groups}
+
+    def _forget_failure(self, key, future) -> None:
+        # Failures are not cached; the next request retries
+        if future.cancelled() or future.exception() is not None:
+            self._results.pop(key, None)
+
+    def clear(self) -> None:
+        self._results.clear()
+
+
+sla_cache = SlaCache()
+
+
+@router.get("/sla")
+async def sla_metrics(
+    days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS),
+    company_id: str = Query(None),
+    priority: str = Query(None),
+):
+    """Time-to-first-reply, time-to-resolution and backlog-age percentiles in hours.
+
+    The row with company and priority ``*`` covers every ticket in the window.
+    """
+    result = await sla_cache.get(days)
+    groups = result["groups"]
+    if company_id is not None:
+        groups = [g for g in groups if g["company_id"] == company_id]
+    if priority is not None:
+        groups = [g for g in groups if g["priority"] == priority]
+    return {**result, "groups": groups}
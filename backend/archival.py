@@ -0,0 +1,99 @@
+"""Move long-closed tickets into the cold partitions.
+
+Tickets closed more than ``TICKET_ARCHIVE_AFTER_DAYS`` ago are flagged
+``archived`` in batches of ``TICKET_ARCHIVE_BATCH_SIZE``, one short
+transaction per batch, which moves them (and, through the cascading foreign
+keys, their replies and attachments) from the hot to the cold partitions.
+Each run also creates the monthly partitions for the coming months and drops
+ticket tombstones older than the sync endpoint's retention.
+
+Every worker runs the loop, but a session advisory lock lets only one of them
+archive at a time.
+"""
+import asyncio
+import logging
+import os
+from datetime import date
+
+import db
+from tickets import SYNC_TOMBSTONE_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+TICKET_ARCHIVE_ENABLED = os.environ.get("TICKET_ARCHIVE_ENABLED", "true").lower() == "true"
+TICKET_ARCHIVE_AFTER_DAYS = int(os.environ.get("TICKET_ARCHIVE_AFTER_DAYS", "90"))
+TICKET_ARCHIVE_BATCH_SIZE = int(os.environ.get("TICKET_ARCHIVE_BATCH_SIZE", "500"))
+TICKET_ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("TICKET_ARCHIVE_INTERVAL_SECONDS", "3600"))
+PARTITION_MONTHS_AHEAD = 3
+# Arbitrary application-wide key for pg_try_advisory_lock
+ARCHIVE_LOCK_KEY = 0x7A11A5
+
+ARCHIVE_BATCH_QUERY = """
+    UPDATE support_tickets SET archived = true, updated_at = CURRENT_TIMESTAMP
+    WHERE (id, archived, created_at) IN (
+        SELECT id, archived, created_at FROM support_tickets
+        WHERE NOT archived AND status = 'closed'
+          AND closed_at < CURRENT_TIMESTAMP - make_interval(days => $1)
+        ORDER BY closed_at
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+
+class TicketArchiver:
+    def __init__(self):
+        self.archived = 0
+        self._task = None
+
+    async def run_once(self) -> int:
+        """Archive every eligible ticket now; returns how many were moved, or 0 if another worker holds the lock."""
+        pool = db.get_pool()
+        if pool is None:
+            return 0
+        moved = 0
+        async with pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", ARCHIVE_LOCK_KEY):
+                return 0
+            try:
+                await conn.execute("SELECT ensure_ticket_partitions($1, $2)", date.today(), PARTITION_MONTHS_AHEAD)
+                await conn.execute(
+                    "DELETE FROM ticket_tombstones WHERE removed_at < CURRENT_TIMESTAMP - make_interval(days => $1)",
+                    SYNC_TOMBSTONE_RETENTION_DAYS,
+                )
+                while True:
+                    status = await conn.execute(ARCHIVE_BATCH_QUERY, TICKET_ARCHIVE_AFTER_DAYS, TICKET_ARCHIVE_BATCH_SIZE)
+                    count = int(status.split()[-1])
+                    moved += count
+                    if count < TICKET_ARCHIVE_BATCH_SIZE:
+                        break
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", ARCHIVE_LOCK_KEY)
+        self.archived += moved
+        if moved:
+            logger.info("Archived %d closed tickets", moved)
+        return moved
+
+    def start(self):
+        if TICKET_ARCHIVE_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ticket archival failed")
+            await asyncio.sleep(TICKET_ARCHIVE_INTERVAL_SECONDS)
+
+
+ticket_archiver = TicketArchiver()
@@ -0,0 +1,405 @@
+"""Least-loaded automatic ticket assignment.
+
+Support agents are the active admin profiles. An agent's load is the number
+of open, in-progress or pending tickets assigned to them, and ``agent_skills``
+lists the categories they take (none means any category).
+
+``LoadBalancer`` keeps min-heaps of ``(load, stamp, agent)``: one per
+category, one of the agents without skills and one of every agent. A load
+change pushes a fresh entry for the agent into each of its heaps and older
+entries are skipped when they reach the top, so picking the least-loaded skilled agent and recording the assignment are
+both O(log n). Among equally loaded agents the one whose load changed longest
+ago wins, which spreads bursts round-robin.
+
+``AssignmentEngine`` rebuilds that state from the database at startup and
+every ``ASSIGNMENT_REFRESH_SECONDS``, and between rebuilds follows the ticket
+events from ``realtime.ticket_event_hub``. With ``AUTO_ASSIGN_ENABLED`` it
+assigns every new unassigned ticket; with several workers each tries, and the
+conditional UPDATE lets exactly one of them win. Admins can also ask for a
+rebalancing pass that moves not-yet-started tickets from the busiest agents
+to the least busy ones that have the skill.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+
+import db
+from auth import require_admin
+from realtime import RESYNC, ticket_event_hub
+
+logger = logging.getLogger(__name__)
+
+AUTO_ASSIGN_ENABLED = os.environ.get("AUTO_ASSIGN_ENABLED", "false").lower() == "true"
+ASSIGNMENT_REFRESH_SECONDS = float(os.environ.get("ASSIGNMENT_REFRESH_SECONDS", "300"))
+ASSIGNMENT_MAX_REBALANCE_MOVES = 500
+OPEN_STATUSES = frozenset(("open", "in_progress", "pending"))
+# Only tickets nobody has started on are moved when rebalancing
+MOVABLE_STATUS = "open"
+
+# Heap keys besides the categories: every agent, and agents without skills
+ANY_CATEGORY = "*"
+GENERALISTS = ""
+
+
+class LoadBalancer:
+    """Per-agent load with O(log n) least-loaded selection by category."""
+
+    def __init__(self):
+        self.load = {}
+        self.skills = {}
+        self._stamp = {}
+        self._heaps = {}
+        self._members = {}
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.load)
+
+    def add_agent(self, agent: str, skills=(), load: int = 0):
+        if agent in self.load:
+            self.remove_agent(agent)
+        self.load[agent] = load
+        self.skills[agent] = frozenset(skills)
+        for category in self._categories(agent):
+            self._members[category] = self._members.get(category, 0) + 1
+        self._push(agent)
+
+    def remove_agent(self, agent: str):
+        if agent not in self.load:
+            return
+        for category in self._categories(agent):
+            self._members[category] -= 1
+        del self.load[agent], self.skills[agent], self._stamp[agent]
+
+    def set_skills(self, agent: str, skills):
+        if agent in self.load:
+            self.add_agent(agent, skills, self.load[agent])
+
+    def pick(self, category: str = None) -> Optional[str]:
+        """The least-loaded agent who takes ``category``, or of all agents when nobody does."""
+        entries = [entry for entry in (self._top(GENERALISTS), category and self._top(category)) if entry]
+        if not entries:
+            entries = [entry for entry in (self._top(ANY_CATEGORY),) if entry]
+        return min(entries)[2] if entries else None
+
+    def _top(self, category: str):
+        heap = self._heaps.get(category)
+        while heap:
+            entry = heap[0]
+            if self._stamp.get(entry[2]) == entry[1]:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def assign(self, category: str = None) -> Optional[str]:
+        agent = self.pick(category)
+        if agent is not None:
+            self.adjust(agent, 1)
+        return agent
+
+    def adjust(self, agent: str, delta: int):
+        if agent in self.load:
+            self.load[agent] = max(0, self.load[agent] + delta)
+            self._push(agent)
+
+    def _categories(self, agent: str):
+        return (ANY_CATEGORY, *(self.skills[agent] or (GENERALISTS,)))
+
+    def _push(self, agent: str):
+        stamp = next(self._counter)
+        self._stamp[agent] = stamp
+        entry = (self.load[agent], stamp, agent)
+        for category in self._categories(agent):
+            heap = self._heaps.setdefault(category, [])
+            heapq.heappush(heap, entry)
+            # Drop superseded entries once they outnumber live ones
+            if len(heap) > 4 * self._members[category] + 64:
+                self._heaps[category] = [e for e in heap if self._stamp.get(e[2]) == e[1]]
+                heapq.heapify(self._heaps[category])
+
+
+class Tracked(NamedTuple):
+    assignee: Optional[str]
+    category: Optional[str]
+    status: str
+
+
+class AssignmentEngine:
+    def __init__(self):
+        self.balancer = LoadBalancer()
+        # Open tickets by id; the load in the balancer is derived from these
+        self.tickets = {}
+        self.assigned = 0
+        self._rebuilding = None
+        self._tasks = set()
+        self._task = None
+
+    # Ticket state
+
+    def _track(self, ticket_id: str, ticket: Optional[Tracked]):
+        previous = self.tickets.pop(ticket_id, None)
+        if previous is not None and previous.assignee:
+            self.balancer.adjust(previous.assignee, -1)
+        if ticket is not None and ticket.status in OPEN_STATUSES:
+            self.tickets[ticket_id] = ticket
+            if ticket.assignee:
+                self.balancer.adjust(ticket.assignee, 1)
+
+    def on_event(self, event: dict):
+        if event is RESYNC:
+            self._spawn(self.rebuild())
+            return
+        if event.get("type") not in ("ticket.created", "ticket.updated"):
+            return
+        if self._rebuilding is not None:
+            self._rebuilding.append(event)
+        self._apply(event)
+        if (
+            AUTO_ASSIGN_ENABLED
+            and event["type"] == "ticket.created"
+            and event.get("assigned_to") is None
+            and event.get("status") in OPEN_STATUSES
+        ):
+            self._spawn(self.assign_ticket(event["ticket_id"], event.get("category")))
+
+    def _apply(self, event: dict):
+        ticket = None
+        if not event.get("archived"):
+            ticket = Tracked(event.get("assigned_to"), event.get("category"), event.get("status"))
+        self._track(event["ticket_id"], ticket)
+
+    async def rebuild(self):
+        """Reload agents, skills and open tickets, replaying events that arrive meanwhile."""
+        pool = db.get_pool()
+        if pool is None or self._rebuilding is not None:
+            return
+        self._rebuilding = []
+        try:
+            agents, skills, tickets = await asyncio.gather(
+                pool.fetch("SELECT user_id FROM profiles WHERE role = 'admin' AND is_active AND user_id IS NOT NULL"),
+                pool.fetch("SELECT agent_id, category FROM agent_skills"),
+                pool.fetch(
+                    """
+                    SELECT id, assigned_to, category, status FROM support_tickets
+                    WHERE status IN ('open', 'in_progress', 'pending') AND NOT archived
+                    """
+                ),
+            )
+            agent_skills = {}
+            for row in skills:
+                agent_skills.setdefault(str(row["agent_id"]), []).append(row["category"])
+            open_tickets = {
+                str(row["id"]): Tracked(
+                    str(row["assigned_to"]) if row["assigned_to"] else None, row["category"], row["status"]
+                )
+                for row in tickets
+            }
+            loads = {}
+            for ticket in open_tickets.values():
+                if ticket.assignee:
+                    loads[ticket.assignee] = loads.get(ticket.assignee, 0) + 1
+            balancer = LoadBalancer()
+            for row in agents:
+                agent = str(row["user_id"])
+                balancer.add_agent(agent, agent_skills.get(agent, ()), loads.get(agent, 0))
+            self.balancer, self.tickets = balancer, open_tickets
+            # Replaying in order leaves each ticket in its latest state, snapshot or not
+            for event in self._rebuilding:
+                self._apply(event)
+        finally:
+            self._rebuilding = None
+
+    # Assignment
+
+    async def assign_ticket(self, ticket_id: str, category: str = None) -> Optional[str]:
+        """Assign an unassigned open ticket to the least-loaded skilled agent; returns the agent or None."""
+        agent = self.balancer.pick(category)
+        if agent is None:
+            return None
+        # Count it now so concurrent assignments on this worker spread out
+        reservation = Tracked(agent, category, "open")
+        self._track(ticket_id, reservation)
+        row = None
+        try:
+            row = await db.require_pool().fetchrow(
+                """
+                UPDATE support_tickets SET assigned_to = $1
+                WHERE id = $2 AND assigned_to IS NULL AND NOT archived AND status IN ('open', 'in_progress', 'pending')
+                RETURNING status, category
+                """,
+                UUID(agent),
+                UUID(ticket_id),
+            )
+        finally:
+            if self.tickets.get(ticket_id) is reservation:
+                self._track(ticket_id, Tracked(agent, row["category"], row["status"]) if row else None)
+        if row is None:
+            return None
+        self.assigned += 1
+        return agent
+
+    def plan_rebalance(self, max_moves: int = ASSIGNMENT_MAX_REBALANCE_MOVES) -> list:
+        """Moves ``(ticket_id, from_agent, to_agent)`` that even out load; applied to a copy of the state."""
+        balancer = LoadBalancer()
+        for agent, load in self.balancer.load.items():
+            balancer.add_agent(agent, self.balancer.skills[agent], load)
+        movable = {}
+        for ticket_id, ticket in self.tickets.items():
+            if ticket.status == MOVABLE_STATUS and ticket.assignee in balancer.load:
+                movable.setdefault(ticket.assignee, []).append((ticket_id, ticket.category))
+        moves = []
+        while len(moves) < max_moves:
+            for donor in sorted(movable, key=balancer.load.get, reverse=True):
+                move = self._take_one(balancer, donor, movable[donor])
+                if move is not None:
+                    moves.append(move)
+                    break
+            else:
+                break
+        return moves
+
+    @staticmethod
+    def _take_one(balancer: LoadBalancer, donor: str, tickets: list):
+        for index, (ticket_id, category) in enumerate(tickets):
+            target = balancer.pick(category)
+            if target is not None and target != donor and balancer.load[target] + 1 < balancer.load[donor]:
+                tickets.pop(index)
+                balancer.adjust(donor, -1)
+                balancer.adjust(target, 1)
+                return ticket_id, donor, target
+        return None
+
+    async def rebalance(self, max_moves: int = ASSIGNMENT_MAX_REBALANCE_MOVES) -> list:
+        """Apply a rebalancing plan in one statement; moves whose ticket changed meanwhile are skipped."""
+        moves = self.plan_rebalance(max_moves)
+        if not moves:
+            return []
+        ticket_ids, donors, targets = (list(column) for column in zip(*moves))
+        rows = await db.require_pool().fetch(
+            """
+            UPDATE support_tickets t SET assigned_to = m.target
+            FROM unnest($1::uuid[], $2::uuid[], $3::uuid[]) AS m(id, donor, target)
+            WHERE t.id = m.id AND NOT t.archived AND t.assigned_to = m.donor AND t.status = 'open'
+            RETURNING t.id, t.assigned_to, t.category, t.status
+            """,
+            ticket_ids,
+            donors,
+            targets,
+        )
+        applied = {str(row["id"]) for row in rows}
+        for row in rows:
+            self._track(str(row["id"]), Tracked(str(row["assigned_to"]), row["category"], row["status"]))
+        return [move for move in moves if move[0] in applied]
+
+    # Lifecycle
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Ticket assignment task failed", exc_info=task.exception())
+
+    def start(self):
+        if db.get_pool() is None:
+            return
+        ticket_event_hub.add_listener(self.on_event)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.on_event in ticket_event_hub.listeners:
+            ticket_event_hub.listeners.remove(self.on_event)
+        tasks = [self._task, *self._tasks] if self._task is not None else list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Rebuilding ticket assignment state failed")
+            await asyncio.sleep(ASSIGNMENT_REFRESH_SECONDS)
+
+
+assignment_engine = AssignmentEngine()
+
+router = APIRouter(prefix="/api/admin/assignment", dependencies=[Depends(require_admin)])
+
+
+class SkillsRequest(BaseModel):
+    categories: list[str]
+
+
+@router.get("")
+async def assignment_state():
+    """Current load and skills of every agent on this worker."""
+    balancer = assignment_engine.balancer
+    return {
+        "auto_assign": AUTO_ASSIGN_ENABLED,
+        "open_tickets": len(assignment_engine.tickets),
+        "unassigned": sum(1 for ticket in assignment_engine.tickets.values() if not ticket.assignee),
+        "agents": [
+            {"agent_id": agent, "load": load, "skills": sorted(balancer.skills[agent])}
+            for agent, load in sorted(balancer.load.items(), key=lambda item: item[1])
+        ],
+    }
+
+
+@router.post("/tickets/{ticket_id}")
+async def assign_ticket(ticket_id: UUID):
+    """Assign one unassigned open ticket now."""
+    row = await db.require_pool().fetchrow(
+        "SELECT category FROM support_tickets WHERE id = $1 AND assigned_to IS NULL AND NOT archived", ticket_id
+    )
+    if row is None:
+        raise HTTPException(status_code=409, detail="Ticket not found or already assigned")
+    agent = await assignment_engine.assign_ticket(str(ticket_id), row["category"])
+    if agent is None:
+        raise HTTPException(status_code=409, detail="No agent available or ticket assigned meanwhile")
+    return {"ticket_id": str(ticket_id), "assigned_to": agent}
+
+
+@router.post("/rebalance")
+async def rebalance(
+    dry_run: bool = Query(False),
+    max_moves: int = Query(100, ge=1, le=ASSIGNMENT_MAX_REBALANCE_MOVES),
+):
+    """Move not-yet-started tickets from the busiest agents to the least busy skilled ones."""
+    if dry_run:
+        moves = assignment_engine.plan_rebalance(max_moves)
+    else:
+        db.require_pool()
+        moves = await assignment_engine.rebalance(max_moves)
+    return {
+        "dry_run": dry_run,
+        "moves": [{"ticket_id": t, "from": donor, "to": target} for t, donor, target in moves],
+    }
+
+
+@router.put("/agents/{agent_id}/skills")
+async def set_agent_skills(agent_id: UUID, request: SkillsRequest):
+    """Replace the categories an agent takes; an empty list means any category."""
+    categories = sorted({category.strip() for category in request.categories if category.strip()})
+    pool = db.require_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("DELETE FROM agent_skills WHERE agent_id = $1", agent_id)
+            await conn.executemany(
+                "INSERT INTO agent_skills (agent_id, category) VALUES ($1, $2)",
+                [(agent_id, category) for category in categories],
+            )
+    assignment_engine.balancer.set_skills(str(agent_id), categories)
+    return {"agent_id": str(agent_id), "skills": categories}
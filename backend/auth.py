@@ -0,0 +1,295 @@
+"""Caller authentication for backend endpoints.
+
+Supabase access tokens are verified locally: HS256 tokens with
+``SUPABASE_JWT_SECRET``, asymmetric tokens against the project's JWKS, whose
+keys are cached. Verified claims are cached per token until shortly before
+expiry, and the caller's role and company come from ``profiles`` through a
+TTL + LRU cache. Profile changes are pushed to every worker by a
+``profile_changes`` notification, so cached entries are dropped as soon as
+a role or company assignment changes rather than when the TTL runs out.
+"""
+import asyncio
+import collections
+import hmac
+import json
+import logging
+import os
+import time
+from typing import NamedTuple
+
+import jwt
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+import db
+
+logger = logging.getLogger(__name__)
+
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN")
+SUPABASE_URL = os.environ.get("SUPABASE_URL")
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.environ.get("SUPABASE_JWT_AUDIENCE", "authenticated")
+AUTH_PROFILE_CACHE_SIZE = int(os.environ.get("AUTH_PROFILE_CACHE_SIZE", "10000"))
+AUTH_PROFILE_CACHE_TTL = float(os.environ.get("AUTH_PROFILE_CACHE_TTL", "60"))
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get("AUTH_TOKEN_CACHE_SIZE", "10000"))
+JWT_LEEWAY_SECONDS = 30
+PROFILE_CHANGES_CHANNEL = "profile_changes"
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class AuthContext(NamedTuple):
+    user_id: str
+    email: str
+    role: str
+    company_id: str
+    claims: dict
+
+
+_token_cache = TTLCache(AUTH_TOKEN_CACHE_SIZE, 300)
+profile_cache = TTLCache(AUTH_PROFILE_CACHE_SIZE, AUTH_PROFILE_CACHE_TTL)
+# Profile lookups already in flight, so concurrent misses share one query
+_profile_loads = {}
+
+_jwks_client = None
+if SUPABASE_URL:
+    _jwks_client = jwt.PyJWKClient(
+        f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json", cache_keys=True, lifespan=3600
+    )
+
+
+def _decode_token(token: str) -> dict:
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm == "HS256":
+        if not SUPABASE_JWT_SECRET:
+            raise jwt.InvalidTokenError("HS256 tokens require SUPABASE_JWT_SECRET")
+        key = SUPABASE_JWT_SECRET
+    elif _jwks_client is not None and algorithm in ("RS256", "ES256"):
+        key = _jwks_client.get_signing_key_from_jwt(token).key
+    else:
+        raise jwt.InvalidTokenError(f"Unsupported token algorithm: {algorithm}")
+    return jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience=SUPABASE_JWT_AUDIENCE,
+        leeway=JWT_LEEWAY_SECONDS,
+        options={"require": ["exp", "sub"]},
+    )
+
+
+async def verify_token(token: str) -> dict:
+    """Return the verified claims of a Supabase access token."""
+    claims = _token_cache.get(token)
+    if claims is not None:
+        return claims
+    try:
+        if SUPABASE_JWT_SECRET and jwt.get_unverified_header(token).get("alg") == "HS256":
+            claims = _decode_token(token)
+        else:
+            # A JWKS cache miss fetches keys over the network
+            claims = await run_in_threadpool(_decode_token, token)
+    except jwt.PyJWTError as e:
+        raise HTTPException(status_code=401, detail=f"Invalid access token: {e}")
+    remaining = claims["exp"] - time.time()
+    if remaining > 0:
+        _token_cache.set(token, claims, ttl=min(remaining, _token_cache.ttl))
+    return claims
+
+
+async def _load_profile(user_id: str):
+    row = await db.require_pool().fetchrow(
+        "SELECT role, company_id, is_active FROM profiles WHERE user_id = $1", user_id
+    )
+    profile = None
+    if row is not None:
+        profile = {
+            "role": row["role"] or "student",
+            "company_id": str(row["company_id"]) if row["company_id"] else None,
+            "is_active": row["is_active"] is not False,
+        }
+    profile_cache.set(user_id, profile)
+    return profile
+
+
+async def get_profile(user_id: str):
+    """Return the cached role/company record for a user, loading it on a miss."""
+    profile = profile_cache.get(user_id, False)
+    if profile is not False:
+        return profile
+    pending = _profile_loads.get(user_id)
+    if pending is None:
+        pending = asyncio.ensure_future(_load_profile(user_id))
+        _profile_loads[user_id] = pending
+        pending.add_done_callback(lambda _: _profile_loads.pop(user_id, None))
+    return await asyncio.shield(pending)
+
+
+def invalidate_profile(user_id: str = None) -> None:
+    """Drop one user's cached profile, or every cached profile."""
+    if user_id is None:
+        profile_cache.clear()
+    else:
+        profile_cache.invalidate(user_id)
+
+
+def _bearer_token(authorization: str):
+    if authorization and authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return None
+
+
+async def get_current_user(authorization: str = Header(None)) -> AuthContext:
+    """Dependency resolving the caller from their Supabase access token."""
+    token = _bearer_token(authorization)
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    return await authenticate(token)
+
+
+async def get_stream_user(authorization: str = Header(None), access_token: str = Query(None)) -> AuthContext:
+    """Like ``get_current_user`` but also accepts the token as a query parameter,
+    since browsers' EventSource cannot send an Authorization header."""
+    token = _bearer_token(authorization) or access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    return await authenticate(token)
+
+
+async def authenticate(token: str) -> AuthContext:
+    """Verify an access token and load the caller's role and company."""
+    claims = await verify_token(token)
+    user_id = claims["sub"]
+    profile = await get_profile(user_id)
+    if profile is None:
+        raise HTTPException(status_code=403, detail="No profile for this user")
+    if not profile["is_active"]:
+        raise HTTPException(status_code=403, detail="Account is disabled")
+    return AuthContext(user_id, claims.get("email"), profile["role"], profile["company_id"], claims)
+
+
+def require_role(*roles: str):
+    """Dependency factory allowing only callers with one of ``roles``."""
+
+    async def dependency(user: AuthContext = Depends(get_current_user)) -> AuthContext:
+        if user.role not in roles:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return user
+
+    return dependency
+
+
+async def require_admin(x_admin_token: str = Header(None), authorization: str = Header(None)):
+    """Allow the request only for an admin user or the configured admin token.
+
+    A bearer token must belong to a profile with the admin role. The
+    ``X-Admin-Token`` header is accepted for automation and only works when
+    ``ADMIN_API_TOKEN`` is set.
+    """
+    if _bearer_token(authorization):
+        user = await get_current_user(authorization)
+        if user.role != "admin":
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        return user
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is not configured")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    return None
+
+
+class ProfileInvalidationListener:
+    """Drop cached profiles when the database reports a profile change."""
+
+    def __init__(self):
+        self._conn = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            user_id = json.loads(payload).get("user_id")
+        except ValueError:
+            user_id = None
+        invalidate_profile(user_id)
+
+    async def start(self):
+        pool = db.get_pool()
+        if pool is None:
+            return
+        try:
+            self._conn = await pool.acquire()
+            await self._conn.add_listener(PROFILE_CHANGES_CHANNEL, self._on_notify)
+        except Exception:
+            logger.exception("Could not listen for profile changes; relying on cache TTL")
+            await self.stop()
+
+    async def stop(self):
+        if self._conn is not None:
+            pool, conn, self._conn = db.get_pool(), self._conn, None
+            try:
+                await conn.remove_listener(PROFILE_CHANGES_CHANNEL, self._on_notify)
+            finally:
+                await pool.release(conn)
+
+
+profile_listener = ProfileInvalidationListener()
+
+router = APIRouter(prefix="/api/admin/auth", dependencies=[Depends(require_admin)])
+
+
+class InvalidateRequest(BaseModel):
+    user_id: str = None
+
+
+@router.post("/invalidate")
+async def invalidate_auth_cache(request: InvalidateRequest):
+    """Drop cached profiles on this worker; omit ``user_id`` to drop them all."""
+    invalidate_profile(request.user_id)
+    return {"status": "success", "cached_profiles": len(profile_cache)}
+
+
+@router.get("/cache")
+async def auth_cache_stats():
+    return {
+        "profiles": len(profile_cache),
+        "profile_hits": profile_cache.hits,
+        "profile_misses": profile_cache.misses,
+        "tokens": len(_token_cache),
+        "token_hits": _token_cache.hits,
+        "token_misses": _token_cache.misses,
+    }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Simulate automatic ticket assignment on a synthetic arrival stream.
+
+Usage: python benchmarks/bench_assignment.py --tickets 200000 --agents 200
+(run from the backend directory)
+
+Tickets arrive as a Poisson stream with a skewed category mix and stay open
+for an exponentially distributed handling time. Each agent takes a random
+subset of the categories (a share take any). The same stream is assigned by
+the least-loaded LoadBalancer, by a linear scan for the least-loaded skilled
+agent (the same choice, without the heaps), round-robin and at random, and
+each strategy reports time per assignment and how uneven agent load gets.
+"""
+import argparse
+import heapq
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assignment import LoadBalancer  # noqa: E402
+
+CATEGORIES = ["technical", "billing", "training", "consulting", "account", "general"]
+CATEGORY_WEIGHTS = [40, 20, 15, 10, 10, 5]
+
+
+def make_agents(rng: random.Random, count: int, generalist_share: float) -> dict:
+    agents = {}
+    for i in range(count):
+        skills = () if rng.random() < generalist_share else tuple(rng.sample(CATEGORIES, rng.randint(1, 3)))
+        agents[f"agent{i}"] = skills
+    return agents
+
+
+def make_stream(rng: random.Random, count: int, rate: float, mean_handling: float) -> list:
+    clock = 0.0
+    stream = []
+    for _ in range(count):
+        clock += rng.expovariate(rate)
+        stream.append((clock, rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0], rng.expovariate(1 / mean_handling)))
+    return stream
+
+
+def skilled(agents: dict) -> dict:
+    return {
+        category: [agent for agent, skills in agents.items() if not skills or category in skills]
+        for category in CATEGORIES
+    }
+
+
+class HeapStrategy:
+    def __init__(self, agents):
+        self.balancer = LoadBalancer()
+        for agent, skills in agents.items():
+            self.balancer.add_agent(agent, skills)
+
+    def assign(self, category):
+        return self.balancer.assign(category)
+
+    def release(self, agent):
+        self.balancer.adjust(agent, -1)
+
+
+class ScanStrategy:
+    def __init__(self, agents):
+        self.load = dict.fromkeys(agents, 0)
+        self.candidates = skilled(agents)
+
+    def assign(self, category):
+        agent = min(self.candidates[category] or self.load, key=self.load.get)
+        self.load[agent] += 1
+        return agent
+
+    def release(self, agent):
+        self.load[agent] -= 1
+
+
+class RoundRobinStrategy:
+    def __init__(self, agents):
+        self.cycles = {category: itertools.cycle(members or list(agents)) for category, members in skilled(agents).items()}
+
+    def assign(self, category):
+        return next(self.cycles[category])
+
+    def release(self, agent):
+        pass
+
+
+class RandomStrategy:
+    def __init__(self, agents, seed):
+        self.rng = random.Random(seed)
+        self.candidates = {category: members or list(agents) for category, members in skilled(agents).items()}
+
+    def assign(self, category):
+        return self.rng.choice(self.candidates[category])
+
+    def release(self, agent):
+        pass
+
+
+def simulate(strategy, stream: list, agents: dict, samples: int) -> dict:
+    load = dict.fromkeys(agents, 0)
+    closing = []
+    spreads, deviations = [], []
+    assign_seconds = 0.0
+    sample_every = max(1, len(stream) // samples)
+    for i, (clock, category, handling) in enumerate(stream):
+        while closing and closing[0][0] <= clock:
+            _, agent = heapq.heappop(closing)
+            load[agent] -= 1
+            strategy.release(agent)
+        started = time.perf_counter()
+        agent = strategy.assign(category)
+        assign_seconds += time.perf_counter() - started
+        load[agent] += 1
+        heapq.heappush(closing, (clock + handling, agent))
+        if i % sample_every == 0:
+            values = list(load.values())
+            spreads.append(max(values) - min(values))
+            deviations.append(statistics.pstdev(values))
+    return {
+        "us": assign_seconds / len(stream) * 1e6,
+        "spread": statistics.mean(spreads),
+        "max_spread": max(spreads),
+        "stdev": statistics.mean(deviations),
+        "peak": max(load.values()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=200_000)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50.0, help="Arrivals per hour")
+    parser.add_argument("--mean-handling", type=float, default=24.0, help="Mean hours a ticket stays open")
+    parser.add_argument("--generalist-share", type=float, default=0.2)
+    parser.add_argument("--samples", type=int, default=2000, help="Load snapshots taken over the run")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    agents = make_agents(rng, args.agents, args.generalist_share)
+    stream = make_stream(rng, args.tickets, args.rate, args.mean_handling)
+    print(f"tickets: {args.tickets:,}  agents: {args.agents}  mean open tickets: {args.rate * args.mean_handling:,.0f}")
+    print(f"{'strategy':<14}{'us/assign':>11}{'mean spread':>13}{'max spread':>12}{'mean stdev':>12}{'peak load':>11}")
+    strategies = [
+        ("least-loaded", HeapStrategy(agents)),
+        ("linear scan", ScanStrategy(agents)),
+        ("round-robin", RoundRobinStrategy(agents)),
+        ("random", RandomStrategy(agents, args.seed)),
+    ]
+    for name, strategy in strategies:
+        result = simulate(strategy, stream, agents, args.samples)
+        print(
+            f"{name:<14}{result['us']:>11.2f}{result['spread']:>13.1f}{result['max_spread']:>12d}"
+            f"{result['stdev']:>12.2f}{result['peak']:>11d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
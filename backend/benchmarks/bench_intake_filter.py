@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark the contact intake filter on a synthetic message stream.
+
+Usage: python benchmarks/bench_intake_filter.py --messages 1000000
+(run from the backend directory)
+
+Legitimate messages are assembled from a random vocabulary; a share of the
+stream comes from spam campaigns that repeat a template with small edits.
+Timestamps advance at --rate messages per second so the sliding window holds
+a realistic number of recent messages.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intake_filter import IntakeFilter  # noqa: E402
+
+VOCABULARY = [f"word{i}" for i in range(5000)] + [
+    "database", "migration", "postgres", "performance", "backup", "training", "support", "query",
+    "index", "replication", "cluster", "latency", "outage", "upgrade", "consulting", "quote",
+]
+
+
+def legitimate_message(rng: random.Random) -> str:
+    return " ".join(rng.choices(VOCABULARY, k=rng.randint(15, 80)))
+
+
+def campaign_template(rng: random.Random) -> list:
+    return rng.choices(VOCABULARY, k=rng.randint(30, 60)) + ["http://cheap-offers.example"]
+
+
+def spam_message(template: list, rng: random.Random) -> str:
+    words = list(template)
+    for _ in range(rng.randint(0, 3)):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--spam-share", type=float, default=0.05)
+    parser.add_argument("--campaigns", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=20.0, help="Synthetic messages per second")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    templates = [campaign_template(rng) for _ in range(args.campaigns)]
+    intake = IntakeFilter()
+
+    spam_total = spam_caught = legit_total = legit_rejected = 0
+    check_seconds = 0.0
+    clock = 0.0
+    latencies = []
+    for i in range(args.messages):
+        clock += 1.0 / args.rate
+        if rng.random() < args.spam_share:
+            message = spam_message(rng.choice(templates), rng)
+            sender = f"bot{rng.randrange(10_000)}@spam.example"
+            ip = f"10.0.{rng.randrange(256)}.{rng.randrange(256)}"
+            is_spam = True
+        else:
+            message = legitimate_message(rng)
+            sender = f"user{rng.randrange(1_000_000)}@example.com"
+            ip = f"192.168.{rng.randrange(256)}.{rng.randrange(256)}"
+            is_spam = False
+
+        started = time.perf_counter()
+        verdict = intake.check(sender, message, ip, now=clock)
+        elapsed = time.perf_counter() - started
+        check_seconds += elapsed
+        if i % 100 == 0:
+            latencies.append(elapsed)
+
+        if is_spam:
+            spam_total += 1
+            spam_caught += verdict.rejected
+        else:
+            legit_total += 1
+            legit_rejected += verdict.rejected
+
+    latencies.sort()
+    print(f"messages:           {args.messages:,} ({spam_total:,} spam)")
+    print(f"window entries:     {len(intake):,}")
+    print(f"mean check:         {check_seconds / args.messages * 1e6:.1f} us")
+    print(f"p50 / p99 check:    {latencies[len(latencies) // 2] * 1e6:.1f} / {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us")
+    print(f"spam rejected:      {spam_caught / max(spam_total, 1):.3%}")
+    print(f"legit rejected:     {legit_rejected / max(legit_total, 1):.4%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Time the backend's hot queries against a database filled by ``cli.py generate-data``.
+
+Usage: DATABASE_URL=postgresql://localhost/azellar python benchmarks/bench_queries.py --runs 50
+(run from the backend directory)
+
+Each query runs --runs times with parameters drawn from the data (a random
+company, client, ticket) and p50/p95 latency is reported, so the effect of
+an index or query change can be measured at realistic table sizes.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics  # noqa: E402
+import dashboards  # noqa: E402
+
+QUERIES = {
+    "admin ticket stats": (dashboards.TICKET_STATS_QUERY, lambda s: ()),
+    "admin recent tickets": (
+        f"SELECT {dashboards.TICKET_COLUMNS} FROM support_tickets WHERE NOT archived ORDER BY created_at DESC LIMIT 100",
+        lambda s: (),
+    ),
+    "client company tickets": (
+        f"""SELECT {dashboards.TICKET_COLUMNS} FROM support_tickets
+            WHERE NOT archived AND (company_id = $1 OR created_by = $2) ORDER BY created_at DESC LIMIT 100""",
+        lambda s: (random.choice(s["companies"]), random.choice(s["clients"])),
+    ),
+    "ticket replies": (
+        "SELECT id, reply_text, is_internal, created_by, created_at FROM ticket_replies "
+        "WHERE ticket_id = $1 ORDER BY created_at",
+        lambda s: (random.choice(s["tickets"]),),
+    ),
+    "student enrollments": (
+        "SELECT id, course_id, status, enrolled_at FROM enrollments WHERE student_id = $1",
+        lambda s: (random.choice(s["students"]),),
+    ),
+    "sla analytics, 30 days": (
+        analytics.REPLIES_QUERY,
+        lambda s: (time.time() - 30 * 86400, time.time()),
+    ),
+}
+
+
+async def sample_ids(conn) -> dict:
+    async def ids(query):
+        return [row[0] for row in await conn.fetch(query)]
+
+    return {
+        "companies": await ids("SELECT id FROM companies ORDER BY random() LIMIT 1000"),
+        "clients": await ids("SELECT user_id FROM profiles WHERE role = 'client' ORDER BY random() LIMIT 1000"),
+        "students": await ids("SELECT user_id FROM profiles WHERE role = 'student' ORDER BY random() LIMIT 1000"),
+        "tickets": await ids("SELECT id FROM support_tickets ORDER BY random() LIMIT 1000"),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--only", help="Run only queries whose name contains this text")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    conn = await asyncpg.connect(args.database_url)
+    try:
+        samples = await sample_ids(conn)
+        counts = await conn.fetchrow(
+            "SELECT (SELECT count(*) FROM support_tickets) AS tickets, (SELECT count(*) FROM ticket_replies) AS replies"
+        )
+        print(f"tickets / replies: {counts['tickets']:,} / {counts['replies']:,}")
+        for name, (query, make_args) in QUERIES.items():
+            if args.only and args.only not in name:
+                continue
+            statement = await conn.prepare(query)
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                await statement.fetch(*make_args(samples))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"{name:<26} p50 {statistics.median(timings):9.2f} ms   p95 {timings[int(len(timings) * 0.95)]:9.2f} ms")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
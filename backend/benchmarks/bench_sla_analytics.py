@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark the SLA analytics computation on a synthetic ticket dataset.
+
+Usage: python benchmarks/bench_sla_analytics.py --replies 10000000
+(run from the backend directory)
+
+Tickets are spread over --companies companies and the four priorities, with
+replies at exponentially distributed offsets after each ticket. The same
+data is written as the CSV that ``COPY`` produces, so the parse step the API
+performs is timed too. A row-by-row Python implementation is run on a sample
+for comparison.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import CSV_ENGINE, PERCENTILES, _frames, compute_sla  # noqa: E402
+
+PRIORITIES = np.array(["low", "medium", "high", "urgent"])
+
+
+def synthetic_dataset(tickets: int, replies: int, companies: int, now: float, rng: np.random.Generator):
+    company_ids = np.array([str(uuid.UUID(int=int(i) + 1)) for i in range(companies)])
+    created = now - rng.uniform(0, 90 * 86400, tickets)
+    closed = rng.random(tickets) < 0.7
+    done = np.where(closed, created + rng.exponential(36 * 3600, tickets), np.nan)
+    frame = pd.DataFrame(
+        {
+            "company_id": company_ids[rng.integers(0, companies, tickets)],
+            "priority": PRIORITIES[rng.choice(4, tickets, p=[0.3, 0.4, 0.2, 0.1])],
+            "created_at": created,
+            "done_at": done,
+            "closed": closed,
+        }
+    )
+    reply_ticket = rng.integers(0, tickets, replies)
+    reply_at = created[reply_ticket] + rng.exponential(4 * 3600, replies)
+    return frame, reply_ticket, reply_at
+
+
+def row_by_row(tickets: pd.DataFrame, reply_ticket: np.ndarray, reply_at: np.ndarray, now: float) -> dict:
+    first = {}
+    for ticket, at in zip(reply_ticket.tolist(), reply_at.tolist()):
+        if ticket not in first or at < first[ticket]:
+            first[ticket] = at
+    groups = {}
+    for i, row in enumerate(tickets.itertuples(index=False)):
+        metrics = groups.setdefault((row.company_id, row.priority), ([], [], []))
+        if i in first:
+            metrics[0].append((first[i] - row.created_at) / 3600)
+        if row.closed:
+            metrics[1].append((row.done_at - row.created_at) / 3600)
+        else:
+            metrics[2].append((now - row.created_at) / 3600)
+    return {
+        key: [np.percentile(values, [q * 100 for q in PERCENTILES]) if values else None for values in metrics]
+        for key, metrics in groups.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=1_000_000)
+    parser.add_argument("--replies", type=int, default=10_000_000)
+    parser.add_argument("--companies", type=int, default=500)
+    parser.add_argument("--baseline-sample", type=int, default=100_000, help="Tickets in the row-by-row comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    now = time.time()
+    tickets, reply_ticket, reply_at = synthetic_dataset(args.tickets, args.replies, args.companies, now, rng)
+
+    tickets_csv = io.BytesIO()
+    tickets.assign(closed=np.where(tickets["closed"], "t", "f")).to_csv(tickets_csv, header=False, index=False)
+    replies_csv = io.BytesIO()
+    pd.DataFrame({"position": reply_ticket, "at": reply_at}).to_csv(replies_csv, header=False, index=False)
+    tickets_csv.seek(0)
+    replies_csv.seek(0)
+
+    started = time.perf_counter()
+    parsed = _frames(tickets_csv, replies_csv)
+    parse_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    groups = compute_sla(*parsed, now)
+    compute_seconds = time.perf_counter() - started
+
+    sample = args.baseline_sample
+    in_sample = reply_ticket < sample
+    started = time.perf_counter()
+    compute_sla(tickets.iloc[:sample], reply_ticket[in_sample], reply_at[in_sample], now)
+    vectorized_sample = time.perf_counter() - started
+    started = time.perf_counter()
+    row_by_row(tickets.iloc[:sample], reply_ticket[in_sample], reply_at[in_sample], now)
+    baseline_sample = time.perf_counter() - started
+
+    print(f"tickets / replies:  {args.tickets:,} / {args.replies:,}")
+    print(f"groups:             {len(groups):,}")
+    print(f"parse COPY output:  {parse_seconds:.2f} s ({CSV_ENGINE} engine)")
+    print(f"compute metrics:    {compute_seconds:.2f} s")
+    print(f"sample of {sample:,} tickets: vectorized {vectorized_sample:.3f} s, "
+          f"row-by-row {baseline_sample:.3f} s ({baseline_sample / vectorized_sample:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
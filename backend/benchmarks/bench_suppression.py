@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Benchmark suppression list lookups at millions of entries.
+
+Usage: python benchmarks/bench_suppression.py --entries 5000000 --lookups 1000000
+(run from the backend directory)
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from suppression import SuppressionList  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=500_000)
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    suppressions = SuppressionList(capacity=args.entries, error_rate=args.error_rate)
+    started = time.perf_counter()
+    for i in range(args.entries):
+        suppressions._add_local(f"bounced-{i}@example.com")
+    build_seconds = time.perf_counter() - started
+
+    misses = [f"Someone-{i}@Example.org " for i in range(args.lookups)]
+    hits = [f"bounced-{i * 7 % args.entries}@example.com" for i in range(args.lookups)]
+
+    started = time.perf_counter()
+    false_positives = sum(1 for address in misses if address.strip().lower() in suppressions.bloom)
+    miss_seconds = time.perf_counter() - started
+    for address in misses:
+        suppressions.is_suppressed(address)
+    miss_lookup_seconds = time.perf_counter() - started - miss_seconds
+
+    started = time.perf_counter()
+    assert all(suppressions.is_suppressed(address) for address in hits)
+    hit_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for address in misses:
+        address.strip().lower() in suppressions.emails
+    set_only_seconds = time.perf_counter() - started
+
+    print(f"entries:                {args.entries:,}")
+    print(f"bloom size:             {len(suppressions.bloom.bits) / 2**20:.1f} MiB, {suppressions.bloom.hash_count} hashes")
+    print(f"build:                  {build_seconds:.2f} s")
+    print(f"miss lookup:            {miss_lookup_seconds / args.lookups * 1e6:.2f} us")
+    print(f"hit lookup:             {hit_seconds / args.lookups * 1e6:.2f} us")
+    print(f"set-only miss lookup:   {set_only_seconds / args.lookups * 1e6:.2f} us")
+    print(f"bloom false positives:  {false_positives / args.lookups:.5f} (target {args.error_rate})")
+
+
+if __name__ == "__main__":
+    main()
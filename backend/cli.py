@@ -0,0 +1,180 @@
+import asyncio
+import importlib.util
+import os
+
+import typer
+import uvicorn
+
+from logging_setup import setup_logging
+
+cli = typer.Typer(help="Azellar backend management commands.")
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+@cli.callback()
+def main():
+    """Azellar backend management commands."""
+
+
+@cli.command()
+def serve(
+    host: str = typer.Option(os.environ.get("HOST", "0.0.0.0"), help="Interface to bind."),
+    port: int = typer.Option(int(os.environ.get("PORT", "8001")), help="Port to bind."),
+    workers: int = typer.Option(
+        int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        help="Number of worker processes.",
+    ),
+    keep_alive: int = typer.Option(
+        int(os.environ.get("KEEP_ALIVE_TIMEOUT", "75")),
+        help="Seconds to hold idle keep-alive connections. Keep this above the load balancer idle timeout.",
+    ),
+    backlog: int = typer.Option(
+        int(os.environ.get("SOCKET_BACKLOG", "2048")),
+        help="Maximum number of pending connections in the listen queue.",
+    ),
+    graceful_timeout: float = typer.Option(
+        float(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+        help="Seconds to wait for in-flight requests after SIGTERM before closing connections.",
+    ),
+    drain_timeout: float = typer.Option(
+        float(os.environ.get("EMAIL_DRAIN_TIMEOUT", "20")),
+        help="Seconds to wait for pending email sends during shutdown.",
+    ),
+    log_level: str = typer.Option(os.environ.get("LOG_LEVEL", "info"), help="Uvicorn log level."),
+):
+    """Run the API server.
+
+    On SIGTERM each worker stops accepting connections, waits up to
+    ``graceful_timeout`` for in-flight requests, then waits up to
+    ``drain_timeout`` for email sends that are still with the provider.
+    """
+    # Worker processes read these: the drain timeout during application shutdown,
+    # the log level when server.py sets up logging on import
+    os.environ["EMAIL_DRAIN_TIMEOUT"] = str(drain_timeout)
+    os.environ["LOG_LEVEL"] = log_level
+    setup_logging(log_level.upper())
+
+    uvicorn.run(
+        "server:app",
+        host=host,
+        port=port,
+        workers=workers,
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+        backlog=backlog,
+        timeout_keep_alive=keep_alive,
+        timeout_graceful_shutdown=graceful_timeout,
+        proxy_headers=True,
+        server_header=False,
+        log_level=log_level,
+        # Logging goes through the queue-based JSON pipeline, and the request
+        # middleware already emits one access record per request.
+        log_config=None,
+        access_log=False,
+    )
+
+
+@cli.command("generate-data")
+def generate_data(
+    database_url: str = typer.Option(os.environ.get("DATABASE_URL"), help="Target database; use a local one."),
+    scale: float = typer.Option(1.0, help="Size multiplier; 1.0 is about 40k tickets and 200k replies."),
+    seed: int = typer.Option(1, help="Same seed, same data."),
+    tickets: int = typer.Option(None, help="Override the number of tickets."),
+    replies_per_ticket: int = typer.Option(None, help="Override replies per ticket."),
+    students: int = typer.Option(None, help="Override the number of students."),
+    attachment_bytes: int = typer.Option(None, help="Override the size of each attachment."),
+    truncate: bool = typer.Option(False, help="Empty the generated tables first."),
+    skip_auth_users: bool = typer.Option(False, help="Do not write auth.users (e.g. it does not exist locally)."),
+    disable_triggers: bool = typer.Option(True, help="Skip triggers and FK checks during the load (superuser only)."),
+    yes: bool = typer.Option(False, "--yes", help="Do not ask before truncating."),
+):
+    """Load a reproducible synthetic dataset for query and API benchmarks."""
+    import synthetic_data
+
+    if not database_url:
+        raise typer.BadParameter("Set --database-url or DATABASE_URL")
+    if truncate and not yes:
+        typer.confirm(f"Truncate profiles, companies, courses, enrollments and ticket tables in {database_url}?", abort=True)
+    size = synthetic_data.DatasetSize.scaled(
+        scale,
+        tickets=tickets,
+        replies_per_ticket=replies_per_ticket,
+        students=students,
+        attachment_bytes=attachment_bytes,
+    )
+    typer.echo(f"Generating {size.users:,} users, {size.tickets:,} tickets, "
+               f"{size.tickets * size.replies_per_ticket:,} replies (seed {seed})")
+
+    def progress(table, rows, seconds):
+        typer.echo(f"  {table:<28} {rows:>12,} rows  {seconds:7.1f} s  {rows / max(seconds, 1e-9):>10,.0f} rows/s")
+
+    asyncio.run(
+        synthetic_data.generate(
+            database_url, size, seed, truncate=truncate, skip_auth_users=skip_auth_users,
+            disable_triggers=disable_triggers, progress=progress,
+        )
+    )
+
+
+@cli.command("provision-users")
+def provision_users(
+    csv_file: typer.FileText = typer.Argument(..., help="CSV with an email column and optional full_name, role and company_id."),
+    database_url: str = typer.Option(os.environ.get("DATABASE_URL"), help="Database to write profiles to."),
+    company_id: str = typer.Option(None, help="Company for rows without a company_id."),
+    role: str = typer.Option("client", help="Role for rows without a role."),
+):
+    """Create auth users and profiles from a CSV file and print each outcome.
+
+    Needs SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY. Safe to re-run: users
+    who already have a profile are reported as ``exists``.
+    """
+    import csv
+    from uuid import UUID
+
+    import asyncpg
+    from fastapi import HTTPException
+
+    import provisioning
+
+    if not database_url:
+        raise typer.BadParameter("Set --database-url or DATABASE_URL")
+    try:
+        users = [
+            provisioning.ProvisionedUser(
+                email=row["email"],
+                full_name=row.get("full_name") or None,
+                role=row.get("role") or role,
+                company_id=row.get("company_id") or None,
+            )
+            for row in csv.DictReader(csv_file)
+        ]
+        default_company_id = UUID(company_id) if company_id else None
+    except (KeyError, ValueError) as e:
+        raise typer.BadParameter(f"Invalid CSV row or company id: {e}")
+
+    async def run():
+        pool = await asyncpg.create_pool(database_url, min_size=1, max_size=2)
+        try:
+            return await provisioning.provision_users(pool, users, default_company_id)
+        finally:
+            await pool.close()
+
+    try:
+        results = asyncio.run(run())
+    except HTTPException as e:
+        typer.echo(e.detail, err=True)
+        raise typer.Exit(1)
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        typer.echo(f"  {result['status']:<8} {result['email']:<40} {result.get('error') or result.get('user_id') or ''}")
+    typer.echo(", ".join(f"{count} {status}" for status, count in sorted(counts.items())))
+    if counts.get("failed"):
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    cli()
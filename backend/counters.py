@@ -0,0 +1,176 @@
+"""Course seat and company support-user counters.
+
+``courses.current_students`` and ``companies.current_support_users`` are kept
+current by the statement-level triggers in migration 008, so readers use the
+columns and never count. ``CounterReconciler`` walks both tables in id order,
+``COUNTER_RECONCILE_BATCH_SIZE`` rows per transaction, and repairs any counter
+that has drifted (rows loaded with triggers disabled, manual edits).
+
+A batch first locks its parent rows, then counts in a second statement: a
+concurrent enrollment either is already holding the lock, so its rows are
+committed and visible to the count, or it blocks on the lock and applies its
+delta on top of the repaired value. Either way nothing is counted twice.
+"""
+import asyncio
+import logging
+import os
+from typing import NamedTuple
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+
+import db
+from auth import AuthContext, get_current_user, require_admin
+
+logger = logging.getLogger(__name__)
+
+COUNTER_RECONCILE_ENABLED = os.environ.get("COUNTER_RECONCILE_ENABLED", "true").lower() == "true"
+COUNTER_RECONCILE_BATCH_SIZE = int(os.environ.get("COUNTER_RECONCILE_BATCH_SIZE", "1000"))
+COUNTER_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("COUNTER_RECONCILE_INTERVAL_SECONDS", "21600"))
+# Arbitrary application-wide key for pg_try_advisory_lock
+RECONCILE_LOCK_KEY = 0x7A11A6
+
+
+class Counter(NamedTuple):
+    table: str
+    column: str
+    # Correlated count of the rows the counter stands for; "parent" is the counted table's alias
+    count_query: str
+
+
+COUNTERS = (
+    Counter(
+        "courses",
+        "current_students",
+        "SELECT count(*) FROM enrollments e WHERE e.course_id = parent.id AND e.status = 'enrolled'",
+    ),
+    Counter(
+        "companies",
+        "current_support_users",
+        "SELECT count(*) FROM profiles p WHERE p.company_id = parent.id AND p.role = 'client' AND p.is_active",
+    ),
+)
+
+router = APIRouter()
+
+
+async def reconcile_batch(conn, counter: Counter, after: UUID = None):
+    """Repair one batch of ``counter`` past id ``after``; returns (last id or None when done, rows fixed)."""
+    async with conn.transaction():
+        ids = await conn.fetch(
+            f"""
+            SELECT id FROM {counter.table}
+            WHERE $1::uuid IS NULL OR id > $1
+            ORDER BY id LIMIT $2
+            FOR UPDATE
+            """,
+            after,
+            COUNTER_RECONCILE_BATCH_SIZE,
+        )
+        if not ids:
+            return None, 0
+        ids = [row["id"] for row in ids]
+        fixed = await conn.fetch(
+            f"""
+            UPDATE {counter.table} parent SET {counter.column} = actual.value
+            FROM (SELECT parent.id, ({counter.count_query}) AS value FROM {counter.table} parent
+                  WHERE parent.id = ANY($1::uuid[])) actual
+            WHERE parent.id = actual.id AND parent.{counter.column} IS DISTINCT FROM actual.value
+            RETURNING parent.id
+            """,
+            ids,
+        )
+    return ids[-1], len(fixed)
+
+
+class CounterReconciler:
+    def __init__(self):
+        self.repaired = 0
+        self._task = None
+
+    async def run_once(self) -> dict:
+        """Reconcile every counter now; returns rows repaired per counter, or {} if another worker holds the lock."""
+        pool = db.get_pool()
+        if pool is None:
+            return {}
+        repaired = {}
+        async with pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", RECONCILE_LOCK_KEY):
+                return {}
+            try:
+                for counter in COUNTERS:
+                    after, fixed = None, 0
+                    while True:
+                        after, batch_fixed = await reconcile_batch(conn, counter, after)
+                        fixed += batch_fixed
+                        if after is None:
+                            break
+                    repaired[f"{counter.table}.{counter.column}"] = fixed
+                    if fixed:
+                        logger.warning("Repaired %d drifted %s.%s counters", fixed, counter.table, counter.column)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", RECONCILE_LOCK_KEY)
+        self.repaired += sum(repaired.values())
+        return repaired
+
+    def start(self):
+        if COUNTER_RECONCILE_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Counter reconciliation failed")
+            await asyncio.sleep(COUNTER_RECONCILE_INTERVAL_SECONDS)
+
+
+counter_reconciler = CounterReconciler()
+
+
+@router.get("/api/courses/seats")
+async def course_seats():
+    """Seats taken and left for every active course."""
+    rows = await db.require_pool().fetch(
+        """
+        SELECT id, max_students, coalesce(current_students, 0) AS current_students,
+               greatest(coalesce(max_students, 0) - coalesce(current_students, 0), 0) AS seats_left
+        FROM courses WHERE is_active = true
+        """
+    )
+    return {"courses": [dict(row) for row in rows]}
+
+
+@router.get("/api/companies/{company_id}/support-users")
+async def company_support_users(company_id: UUID, user: AuthContext = Depends(get_current_user)):
+    """Support seats used and left for a company; for its own users and admins."""
+    if user.role != "admin" and user.company_id != str(company_id):
+        raise HTTPException(status_code=403, detail="Not allowed to view this company")
+    row = await db.require_pool().fetchrow(
+        """
+        SELECT max_support_users, coalesce(current_support_users, 0) AS current_support_users,
+               greatest(coalesce(max_support_users, 0) - coalesce(current_support_users, 0), 0) AS seats_left
+        FROM companies WHERE id = $1
+        """,
+        company_id,
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return dict(row)
+
+
+@router.post("/api/admin/counters/reconcile", dependencies=[Depends(require_admin)])
+async def reconcile_counters():
+    """Run a reconciliation pass now and report how many counters were repaired."""
+    db.require_pool()
+    return {"repaired": await counter_reconciler.run_once()}
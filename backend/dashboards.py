@@ -0,0 +1,189 @@
+"""Single-request data bundles for the student, client and admin dashboards.
+
+Each endpoint runs its independent queries concurrently on separate pooled
+connections and resolves the profiles and companies referenced by the rows
+through per-request ``BatchLoader``s, so every distinct profile or company is
+read once in one ``ANY($1)`` query. Referenced records are returned once in
+``profiles`` and ``companies`` maps keyed by id instead of being embedded in
+every row.
+"""
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends
+
+import db
+from auth import AuthContext, get_current_user, require_admin, require_role
+
+DASHBOARD_TICKET_LIMIT = int(os.environ.get("DASHBOARD_TICKET_LIMIT", "100"))
+DASHBOARD_INQUIRY_LIMIT = int(os.environ.get("DASHBOARD_INQUIRY_LIMIT", "100"))
+
+TICKET_COLUMNS = """
+    id, ticket_number, title, priority, status, category, created_by, assigned_to, company_id,
+    created_at, updated_at, resolved_at, closed_at
+"""
+# Dashboards show live work; archived tickets sit in the cold partitions and are
+# pruned from every query here by the "NOT archived" filter
+TICKET_STATS_QUERY = """
+    SELECT count(*) AS total,
+           count(*) FILTER (WHERE status IN ('open', 'in_progress')) AS open,
+           count(*) FILTER (WHERE status = 'pending') AS pending,
+           count(*) FILTER (WHERE status IN ('resolved', 'closed')) AS resolved,
+           count(*) FILTER (WHERE priority = 'urgent' AND status NOT IN ('resolved', 'closed')) AS urgent
+    FROM support_tickets
+    WHERE NOT archived
+"""
+
+router = APIRouter(prefix="/api/dashboard")
+
+
+class Loaders:
+    """Batched profile and company lookups shared by one dashboard request."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.profiles = db.BatchLoader(self._fetch_profiles)
+        self.companies = db.BatchLoader(self._fetch_companies)
+
+    async def _fetch_profiles(self, user_ids):
+        rows = await self.pool.fetch(
+            "SELECT user_id, full_name, email, role, company_id FROM profiles WHERE user_id = ANY($1::uuid[])",
+            user_ids,
+        )
+        return {str(row["user_id"]): dict(row) for row in rows}
+
+    async def _fetch_companies(self, company_ids):
+        rows = await self.pool.fetch(
+            """
+            SELECT id, name, email, phone, max_support_users, current_support_users, is_active
+            FROM companies WHERE id = ANY($1::uuid[])
+            """,
+            company_ids,
+        )
+        return {str(row["id"]): dict(row) for row in rows}
+
+    async def referenced(self, tickets) -> dict:
+        """Load every profile and company the tickets point at, concurrently."""
+        user_ids = {
+            str(ticket[column]) for ticket in tickets for column in ("created_by", "assigned_to") if ticket[column]
+        }
+        company_ids = {str(ticket["company_id"]) for ticket in tickets if ticket["company_id"]}
+        profiles, companies = await asyncio.gather(
+            self.profiles.load_many(user_ids), self.companies.load_many(company_ids)
+        )
+        return {
+            "profiles": {str(p["user_id"]): p for p in profiles if p is not None},
+            "companies": {str(c["id"]): c for c in companies if c is not None},
+        }
+
+
+def _records(rows) -> list:
+    return [dict(row) for row in rows]
+
+
+@router.get("/student")
+async def student_dashboard(user: AuthContext = Depends(get_current_user)):
+    """Profile, enrollments with their courses, and open courses for a student."""
+    pool = db.require_pool()
+    loaders = Loaders(pool)
+    profile, company, enrollments, courses = await asyncio.gather(
+        loaders.profiles.load(user.user_id),
+        loaders.companies.load(user.company_id),
+        pool.fetch(
+            """
+            SELECT e.id, e.course_id, e.status, e.enrolled_at, e.completed_at
+            FROM enrollments e WHERE e.student_id = $1
+            ORDER BY e.enrolled_at DESC
+            """,
+            user.user_id,
+        ),
+        pool.fetch(
+            """
+            SELECT id, title, description, instructor, duration, level, category, price,
+                   max_students, current_students, start_date, end_date
+            FROM courses WHERE is_active = true
+            ORDER BY created_at DESC
+            """
+        ),
+    )
+    return {
+        "profile": profile,
+        "company": company,
+        "enrollments": _records(enrollments),
+        # Enrolled courses are looked up in here by course_id rather than repeated per enrollment
+        "courses": _records(courses),
+    }
+
+
+@router.get("/client")
+async def client_dashboard(user: AuthContext = Depends(require_role("client", "admin"))):
+    """Profile, company and the company's recent tickets for a client user."""
+    pool = db.require_pool()
+    loaders = Loaders(pool)
+    tickets, stats, profile, company = await asyncio.gather(
+        pool.fetch(
+            f"""
+            SELECT {TICKET_COLUMNS} FROM support_tickets
+            WHERE NOT archived AND (company_id = $1 OR created_by = $2)
+            ORDER BY created_at DESC LIMIT $3
+            """,
+            user.company_id,
+            user.user_id,
+            DASHBOARD_TICKET_LIMIT,
+        ),
+        pool.fetchrow(TICKET_STATS_QUERY + " AND (company_id = $1 OR created_by = $2)", user.company_id, user.user_id),
+        loaders.profiles.load(user.user_id),
+        loaders.companies.load(user.company_id),
+    )
+    return {
+        "profile": profile,
+        "company": company,
+        "ticket_stats": dict(stats),
+        "tickets": _records(tickets),
+        **await loaders.referenced(tickets),
+    }
+
+
+@router.get("/admin")
+async def admin_dashboard(admin=Depends(require_admin)):
+    """Companies, recent tickets, pending public inquiries and headline counts."""
+    pool = db.require_pool()
+    loaders = Loaders(pool)
+    companies, tickets, ticket_stats, inquiries, inquiry_stats = await asyncio.gather(
+        pool.fetch(
+            """
+            SELECT id, name, email, phone, address, max_support_users, current_support_users, created_at
+            FROM companies WHERE is_active = true ORDER BY name
+            """
+        ),
+        pool.fetch(
+            f"SELECT {TICKET_COLUMNS} FROM support_tickets WHERE NOT archived ORDER BY created_at DESC LIMIT $1",
+            DASHBOARD_TICKET_LIMIT,
+        ),
+        pool.fetchrow(TICKET_STATS_QUERY),
+        pool.fetch(
+            """
+            SELECT id, name, email, company_name, subject, priority, status, created_at
+            FROM public_support_inquiries WHERE status = 'pending'
+            ORDER BY created_at DESC LIMIT $1
+            """,
+            DASHBOARD_INQUIRY_LIMIT,
+        ),
+        pool.fetchrow(
+            """
+            SELECT count(*) AS total, count(*) FILTER (WHERE status = 'pending') AS pending
+            FROM public_support_inquiries
+            """
+        ),
+    )
+    return {
+        "stats": {
+            "total_companies": len(companies),
+            "tickets": dict(ticket_stats),
+            "inquiries": dict(inquiry_stats),
+        },
+        "company_list": _records(companies),
+        "tickets": _records(tickets),
+        "pending_inquiries": _records(inquiries),
+        **await loaders.referenced(tickets),
+    }
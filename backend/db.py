@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+
+import asyncpg
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+# Set to 0 when connecting through a transaction-mode pooler such as PgBouncer
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+
+_pool = None
+
+
+async def connect():
+    """Open the shared connection pool if ``DATABASE_URL`` is configured."""
+    global _pool
+    if not DATABASE_URL:
+        logger.warning("DATABASE_URL is not set; database-backed features are disabled")
+        return None
+    try:
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        )
+    except (OSError, asyncpg.PostgresError) as e:
+        logger.error("Could not connect to the database: %s", e)
+    return _pool
+
+
+async def close():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool():
+    return _pool
+
+
+def require_pool():
+    """Return the pool, or fail the request with 503 when there is no database."""
+    if _pool is None:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+    return _pool
+
+
+class BatchLoader:
+    """Coalesce lookups made in the same event-loop turn into one query.
+
+    ``fetch`` receives the de-duplicated list of keys and returns a mapping
+    of key to value; keys it leaves out resolve to None. Results are kept for
+    the loader's lifetime, so create one loader per request.
+    """
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._results = {}
+        self._queued = {}
+
+    def load(self, key):
+        if key is None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(None)
+            return future
+        future = self._results.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._results[key] = future
+            if not self._queued:
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+            self._queued[key] = future
+        return future
+
+    async def load_many(self, keys) -> list:
+        return await asyncio.gather(*(self.load(key) for key in keys))
+
+    async def _dispatch(self):
+        queued, self._queued = self._queued, {}
+        try:
+            found = await self._fetch(list(queued))
+        except Exception as e:
+            for future in queued.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in queued.items():
+            if not future.done():
+                future.set_result(found.get(key))
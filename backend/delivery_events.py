@@ -0,0 +1,230 @@
+"""Ingestion of delivery webhooks from the email provider.
+
+Resend signs webhooks with Svix. The endpoint verifies the signature, puts a
+compact row into an in-memory buffer and answers 202 straight away; a
+background task writes the buffer to ``delivery_events`` in multi-row
+inserts, either when a batch fills up or every ``DELIVERY_FLUSH_INTERVAL``
+seconds. When the buffer is full the endpoint answers 503 so the provider
+retries later instead of the event being lost.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+import asyncpg
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+import db
+from suppression import suppressions
+
+logger = logging.getLogger(__name__)
+
+RESEND_WEBHOOK_SECRET = os.environ.get("RESEND_WEBHOOK_SECRET")
+DELIVERY_BATCH_SIZE = int(os.environ.get("DELIVERY_BATCH_SIZE", "1000"))
+DELIVERY_FLUSH_INTERVAL = float(os.environ.get("DELIVERY_FLUSH_INTERVAL", "1.0"))
+DELIVERY_BUFFER_MAX = int(os.environ.get("DELIVERY_BUFFER_MAX", "100000"))
+# Reject webhooks whose timestamp is further than this from our clock
+WEBHOOK_TOLERANCE_SECONDS = 300
+SUPPRESSING_EVENTS = ("email.bounced", "email.complained")
+# Rows the database will never accept, however often they are retried
+UNSTORABLE_ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+_INSERT_EVENTS = """
+    INSERT INTO delivery_events (svix_id, event_type, email_id, recipient, request_id, occurred_at, payload)
+    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::text[], $5::text[], $6::timestamptz[], $7::jsonb[])
+    ON CONFLICT (svix_id) DO NOTHING
+"""
+
+
+def _webhook_key(secret: str) -> bytes:
+    return base64.b64decode(secret.split("_", 1)[1] if secret.startswith("whsec_") else secret)
+
+
+def verify_signature(secret: str, msg_id: str, timestamp: str, signature_header: str, body: bytes) -> bool:
+    """Check a Svix webhook signature and timestamp."""
+    if not (msg_id and timestamp and signature_header):
+        return False
+    try:
+        sent_at = int(timestamp)
+    except ValueError:
+        return False
+    if abs(time.time() - sent_at) > WEBHOOK_TOLERANCE_SECONDS:
+        return False
+    signed = f"{msg_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(_webhook_key(secret), signed, hashlib.sha256).digest()).decode()
+    # The header may carry several space-separated "v1,<signature>" entries
+    for candidate in signature_header.split():
+        version, _, value = candidate.partition(",")
+        if version == "v1" and hmac.compare_digest(value, expected):
+            return True
+    return False
+
+
+def _parse_timestamp(value):
+    if value:
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc)
+
+
+def _request_id_from_tags(tags):
+    if isinstance(tags, dict):
+        return tags.get("request_id")
+    if isinstance(tags, list):
+        for tag in tags:
+            if isinstance(tag, dict) and tag.get("name") == "request_id":
+                return tag.get("value")
+    return None
+
+
+def event_row(msg_id: str, event: dict, raw_body: str) -> tuple:
+    """Reduce a webhook payload to a ``delivery_events`` row."""
+    data = event.get("data") or {}
+    recipients = data.get("to") or []
+    recipient = recipients[0] if isinstance(recipients, list) and recipients else recipients or None
+    return (
+        msg_id,
+        event.get("type", "unknown"),
+        data.get("email_id"),
+        recipient,
+        _request_id_from_tags(data.get("tags")),
+        _parse_timestamp(event.get("created_at")),
+        raw_body,
+    )
+
+
+class DeliveryEventBuffer:
+    """Collect event rows in memory and write them to the database in batches."""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.received = 0
+        self.written = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._rows = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, row: tuple) -> bool:
+        if len(self._rows) >= self.max_pending:
+            self.rejected += 1
+            return False
+        self._rows.append(row)
+        self.received += 1
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        pool = db.get_pool()
+        if not self._rows or pool is None:
+            return
+        rows, self._rows = self._rows, []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            try:
+                written = await self._write(pool, batch)
+            except BaseException as e:
+                # Put the unwritten rows back ahead of anything that arrived meanwhile. This
+                # includes cancellation by stop(), whose final flush then writes them; a batch
+                # that did commit before the cancel is skipped there by ON CONFLICT.
+                self._rows[:0] = rows[start:]
+                if not isinstance(e, Exception):
+                    raise
+                logger.exception("Failed to write %d delivery event(s); will retry", len(rows) - start)
+                return
+            self.written += written
+
+    async def _write(self, pool, batch: list) -> int:
+        async with pool.acquire() as conn:
+            try:
+                await conn.execute(_INSERT_EVENTS, *(list(column) for column in zip(*batch)))
+                return len(batch)
+            except UNSTORABLE_ROW_ERRORS:
+                # One bad row (a value too long for its column, a NUL in the payload) fails
+                # the whole statement; retrying it as is would block ingestion for good
+                pass
+            written = 0
+            for row in batch:
+                try:
+                    await conn.execute(_INSERT_EVENTS, *([value] for value in row))
+                except UNSTORABLE_ROW_ERRORS as e:
+                    self.dropped += 1
+                    logger.error("Dropped delivery event %s that cannot be stored: %s", row[0], e)
+                else:
+                    written += 1
+            return written
+
+
+buffer = DeliveryEventBuffer(DELIVERY_BATCH_SIZE, DELIVERY_FLUSH_INTERVAL, DELIVERY_BUFFER_MAX)
+
+router = APIRouter()
+
+
+@router.post("/api/webhooks/resend", status_code=202)
+async def receive_resend_webhook(request: Request):
+    """Accept a delivery event from Resend and queue it for storage."""
+    if not RESEND_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+    if db.get_pool() is None:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+
+    body = await request.body()
+    msg_id = request.headers.get("svix-id")
+    if not verify_signature(
+        RESEND_WEBHOOK_SECRET,
+        msg_id,
+        request.headers.get("svix-timestamp"),
+        request.headers.get("svix-signature"),
+        body,
+    ):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    row = event_row(msg_id, event, body.decode("utf-8"))
+    if not buffer.add(row):
+        return JSONResponse({"detail": "Event buffer is full"}, status_code=503, headers={"Retry-After": "5"})
+    if row[1] in SUPPRESSING_EVENTS and row[3]:
+        suppressions.record_feedback(row[3])
+    return {"status": "accepted"}
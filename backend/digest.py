@@ -0,0 +1,158 @@
+"""Digest mode for admin contact notifications.
+
+With ``ADMIN_DIGEST_ENABLED=true`` the per-submission admin email is replaced
+by one summary email per window, grouped by inquiry type. A window opens
+with the first queued submission and is sent after
+``ADMIN_DIGEST_WINDOW_SECONDS`` or once ``ADMIN_DIGEST_MAX_ITEMS``
+submissions have queued, whichever comes first. Urgent submissions (an
+inquiry type in ``ADMIN_DIGEST_URGENT_TYPES`` or a message matching
+``ADMIN_DIGEST_URGENT_PATTERN``) bypass the digest and are sent immediately.
+
+A digest that fails to send is retried with the next window, up to
+``ADMIN_DIGEST_MAX_ATTEMPTS`` times; after that its submissions are sent as
+individual notifications, so a digest the provider will never accept (one
+too large, say) cannot hold back every submission queued behind it.
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime
+
+import email_templates
+import mailer
+
+logger = logging.getLogger(__name__)
+
+ADMIN_DIGEST_ENABLED = os.environ.get("ADMIN_DIGEST_ENABLED", "false").lower() == "true"
+ADMIN_DIGEST_WINDOW_SECONDS = float(os.environ.get("ADMIN_DIGEST_WINDOW_SECONDS", "300"))
+ADMIN_DIGEST_MAX_ITEMS = int(os.environ.get("ADMIN_DIGEST_MAX_ITEMS", "100"))
+ADMIN_DIGEST_MAX_ATTEMPTS = int(os.environ.get("ADMIN_DIGEST_MAX_ATTEMPTS", "3"))
+# Concurrent sends when a failed digest falls back to individual notifications
+ADMIN_DIGEST_FALLBACK_CONCURRENCY = 5
+ADMIN_DIGEST_URGENT_TYPES = frozenset(
+    item.strip().lower() for item in os.environ.get("ADMIN_DIGEST_URGENT_TYPES", "client_support").split(",") if item.strip()
+)
+# Public support inquiries embed "Priority: <level>" in the message body
+ADMIN_DIGEST_URGENT_PATTERN = re.compile(
+    os.environ.get("ADMIN_DIGEST_URGENT_PATTERN", r"priority:\s*(urgent|high)\b"), re.IGNORECASE
+)
+ADMIN_NOTIFICATION_ADDRESS = "delivered@resend.dev"
+
+
+class AdminDigest:
+    def __init__(self, enabled: bool, window_seconds: float, max_items: int):
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.max_items = max_items
+        self.digests_sent = 0
+        self.notifications_coalesced = 0
+        self._items = []
+        # Leading items put back by a failed send, and how many sends have failed in a row
+        self._retrying = 0
+        self._failures = 0
+        self._window_start = None
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = None
+
+    def is_urgent(self, request) -> bool:
+        return (
+            request.inquiry_type.lower() in ADMIN_DIGEST_URGENT_TYPES
+            or ADMIN_DIGEST_URGENT_PATTERN.search(request.message) is not None
+        )
+
+    def add(self, request, received_at: datetime) -> None:
+        if not self._items:
+            self._window_start = received_at
+            self._has_items.set()
+        self._items.append((request, received_at))
+        # Items being retried do not count, or each new one would trigger another failing send
+        if len(self._items) - self._retrying >= self.max_items:
+            self._full.set()
+
+    def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.window_seconds)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        if not self._items:
+            return
+        items, self._items = self._items, []
+        self._retrying = 0
+        window_start = self._window_start
+        self._has_items.clear()
+        self._full.clear()
+
+        groups = {}
+        for request, received_at in items:
+            groups.setdefault(request.inquiry_type, []).append((request, received_at))
+        try:
+            await mailer.send_email({
+                "from": "onboarding@resend.dev",
+                "to": ADMIN_NOTIFICATION_ADDRESS,
+                "subject": f"Contact Form Digest - {len(items)} new submission(s)",
+                "html": email_templates.contact_admin_digest_html(groups, window_start, datetime.now()),
+            })
+        except Exception as e:
+            self._failures += 1
+            if self._failures < ADMIN_DIGEST_MAX_ATTEMPTS:
+                logger.error("Error sending admin digest of %d submission(s): %s", len(items), e)
+                # Retry with the next window rather than losing the notifications
+                self._items[:0] = items
+                self._retrying = len(items)
+                self._window_start = window_start
+                self._has_items.set()
+                return
+            logger.error(
+                "Admin digest of %d submission(s) failed %d times (%s); sending them individually",
+                len(items),
+                self._failures,
+                e,
+            )
+            self._failures = 0
+            await self._send_individually(items)
+            return
+        self._failures = 0
+        self.digests_sent += 1
+        self.notifications_coalesced += len(items)
+        logger.info("Sent admin digest covering %d submission(s)", len(items))
+
+    async def _send_individually(self, items: list) -> None:
+        limit = asyncio.Semaphore(ADMIN_DIGEST_FALLBACK_CONCURRENCY)
+
+        async def send(request, received_at):
+            async with limit:
+                await mailer.send_email({
+                    "from": "onboarding@resend.dev",
+                    "to": ADMIN_NOTIFICATION_ADDRESS,
+                    "subject": f"New Contact Form Submission - {request.inquiry_type}",
+                    "html": email_templates.contact_admin_notification_html(request, received_at),
+                })
+
+        results = await asyncio.gather(*(send(*item) for item in items), return_exceptions=True)
+        failed = sum(isinstance(result, Exception) for result in results)
+        if failed:
+            logger.error("Dropped %d of %d admin notification(s) that could not be sent", failed, len(items))
+
+
+admin_digest = AdminDigest(ADMIN_DIGEST_ENABLED, ADMIN_DIGEST_WINDOW_SECONDS, ADMIN_DIGEST_MAX_ITEMS)
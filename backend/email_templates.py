@@ -0,0 +1,282 @@
+from datetime import datetime
+
+
+def contact_confirmation_html(request) -> str:
+    """Confirmation sent to the person who submitted the contact form"""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Thank You for Contacting Us</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Thank You for Contacting Azellar</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <p>Dear {request.name},</p>
+                
+                <p>Thank you for reaching out to Azellar! We have received your message regarding <strong>{request.inquiry_type}</strong>.</p>
+                
+                <div style="background: #f8fafc; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p><strong>Your Message:</strong></p>
+                    <p style="font-style: italic;">{request.message}</p>
+                </div>
+                
+                <p>Our team will review your message and get back to you within 24 hours.</p>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://azellar.com" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Visit Our Website</a>
+                </div>
+                
+                <p>Best regards,<br>
+                The Azellar Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+
+def contact_admin_notification_html(request, received_at: datetime) -> str:
+    """Notification sent to the Azellar team for a contact form submission"""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>New Contact Form Submission</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">New Contact Form Submission</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <h2>Contact Details:</h2>
+                <ul style="list-style: none; padding: 0;">
+                    <li style="margin: 10px 0;"><strong>Name:</strong> {request.name}</li>
+                    <li style="margin: 10px 0;"><strong>Email:</strong> {request.email}</li>
+                    <li style="margin: 10px 0;"><strong>Inquiry Type:</strong> {request.inquiry_type}</li>
+                    <li style="margin: 10px 0;"><strong>Date:</strong> {received_at.strftime('%Y-%m-%d %H:%M:%S')}</li>
+                </ul>
+                
+                <h3>Message:</h3>
+                <div style="background: #f8fafc; padding: 15px; border-radius: 8px; border-left: 4px solid #22d3ee;">
+                    <p>{request.message}</p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+
+def contact_admin_digest_html(groups: dict, window_start: datetime, window_end: datetime) -> str:
+    """Summary of several contact form submissions, grouped by inquiry type
+
+    ``groups`` maps each inquiry type to a list of ``(request, received_at)``.
+    """
+    sections = ""
+    for inquiry_type, submissions in groups.items():
+        items = "".join(
+            f"""
+                    <li style="margin: 12px 0; padding: 12px; background: #f8fafc; border-radius: 8px; border-left: 4px solid #22d3ee;">
+                        <strong>{request.name}</strong> &lt;{request.email}&gt; - {received_at.strftime('%Y-%m-%d %H:%M:%S')}
+                        <p style="margin: 8px 0 0 0;">{request.message}</p>
+                    </li>"""
+            for request, received_at in submissions
+        )
+        sections += f"""
+                <h3>{inquiry_type} ({len(submissions)})</h3>
+                <ul style="list-style: none; padding: 0;">{items}
+                </ul>
+"""
+    total = sum(len(submissions) for submissions in groups.values())
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Contact Form Digest</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Contact Form Digest</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <p>{total} submission(s) received between {window_start.strftime('%Y-%m-%d %H:%M:%S')} and {window_end.strftime('%Y-%m-%d %H:%M:%S')}.</p>
+{sections}
+            </div>
+        </body>
+        </html>
+        """
+
+
+def ticket_bulk_update_html(agent_name: str, summary: str, tickets: list) -> str:
+    """One notice to a support agent covering every ticket of theirs a bulk operation changed
+
+    ``tickets`` are mappings with ``ticket_number``, ``title``, ``status`` and ``priority``.
+    """
+    rows = "".join(
+        f"""
+                    <tr>
+                        <td style="padding: 8px; border-bottom: 1px solid #e2e8f0;">{ticket['ticket_number']}</td>
+                        <td style="padding: 8px; border-bottom: 1px solid #e2e8f0;">{ticket['title']}</td>
+                        <td style="padding: 8px; border-bottom: 1px solid #e2e8f0;">{ticket['status']}</td>
+                        <td style="padding: 8px; border-bottom: 1px solid #e2e8f0;">{ticket['priority']}</td>
+                    </tr>"""
+        for ticket in tickets
+    )
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Ticket Update</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Ticket Update</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <p>Hi {agent_name},</p>
+                <p>{summary}</p>
+                <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                    <tr style="background: #f0f9ff; text-align: left;">
+                        <th style="padding: 8px;">Ticket</th>
+                        <th style="padding: 8px;">Title</th>
+                        <th style="padding: 8px;">Status</th>
+                        <th style="padding: 8px;">Priority</th>
+                    </tr>{rows}
+                </table>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://azellar.com/support" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Open the Support Portal</a>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+
+def ticket_escalation_html(ticket: dict) -> str:
+    """Escalation notice for a ticket that has gone without activity past its SLA
+
+    ``ticket`` is the scheduled job payload built by ``escalation.escalate_batch``.
+    """
+    assignee = ticket["assignee_name"] or "Unassigned"
+    repeat = " again" if ticket["previously_escalated_at"] else ""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Ticket Escalation</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #991b1b, #f97316); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Ticket Escalated</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <p>Ticket {ticket['ticket_number']} has been escalated{repeat}: it has had no activity for {ticket['idle_hours']} hours, past the {ticket['sla_hours']} hour SLA for {ticket['priority']} priority tickets.</p>
+                
+                <div style="background: #fff7ed; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                    <p><strong>Title:</strong> {ticket['title']}</p>
+                    <p><strong>Priority:</strong> {ticket['priority']}</p>
+                    <p><strong>Status:</strong> {ticket['status']}</p>
+                    <p><strong>Assigned to:</strong> {assignee}</p>
+                </div>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://azellar.com/support" style="background: #991b1b; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Open the Support Portal</a>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+
+
+def enrollment_confirmation_html(request) -> str:
+    """Confirmation sent to a student after enrolling in a course"""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Course Enrollment Confirmation</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Welcome to Azellar Academy!</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <h2>Enrollment Confirmed!</h2>
+                <p>Dear {request.student_name},</p>
+                
+                <p>Congratulations! You have successfully enrolled in <strong>{request.course_name}</strong>.</p>
+                
+                <div style="background: #f0f9ff; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #22d3ee;">
+                    <h3>Course Details:</h3>
+                    <ul style="list-style: none; padding: 0;">
+                        <li style="margin: 8px 0;"><strong>Course Name:</strong> {request.course_name}</li>
+                        <li style="margin: 8px 0;"><strong>Duration:</strong> {request.course_details.get('duration', 'TBD')}</li>
+                        <li style="margin: 8px 0;"><strong>Instructor:</strong> {request.course_details.get('instructor', 'TBD')}</li>
+                        <li style="margin: 8px 0;"><strong>Start Date:</strong> {request.course_details.get('start_date', 'TBD')}</li>
+                    </ul>
+                </div>
+                
+                <p>You will receive course materials and joining instructions 1 week before the start date.</p>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://azellar.com/dashboard" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">View Your Dashboard</a>
+                </div>
+                
+                <p>If you have any questions, please don't hesitate to contact us.</p>
+                
+                <p>Best regards,<br>
+                The Azellar Academy Team</p>
+            </div>
+        </body>
+        </html>
+        """
+
+
+def course_reminder_html(student_name: str, course_name: str, course_details: dict) -> str:
+    """Joining instructions sent to an enrolled student a week before the course starts"""
+    return f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Your Course Starts Soon</title>
+        </head>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+            <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
+                <h1 style="color: white; margin: 0;">Your Course Starts Soon</h1>
+            </div>
+            
+            <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
+                <p>Dear {student_name},</p>
+                
+                <p><strong>{course_name}</strong> starts on <strong>{course_details.get('start_date', 'TBD')}</strong>. Here is everything you need to join.</p>
+                
+                <div style="background: #f0f9ff; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #22d3ee;">
+                    <h3>Joining Instructions:</h3>
+                    <ul style="list-style: none; padding: 0;">
+                        <li style="margin: 8px 0;"><strong>Course Name:</strong> {course_name}</li>
+                        <li style="margin: 8px 0;"><strong>Duration:</strong> {course_details.get('duration', 'TBD')}</li>
+                        <li style="margin: 8px 0;"><strong>Instructor:</strong> {course_details.get('instructor', 'TBD')}</li>
+                        <li style="margin: 8px 0;"><strong>Start Date:</strong> {course_details.get('start_date', 'TBD')}</li>
+                    </ul>
+                </div>
+                
+                <p>Course materials and session links are available from your dashboard.</p>
+                
+                <div style="text-align: center; margin: 30px 0;">
+                    <a href="https://azellar.com/dashboard" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Open Course Materials</a>
+                </div>
+                
+                <p>Best regards,<br>
+                The Azellar Academy Team</p>
+            </div>
+        </body>
+        </html>
+        """
@@ -0,0 +1,214 @@
+"""Escalation of urgent and high priority tickets left without activity.
+
+A ticket that is still open, in progress or pending is due for escalation
+once its ``updated_at`` is older than the SLA for its priority
+(``SLA_ESCALATION_URGENT_HOURS``, ``SLA_ESCALATION_HIGH_HOURS``). The scan
+reads the partial index from migration 012, which holds only unfinished
+urgent/high tickets, in ``(updated_at, id)`` order from a per-priority
+high-water mark in ``ticket_escalation_marks``; everything behind the mark
+has been dealt with, so a run costs the tickets that became due since the
+last one rather than the size of the backlog.
+
+That order is sound because ``updated_at`` only moves forward (migration 010
+stamps it on every write): a ticket someone works on, re-prioritizes or
+reopens jumps ahead of the mark and becomes due again one SLA later. Stamping
+``escalated_at`` counts as a write too, so a ticket nobody touches is
+escalated again every SLA period.
+
+Each batch of ``SLA_ESCALATION_BATCH_SIZE`` tickets is stamped, queued as
+``ticket_escalation`` jobs in ``scheduled_emails`` and the mark advanced in one
+transaction, so a crash neither loses nor repeats a notification; the email
+scheduler sends them to the assignee and ``SLA_ESCALATION_NOTIFY``. Every
+worker runs the loop, but a session advisory lock lets only one of them scan
+at a time.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends
+
+import db
+from auth import require_admin
+from digest import ADMIN_NOTIFICATION_ADDRESS
+from scheduler import email_scheduler
+from tickets import NIL_UUID
+
+logger = logging.getLogger(__name__)
+
+SLA_ESCALATION_ENABLED = os.environ.get("SLA_ESCALATION_ENABLED", "true").lower() == "true"
+SLA_ESCALATION_URGENT_HOURS = float(os.environ.get("SLA_ESCALATION_URGENT_HOURS", "4"))
+SLA_ESCALATION_HIGH_HOURS = float(os.environ.get("SLA_ESCALATION_HIGH_HOURS", "24"))
+SLA_ESCALATION_BATCH_SIZE = int(os.environ.get("SLA_ESCALATION_BATCH_SIZE", "200"))
+SLA_ESCALATION_INTERVAL_SECONDS = float(os.environ.get("SLA_ESCALATION_INTERVAL_SECONDS", "300"))
+SLA_ESCALATION_NOTIFY = os.environ.get("SLA_ESCALATION_NOTIFY", ADMIN_NOTIFICATION_ADDRESS)
+# Priorities covered by the partial index, with their SLA in hours
+SLA_HOURS = {"urgent": SLA_ESCALATION_URGENT_HOURS, "high": SLA_ESCALATION_HIGH_HOURS}
+# Arbitrary application-wide key for pg_try_advisory_lock
+ESCALATION_LOCK_KEY = 0x7A11A7
+MARK_START = (datetime.min.replace(tzinfo=timezone.utc), NIL_UUID)
+
+# The first line repeats the index predicate so generic plans can use the index
+ESCALATION_BATCH_QUERY = """
+    WITH due AS (
+        SELECT id, archived, created_at, updated_at, escalated_at FROM support_tickets
+        WHERE status IN ('open', 'in_progress', 'pending') AND priority IN ('urgent', 'high') AND NOT archived
+          AND priority = $1
+          AND (updated_at, id) > ($2, $3)
+          AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => $4)
+        ORDER BY updated_at, id
+        LIMIT $5
+        FOR UPDATE
+    ), escalated AS (
+        UPDATE support_tickets t SET escalated_at = CURRENT_TIMESTAMP
+        FROM due
+        WHERE (t.id, t.archived, t.created_at) = (due.id, due.archived, due.created_at)
+        RETURNING t.id, t.ticket_number, t.title, t.priority, t.status, t.assigned_to,
+                  due.updated_at AS idle_since, due.escalated_at AS previously_escalated_at
+    )
+    SELECT escalated.*, p.email AS assignee_email, p.full_name AS assignee_name
+    FROM escalated LEFT JOIN profiles p ON p.user_id = escalated.assigned_to
+    ORDER BY idle_since, id
+"""
+
+
+def _job(ticket, sla_hours: float) -> tuple:
+    """(dedupe key, payload) of the notification for one escalated ticket."""
+    idle_hours = (datetime.now(timezone.utc) - ticket["idle_since"]).total_seconds() / 3600
+    recipients = [address for address in (ticket["assignee_email"], SLA_ESCALATION_NOTIFY) if address]
+    payload = {
+        "to": list(dict.fromkeys(recipients)),
+        "ticket_id": str(ticket["id"]),
+        "ticket_number": ticket["ticket_number"],
+        "title": ticket["title"],
+        "priority": ticket["priority"],
+        "status": ticket["status"],
+        "sla_hours": f"{sla_hours:g}",
+        "idle_hours": f"{idle_hours:.0f}",
+        "assignee_name": ticket["assignee_name"] or ticket["assignee_email"],
+        "previously_escalated_at": (
+            ticket["previously_escalated_at"].isoformat() if ticket["previously_escalated_at"] else None
+        ),
+    }
+    return f"ticket_escalation:{ticket['id']}:{ticket['idle_since'].isoformat()}", json.dumps(payload)
+
+
+async def escalate_batch(conn, priority: str, mark: tuple) -> tuple:
+    """Escalate one batch of due ``priority`` tickets past ``mark``; returns (new mark, escalated, queued jobs)."""
+    sla_hours = SLA_HOURS[priority]
+    async with conn.transaction():
+        tickets = await conn.fetch(
+            ESCALATION_BATCH_QUERY, priority, *mark, sla_hours * 3600, SLA_ESCALATION_BATCH_SIZE
+        )
+        if not tickets:
+            return mark, 0, []
+        keys, payloads = zip(*(_job(ticket, sla_hours) for ticket in tickets))
+        jobs = await conn.fetch(
+            """
+            INSERT INTO scheduled_emails (kind, dedupe_key, run_at, payload)
+            SELECT 'ticket_escalation', job.dedupe_key, CURRENT_TIMESTAMP, job.payload::jsonb
+            FROM unnest($1::text[], $2::text[]) AS job(dedupe_key, payload)
+            ON CONFLICT (dedupe_key) DO NOTHING
+            RETURNING id, run_at
+            """,
+            list(keys),
+            list(payloads),
+        )
+        mark = (tickets[-1]["idle_since"], tickets[-1]["id"])
+        await conn.execute(
+            """
+            INSERT INTO ticket_escalation_marks (priority, last_updated_at, last_ticket_id, escalated)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (priority) DO UPDATE
+                SET last_updated_at = EXCLUDED.last_updated_at, last_ticket_id = EXCLUDED.last_ticket_id,
+                    escalated = ticket_escalation_marks.escalated + EXCLUDED.escalated,
+                    updated_at = CURRENT_TIMESTAMP
+            """,
+            priority,
+            *mark,
+            len(tickets),
+        )
+    return mark, len(tickets), jobs
+
+
+class TicketEscalator:
+    def __init__(self):
+        self.escalated = 0
+        self._task = None
+
+    async def run_once(self) -> dict:
+        """Escalate every due ticket now; returns counts per priority, or {} if another worker holds the lock."""
+        pool = db.get_pool()
+        if pool is None:
+            return {}
+        escalated = {}
+        async with pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", ESCALATION_LOCK_KEY):
+                return {}
+            try:
+                marks = {
+                    row["priority"]: (row["last_updated_at"], row["last_ticket_id"])
+                    for row in await conn.fetch("SELECT * FROM ticket_escalation_marks")
+                }
+                for priority in SLA_HOURS:
+                    mark, total = marks.get(priority, MARK_START), 0
+                    while True:
+                        # Rows changed while we waited on their lock drop out, so only an empty batch means done
+                        mark, count, jobs = await escalate_batch(conn, priority, mark)
+                        if not count:
+                            break
+                        total += count
+                        for job in jobs:
+                            email_scheduler.enqueue(job["run_at"], job["id"])
+                    escalated[priority] = total
+                    if total:
+                        logger.warning("Escalated %d %s priority ticket(s) past their SLA", total, priority)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", ESCALATION_LOCK_KEY)
+        self.escalated += sum(escalated.values())
+        return escalated
+
+    def start(self):
+        if SLA_ESCALATION_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Ticket escalation failed")
+            await asyncio.sleep(SLA_ESCALATION_INTERVAL_SECONDS)
+
+
+ticket_escalator = TicketEscalator()
+
+router = APIRouter(prefix="/api/admin/escalations", dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+async def escalation_state():
+    """SLA per priority and how far the escalator has scanned each one."""
+    rows = await db.require_pool().fetch("SELECT * FROM ticket_escalation_marks ORDER BY priority")
+    return {
+        "sla_hours": SLA_HOURS,
+        "marks": [dict(row) for row in rows],
+    }
+
+
+@router.post("/run")
+async def run_escalation():
+    """Run an escalation pass now and report how many tickets were escalated."""
+    db.require_pool()
+    return {"escalated": await ticket_escalator.run_once()}
@@ -0,0 +1,215 @@
+"""Streaming reporting exports of tickets, enrollments and contact submissions.
+
+Rows are read through a server-side cursor inside a read-only,
+repeatable-read transaction and written out ``EXPORT_CHUNK_ROWS`` at a time,
+so memory stays flat however large the table is and the export is one
+consistent snapshot. Column selection and the date range are part of the
+query; nothing is filtered in Python.
+
+Parquet is written with ``pyarrow`` (in requirements.txt); an install
+without it answers Parquet requests with 501. Each chunk becomes one Parquet
+row group.
+"""
+import csv
+import io
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import db
+from auth import require_admin
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", "5000"))
+
+
+class ExportSpec(NamedTuple):
+    date_column: str
+    # Column name -> Arrow type name; also the whitelist of exportable columns
+    columns: dict
+
+
+EXPORTS = {
+    "support_tickets": ExportSpec(
+        "created_at",
+        {
+            "id": "string",
+            "ticket_number": "string",
+            "title": "string",
+            "description": "string",
+            "priority": "string",
+            "status": "string",
+            "category": "string",
+            "created_by": "string",
+            "assigned_to": "string",
+            "company_id": "string",
+            "created_at": "timestamp",
+            "updated_at": "timestamp",
+            "resolved_at": "timestamp",
+            "closed_at": "timestamp",
+        },
+    ),
+    "enrollments": ExportSpec(
+        "enrolled_at",
+        {
+            "id": "string",
+            "student_id": "string",
+            "course_id": "string",
+            "status": "string",
+            "enrolled_at": "timestamp",
+            "completed_at": "timestamp",
+            "created_at": "timestamp",
+            "updated_at": "timestamp",
+        },
+    ),
+    "contact_submissions": ExportSpec(
+        "created_at",
+        {
+            "id": "string",
+            "name": "string",
+            "email": "string",
+            "message": "string",
+            "inquiry_type": "string",
+            "status": "string",
+            "created_at": "timestamp",
+            "updated_at": "timestamp",
+        },
+    ),
+}
+
+router = APIRouter(prefix="/api/admin/export", dependencies=[Depends(require_admin)])
+
+
+def build_query(table: str, columns: list, since: datetime = None, until: datetime = None, status: str = None):
+    """Return the export query and its arguments for whitelisted ``columns``."""
+    spec = EXPORTS[table]
+    # uuid columns are cast in SQL so every value leaves Postgres ready to write
+    select = ", ".join(f"{c}::text AS {c}" if spec.columns[c] == "string" else c for c in columns)
+    conditions, args = [], []
+    if since is not None:
+        args.append(since)
+        conditions.append(f"{spec.date_column} >= ${len(args)}")
+    if until is not None:
+        args.append(until)
+        conditions.append(f"{spec.date_column} < ${len(args)}")
+    if status is not None:
+        args.append(status)
+        conditions.append(f"status = ${len(args)}")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT {select} FROM {table}{where} ORDER BY {spec.date_column}", args
+
+
+async def _chunks(query: str, args: list):
+    pool = db.require_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            cursor = await conn.cursor(query, *args)
+            while True:
+                rows = await cursor.fetch(EXPORT_CHUNK_ROWS)
+                if not rows:
+                    return
+                yield rows
+
+
+async def stream_csv(query: str, args: list, columns: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in _chunks(query, args):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file object handing out whatever has been written since the last ``take``."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def _arrow_schema(table: str, columns: list):
+    types = {"string": pa.string(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(c, types[EXPORTS[table].columns[c]]) for c in columns])
+
+
+async def stream_parquet(query: str, args: list, table: str, columns: list):
+    schema = _arrow_schema(table, columns)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="zstd")
+    try:
+        async for rows in _chunks(query, args):
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+@router.get("/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    columns: str = Query(None, description="Comma-separated column names; defaults to all exportable columns"),
+    since: datetime = Query(None),
+    until: datetime = Query(None),
+    status: str = Query(None),
+):
+    """Stream ``table`` as CSV or Parquet, optionally filtered by date range and status."""
+    spec = EXPORTS.get(table)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Unknown export: {table}")
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else list(spec.columns)
+    unknown = [c for c in selected if c not in spec.columns]
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown) or '(none selected)'}")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    db.require_pool()
+    query, args = build_query(table, selected, since, until, status)
+    filename = f"{table}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if format == "parquet":
+        return StreamingResponse(
+            stream_parquet(query, args, table, selected), media_type="application/vnd.apache.parquet", headers=headers
+        )
+    return StreamingResponse(stream_csv(query, args, selected), media_type="text/csv", headers=headers)
@@ -0,0 +1,187 @@
+"""Spam and flood scoring for anonymous contact submissions.
+
+Each message is reduced to a MinHash signature over word shingles and
+indexed with banded LSH, so near-duplicates among recent submissions are
+found by a handful of dictionary lookups instead of comparing against every
+message. Messages shorter than ``INTAKE_MIN_WORDS`` words are left out of the
+near-duplicate check: "call me back" or an empty message sent by two people
+is a coincidence, not a campaign. A per-sender sliding-window counter
+catches a single source submitting repeatedly; going over its limit is
+enough to be refused. Scores are combined and submissions at or above
+``INTAKE_REJECT_SCORE`` are refused before any email is sent.
+
+The per-IP counter is off unless ``INTAKE_MAX_PER_IP`` is set. Behind a
+reverse proxy the client address is the proxy's unless uvicorn trusts it to
+forward the real one (``FORWARDED_ALLOW_IPS``), and counting the proxy would
+reject every visitor once the limit is reached.
+
+State is per worker and only covers the last ``INTAKE_WINDOW_SECONDS``, so a
+flood spread across workers is detected at each worker's share of the rate.
+"""
+import collections
+import os
+import re
+import time
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+INTAKE_FILTER_ENABLED = os.environ.get("INTAKE_FILTER_ENABLED", "true").lower() == "true"
+INTAKE_WINDOW_SECONDS = float(os.environ.get("INTAKE_WINDOW_SECONDS", "600"))
+INTAKE_REJECT_SCORE = float(os.environ.get("INTAKE_REJECT_SCORE", "1.0"))
+# Near-duplicates in the window before a message counts as part of a flood
+INTAKE_DUPLICATE_FLOOD = int(os.environ.get("INTAKE_DUPLICATE_FLOOD", "3"))
+INTAKE_MAX_PER_SENDER = int(os.environ.get("INTAKE_MAX_PER_SENDER", "5"))
+# 0 disables the per-IP counter; see the module docstring before enabling it
+INTAKE_MAX_PER_IP = int(os.environ.get("INTAKE_MAX_PER_IP", "0"))
+INTAKE_MIN_WORDS = int(os.environ.get("INTAKE_MIN_WORDS", "8"))
+INTAKE_SIMILARITY = float(os.environ.get("INTAKE_SIMILARITY", "0.7"))
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+# Candidates verified against the full signature per check; bounds worst-case cost
+MAX_CANDIDATES = 64
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, (1 << 31) - 1, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+_PERM_B = _rng.integers(0, (1 << 31) - 1, size=(NUM_PERMUTATIONS, 1), dtype=np.uint64)
+
+_WORD = re.compile(r"[a-z0-9]+")
+_LINK = re.compile(r"https?://|www\.", re.IGNORECASE)
+
+
+def shingles(text: str) -> np.ndarray:
+    """Hash the word n-grams of ``text`` to 31-bit integers."""
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else [""]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    hashes = np.fromiter((zlib.crc32(gram.encode()) for gram in set(grams)), dtype=np.uint64)
+    return hashes & _MERSENNE_PRIME
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of ``text``: one minimum per permutation."""
+    return ((_PERM_A * shingles(text) + _PERM_B) % _MERSENNE_PRIME).min(axis=1)
+
+
+def _decrement(counts: collections.Counter, key) -> None:
+    if key:
+        counts[key] -= 1
+        if counts[key] <= 0:
+            del counts[key]
+
+
+class IntakeVerdict(NamedTuple):
+    score: float
+    rejected: bool
+    near_duplicates: int
+    sender_count: int
+    ip_count: int
+    reasons: tuple
+
+
+class IntakeFilter:
+    def __init__(self, window_seconds: float = INTAKE_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.checked = 0
+        self.rejected = 0
+        self._next_id = 0
+        self._signatures = {}
+        self._buckets = collections.defaultdict(set)
+        self._sender_counts = collections.Counter()
+        self._ip_counts = collections.Counter()
+        # Insertion-ordered (timestamp, id, band keys, sender, ip) so expiry is a popleft loop
+        self._timeline = collections.deque()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        timeline = self._timeline
+        while timeline and timeline[0][0] < cutoff:
+            _, message_id, band_keys, sender, client_ip = timeline.popleft()
+            self._signatures.pop(message_id, None)
+            for key in band_keys:
+                bucket = self._buckets[key]
+                bucket.discard(message_id)
+                if not bucket:
+                    del self._buckets[key]
+            _decrement(self._sender_counts, sender)
+            _decrement(self._ip_counts, client_ip)
+
+    def check(self, sender: str, message: str, client_ip: str = None, now: float = None) -> IntakeVerdict:
+        """Score a submission and record it for future checks."""
+        now = time.time() if now is None else now
+        self._expire(now)
+        self.checked += 1
+        sender = sender.strip().lower()
+        if not INTAKE_MAX_PER_IP:
+            client_ip = None
+
+        if len(_WORD.findall(message.lower())) >= INTAKE_MIN_WORDS:
+            signature = minhash(message)
+            band_keys = [hash(signature[i:i + LSH_ROWS].tobytes()) ^ i for i in range(0, NUM_PERMUTATIONS, LSH_ROWS)]
+        else:
+            # Too short to tell a copy from a coincidence; only the rate counters apply
+            signature, band_keys = None, []
+
+        candidates = set()
+        for key in band_keys:
+            bucket = self._buckets.get(key)
+            if bucket:
+                candidates.update(bucket)
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+        near_duplicates = 0
+        for candidate in list(candidates)[:MAX_CANDIDATES]:
+            if np.count_nonzero(self._signatures[candidate] == signature) >= INTAKE_SIMILARITY * NUM_PERMUTATIONS:
+                near_duplicates += 1
+
+        message_id = self._next_id
+        self._next_id += 1
+        if signature is not None:
+            self._signatures[message_id] = signature
+        for key in band_keys:
+            self._buckets[key].add(message_id)
+        self._timeline.append((now, message_id, band_keys, sender, client_ip))
+
+        self._sender_counts[sender] += 1
+        sender_count = self._sender_counts[sender]
+        ip_count = 0
+        if client_ip:
+            self._ip_counts[client_ip] += 1
+            ip_count = self._ip_counts[client_ip]
+
+        score = 0.0
+        reasons = []
+        if near_duplicates >= INTAKE_DUPLICATE_FLOOD:
+            score += 1.0
+            reasons.append("duplicate_flood")
+        elif near_duplicates:
+            score += 0.3
+            reasons.append("near_duplicate")
+        # Either rate limit rejects on its own; the other signals only add up
+        if sender_count > INTAKE_MAX_PER_SENDER:
+            score += 1.0
+            reasons.append("sender_rate")
+        if INTAKE_MAX_PER_IP and ip_count > INTAKE_MAX_PER_IP:
+            score += 1.0
+            reasons.append("ip_rate")
+        if len(_LINK.findall(message)) > 3:
+            score += 0.3
+            reasons.append("links")
+
+        rejected = score >= INTAKE_REJECT_SCORE
+        if rejected:
+            self.rejected += 1
+        return IntakeVerdict(round(score, 2), rejected, near_duplicates, sender_count, ip_count, tuple(reasons))
+
+
+intake_filter = IntakeFilter()
@@ -0,0 +1,187 @@
+"""Concurrency limits and load shedding for HTTP requests.
+
+Every request takes a slot from its route's limiter (the first prefix in
+``LOAD_SHED_ROUTE_LIMITS`` it matches, if any) and then from the global one
+(``LOAD_SHED_MAX_CONCURRENCY``). When no slot is free it waits in a FIFO
+queue for at most ``LOAD_SHED_QUEUE_TIMEOUT_MS``; if the queue already holds
+``LOAD_SHED_MAX_QUEUE`` requests, or the wait runs out, the request is
+answered 503 with ``Retry-After`` straight away instead of piling up and
+timing out along with everything else.
+
+The email routes have their own, lower limits by default, since each of
+their requests holds a slot for the duration of the provider calls. Paths in
+``LOAD_SHED_EXEMPT_PATHS`` bypass the limiters entirely: the health check
+must keep answering under overload, and event streams hold their connection
+open by design.
+"""
+import asyncio
+import collections
+import json
+import logging
+import os
+import time
+
+from fastapi import APIRouter, Depends
+
+from auth import require_admin
+
+logger = logging.getLogger(__name__)
+
+LOAD_SHED_ENABLED = os.environ.get("LOAD_SHED_ENABLED", "true").lower() == "true"
+LOAD_SHED_MAX_CONCURRENCY = int(os.environ.get("LOAD_SHED_MAX_CONCURRENCY", "200"))
+LOAD_SHED_MAX_QUEUE = int(os.environ.get("LOAD_SHED_MAX_QUEUE", "100"))
+LOAD_SHED_QUEUE_TIMEOUT_MS = float(os.environ.get("LOAD_SHED_QUEUE_TIMEOUT_MS", "500"))
+LOAD_SHED_RETRY_AFTER_SECONDS = int(os.environ.get("LOAD_SHED_RETRY_AFTER_SECONDS", "2"))
+# "<path prefix>=<limit>" pairs, most specific first
+LOAD_SHED_ROUTE_LIMITS = os.environ.get(
+    "LOAD_SHED_ROUTE_LIMITS", "/api/send-contact-email=20,/api/send-enrollment-email=20"
+)
+LOAD_SHED_EXEMPT_PATHS = tuple(
+    path.strip()
+    for path in os.environ.get(
+        "LOAD_SHED_EXEMPT_PATHS", "/api/health,/api/tickets/events,/api/admin/load"
+    ).split(",")
+    if path.strip()
+)
+
+
+class Limiter:
+    """At most ``limit`` holders; waiters queue in arrival order with a deadline."""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            self.shed_queue_full += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the wait ran out; keep it
+                self.admitted += 1
+                return True
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            self.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+        self.admitted += 1
+        return True
+
+    def release(self):
+        # Hand the slot straight to the next waiter so newcomers cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+def _route_limiters(spec: str) -> list:
+    limiters = []
+    for item in spec.split(","):
+        prefix, _, limit = item.strip().partition("=")
+        if prefix and limit:
+            limiters.append((prefix, Limiter(prefix, int(limit), LOAD_SHED_MAX_QUEUE)))
+    return limiters
+
+
+global_limiter = Limiter("*", LOAD_SHED_MAX_CONCURRENCY, LOAD_SHED_MAX_QUEUE)
+route_limiters = _route_limiters(LOAD_SHED_ROUTE_LIMITS)
+
+_SHED_BODY = json.dumps({"detail": "Server is busy, please retry shortly"}).encode()
+
+
+class LoadSheddingMiddleware:
+    """Bound in-flight requests per route and overall, answering 503 to the excess."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not LOAD_SHED_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        if path.startswith(LOAD_SHED_EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        deadline = time.monotonic() + LOAD_SHED_QUEUE_TIMEOUT_MS / 1000
+        held = []
+        try:
+            limiters = [limiter for prefix, limiter in route_limiters if path.startswith(prefix)][:1]
+            for limiter in limiters + [global_limiter]:
+                if not await limiter.acquire(deadline - time.monotonic()):
+                    logger.warning("Shed %s %s: %s limiter is full", scope["method"], path, limiter.name)
+                    await self._shed(send)
+                    return
+                held.append(limiter)
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in held:
+                limiter.release()
+
+    async def _shed(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_SHED_BODY)).encode()),
+                (b"retry-after", str(LOAD_SHED_RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": _SHED_BODY})
+
+
+router = APIRouter(prefix="/api/admin/load", dependencies=[Depends(require_admin)])
+
+
+@router.get("")
+async def load_stats():
+    """In-flight requests, queue depth and shed counts of every limiter on this worker."""
+    return {
+        "enabled": LOAD_SHED_ENABLED,
+        "limiters": [global_limiter.stats(), *(limiter.stats() for _, limiter in route_limiters)],
+    }
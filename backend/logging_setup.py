@@ -0,0 +1,144 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+from request_context import current_request
+from tracing import get_current_span
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+# Share of success-path records kept once LOG_SAMPLE_ABOVE_PER_SEC is exceeded
+LOG_SUCCESS_SAMPLE_RATE = float(os.environ.get("LOG_SUCCESS_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_ABOVE_PER_SEC = int(os.environ.get("LOG_SAMPLE_ABOVE_PER_SEC", "100"))
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+    "sample",
+    "color_message",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current request id, route and span ids to records.
+
+    Must run on the thread that logged the record, since the request context
+    lives in a context variable.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        ctx = current_request()
+        if ctx is not None:
+            record.request_id = ctx.request_id
+            record.route = ctx.route
+        span_context = get_current_span().get_span_context()
+        if span_context is not None:
+            record.trace_id = span_context.trace_id
+            record.span_id = span_context.span_id
+        return True
+
+
+class SuccessSampler(logging.Filter):
+    """Thin out success-path records when their volume gets high.
+
+    Only records logged with ``extra={"sample": True}`` at INFO or below are
+    eligible. The first ``above_per_sec`` such records each second are always
+    kept; past that, each is kept with probability ``rate``.
+    """
+
+    def __init__(self, rate: float, above_per_sec: int):
+        super().__init__()
+        self.rate = rate
+        self.above_per_sec = above_per_sec
+        self.dropped = 0
+        self._second = 0
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not getattr(record, "sample", False):
+            return True
+        second = int(record.created)
+        if second != self._second:
+            self._second = second
+            self._seen = 0
+        self._seen += 1
+        if self._seen <= self.above_per_sec or random.random() < self.rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records for the listener thread without formatting or blocking.
+
+    The stock handler formats the message on the calling thread; here the
+    record is queued as is and rendered by the listener. When the queue is
+    full the record is dropped and counted rather than stalling the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+
+def setup_logging(level: str = LOG_LEVEL):
+    """Route all logging through a bounded queue drained by a background thread.
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SuccessSampler(LOG_SUCCESS_SAMPLE_RATE, LOG_SAMPLE_ABOVE_PER_SEC))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
@@ -0,0 +1,417 @@
+"""Outgoing email.
+
+``send_email`` hands a message to one of the providers in ``MAIL_PROVIDERS``
+(``resend`` and/or ``smtp``, each with a weight, e.g. ``resend:3,smtp:1``).
+The router spreads sends across providers in proportion to their weight
+divided by their observed latency and scaled down by their recent error rate
+(which halves every ``MAIL_ERROR_HALF_LIFE_SECONDS``), and fails over to the
+next provider when a send fails. Rejections of the message itself (a recipient
+refused with a 5xx reply, invalid fields) are raised at once instead. A provider that fails
+``MAIL_FAILURE_THRESHOLD`` times in a row is only tried as a last resort for
+``MAIL_COOLDOWN_SECONDS``.
+
+The SMTP transport keeps up to ``SMTP_POOL_SIZE`` authenticated connections
+open between sends instead of connecting, negotiating TLS and logging in for
+every message. For local testing any SMTP server will do, e.g.
+``python -m aiosmtpd -n -l localhost:8025`` with ``SMTP_HOST=localhost``,
+``SMTP_PORT=8025`` and ``SMTP_STARTTLS=false``.
+
+Delivery webhooks (see ``delivery_events``) only cover mail sent through
+Resend.
+"""
+import asyncio
+import collections
+import logging
+import os
+import random
+import re
+import smtplib
+import ssl
+import time
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+import resend
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+import tracing
+from auth import require_admin
+from request_context import current_request_id
+from suppression import suppressions
+
+logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
+
+MAIL_PROVIDERS = os.environ.get("MAIL_PROVIDERS", "resend")
+MAIL_FAILURE_THRESHOLD = int(os.environ.get("MAIL_FAILURE_THRESHOLD", "3"))
+MAIL_COOLDOWN_SECONDS = float(os.environ.get("MAIL_COOLDOWN_SECONDS", "60"))
+MAIL_ERROR_HALF_LIFE_SECONDS = float(os.environ.get("MAIL_ERROR_HALF_LIFE_SECONDS", "120"))
+SMTP_HOST = os.environ.get("SMTP_HOST")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_USE_SSL = os.environ.get("SMTP_USE_SSL", "false").lower() == "true"
+SMTP_POOL_SIZE = int(os.environ.get("SMTP_POOL_SIZE", "4"))
+# Sender used for SMTP instead of the Resend test address callers pass
+SMTP_FROM = os.environ.get("SMTP_FROM")
+SMTP_TIMEOUT_SECONDS = 30
+# Idle connections are checked with NOOP before reuse; servers drop them after a few minutes
+SMTP_IDLE_CHECK_SECONDS = 30
+# Weight of the newest sample in the latency and error-rate moving averages
+STATS_DECAY = 0.2
+
+# Resend tag values may only contain ASCII letters, digits, underscores and dashes
+_TAG_UNSAFE = re.compile(r"[^A-Za-z0-9_-]")
+
+SMTP_REFUSALS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+RESEND_PERMANENT_ERRORS = (resend.exceptions.ValidationError, resend.exceptions.MissingRequiredFieldsError)
+
+# Sends that have been handed to a provider but have not returned yet
+_pending = set()
+
+
+def is_permanent(error: Exception) -> bool:
+    """Whether ``error`` rejects the message itself (bad address, invalid fields).
+
+    Another provider would refuse such a message too, so it is raised without
+    failover and does not count against the provider's health. SMTP refusals
+    are permanent only with a 5xx reply; 4xx ones (greylisting, rate limits,
+    a busy mailbox) are worth another provider.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, SMTP_REFUSALS):
+        return error.smtp_code >= 500
+    return isinstance(error, RESEND_PERMANENT_ERRORS)
+
+
+class ResendTransport:
+    name = "resend"
+
+    def __init__(self):
+        resend_api_key = os.environ.get("RESEND_API_KEY")
+        if not resend_api_key:
+            logger.error("RESEND_API_KEY environment variable is not set")
+        else:
+            resend.api_key = resend_api_key
+
+    async def send(self, params: dict) -> dict:
+        return await run_in_threadpool(resend.Emails.send, params)
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class SmtpTransport:
+    """SMTP with a pool of persistent, authenticated connections used from the thread pool."""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 starttls: bool = True, use_ssl: bool = False, pool_size: int = 4, sender: str = None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.sender = sender
+        self.connections_opened = 0
+        # Idle connections with the time they were last used; deque appends and pops are thread-safe
+        self._idle = collections.deque()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(
+                self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS, context=ssl.create_default_context()
+            )
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+        if self.username:
+            conn.login(self.username, self.password or "")
+        self.connections_opened += 1
+        return conn
+
+    def _acquire(self) -> smtplib.SMTP:
+        while self._idle:
+            conn, last_used = self._idle.pop()
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK_SECONDS:
+                return conn
+            try:
+                if conn.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            _quit(conn)
+        return self._connect()
+
+    def message(self, params: dict) -> EmailMessage:
+        message = EmailMessage()
+        recipients = params["to"] if isinstance(params["to"], list) else [params["to"]]
+        message["From"] = self.sender or params["from"]
+        message["To"] = ", ".join(recipients)
+        message["Subject"] = params["subject"]
+        message["Date"] = formatdate(localtime=False)
+        message["Message-ID"] = make_msgid(domain=(self.sender or params["from"]).rpartition("@")[2] or None)
+        for name, value in params.get("headers", {}).items():
+            message[name] = value
+        for tag in params.get("tags", []):
+            message[f"X-Tag-{tag['name']}"] = tag["value"]
+        message.set_content(params.get("text") or "This message is best viewed in an HTML-capable email client.")
+        message.add_alternative(params["html"], subtype="html")
+        return message
+
+    def _send(self, message: EmailMessage) -> dict:
+        conn = self._acquire()
+        try:
+            try:
+                conn.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped a pooled connection; one retry on a fresh one
+                _quit(conn)
+                conn = self._connect()
+                conn.send_message(message)
+        except SMTP_REFUSALS as e:
+            if getattr(e, "smtp_code", None) == 421:
+                # The server is closing the connection
+                _quit(conn)
+            else:
+                # Only the message was refused; smtplib has reset the session, so the connection stays usable
+                self._idle.append((conn, time.monotonic()))
+            raise
+        except Exception:
+            _quit(conn)
+            raise
+        self._idle.append((conn, time.monotonic()))
+        return {"id": message["Message-ID"]}
+
+    async def send(self, params: dict) -> dict:
+        message = self.message(params)
+        async with self._slots:
+            return await run_in_threadpool(self._send, message)
+
+    def close(self):
+        while self._idle:
+            _quit(self._idle.pop()[0])
+
+    def stats(self) -> dict:
+        return {"idle_connections": len(self._idle), "connections_opened": self.connections_opened}
+
+
+def _quit(conn: smtplib.SMTP):
+    try:
+        conn.quit()
+    except (smtplib.SMTPException, OSError):
+        conn.close()
+
+
+class Provider:
+    def __init__(self, transport, weight: float):
+        self.transport = transport
+        self.weight = weight
+        self.latency = None
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self._error_rate = 0.0
+        self._error_rate_at = time.monotonic()
+
+    @property
+    def name(self) -> str:
+        return self.transport.name
+
+    def available(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def error_rate(self, now: float) -> float:
+        # Decays while the provider gets no traffic, so one that recovered is tried again
+        return self._error_rate * 0.5 ** ((now - self._error_rate_at) / MAIL_ERROR_HALF_LIFE_SECONDS)
+
+    def score(self, now: float, default_latency: float) -> float:
+        """Share of traffic relative to the other providers: weight, discounted by latency and errors."""
+        latency = max(self.latency if self.latency is not None else default_latency, 0.01)
+        return self.weight * (1.0 - self.error_rate(now)) ** 2 / latency
+
+    def record(self, seconds: float, ok: bool):
+        now = time.monotonic()
+        if ok:
+            self.latency = seconds if self.latency is None else (1 - STATS_DECAY) * self.latency + STATS_DECAY * seconds
+            self.sent += 1
+            self.consecutive_failures = 0
+        else:
+            self.failed += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= MAIL_FAILURE_THRESHOLD:
+                self.cooldown_until = now + MAIL_COOLDOWN_SECONDS
+        self._error_rate = (1 - STATS_DECAY) * self.error_rate(now) + STATS_DECAY * (0.0 if ok else 1.0)
+        self._error_rate_at = now
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "provider": self.name,
+            "weight": self.weight,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "error_rate": round(self.error_rate(now), 3),
+            "sent": self.sent,
+            "failed": self.failed,
+            "cooling_down": not self.available(now),
+            **self.transport.stats(),
+        }
+
+
+class MailRouter:
+    def __init__(self, providers: list):
+        self.providers = providers
+        self.failovers = 0
+
+    def order(self) -> list:
+        """Providers to try, in order: a score-weighted draw among healthy ones, then the rest."""
+        now = time.monotonic()
+        healthy = [p for p in self.providers if p.available(now)]
+        cooling = sorted((p for p in self.providers if not p.available(now)), key=lambda p: p.cooldown_until)
+        # Providers without latency samples yet are scored as fast as the fastest, so they get tried
+        default_latency = min((p.latency for p in self.providers if p.latency is not None), default=1.0)
+        ordered = []
+        while healthy:
+            scores = [p.score(now, default_latency) for p in healthy]
+            if sum(scores) > 0:
+                pick = random.choices(healthy, scores)[0]
+            else:
+                pick = healthy[0]
+            healthy.remove(pick)
+            ordered.append(pick)
+        return ordered + cooling
+
+    async def send(self, params: dict):
+        error = None
+        for attempt, provider in enumerate(self.order()):
+            if attempt:
+                self.failovers += 1
+            started = time.perf_counter()
+            try:
+                with tracer.start_as_current_span(f"{provider.name}.emails.send", {"mail.provider": provider.name}):
+                    result = await provider.transport.send(params)
+            except Exception as e:
+                if is_permanent(e):
+                    raise
+                provider.record(time.perf_counter() - started, ok=False)
+                logger.warning("Sending email through %s failed: %s", provider.name, e)
+                error = e
+                continue
+            provider.record(time.perf_counter() - started, ok=True)
+            return {**result, "provider": provider.name} if isinstance(result, dict) else result
+        raise error
+
+    def close(self):
+        for provider in self.providers:
+            provider.transport.close()
+
+
+_router = None
+
+
+def _transport(name: str):
+    if name == "resend":
+        return ResendTransport()
+    if name == "smtp":
+        if not SMTP_HOST:
+            raise ValueError("The smtp mail provider needs SMTP_HOST")
+        return SmtpTransport(
+            SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+            starttls=SMTP_STARTTLS, use_ssl=SMTP_USE_SSL, pool_size=SMTP_POOL_SIZE, sender=SMTP_FROM,
+        )
+    raise ValueError(f"Unknown mail provider: {name}")
+
+
+def configure():
+    """Set up the providers listed in ``MAIL_PROVIDERS``."""
+    global _router
+    providers = []
+    for item in MAIL_PROVIDERS.split(","):
+        name, _, weight = item.strip().partition(":")
+        if name:
+            providers.append(Provider(_transport(name.lower()), float(weight or 1)))
+    if not providers:
+        raise ValueError("MAIL_PROVIDERS lists no mail provider")
+    _router = MailRouter(providers)
+
+
+async def send_email(params: dict):
+    """Send an email through the configured providers without blocking the event loop.
+
+    Provider calls run in the thread pool. The send is shielded from request
+    cancellation and tracked, so a client disconnect or a shutdown does not
+    drop a message a provider is already processing.
+
+    The current request id is attached as an ``X-Request-ID`` header and a
+    ``request_id`` tag so provider-side events can be matched to our logs.
+
+    Suppressed recipients are dropped first; if none are left no provider is
+    called and None is returned. Otherwise returns the provider's response
+    (with the message ``id``) plus the ``provider`` that accepted it, or
+    raises the last provider's error when every provider failed.
+    """
+    recipients = params["to"] if isinstance(params["to"], list) else [params["to"]]
+    allowed = [address for address in recipients if not suppressions.is_suppressed(address)]
+    if not allowed:
+        logger.info("Skipped email to suppressed recipient(s): %s", ", ".join(recipients))
+        return None
+    if len(allowed) != len(recipients):
+        params = {**params, "to": allowed}
+
+    request_id = current_request_id()
+    if request_id:
+        params = {
+            **params,
+            "headers": {**params.get("headers", {}), "X-Request-ID": request_id},
+            "tags": [*params.get("tags", []), {"name": "request_id", "value": _TAG_UNSAFE.sub("_", request_id)}],
+        }
+    if _router is None:
+        configure()
+    task = asyncio.ensure_future(_router.send(params))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+    return await asyncio.shield(task)
+
+
+def pending_count() -> int:
+    return len(_pending)
+
+
+async def drain(timeout: float) -> int:
+    """Wait up to ``timeout`` seconds for in-flight sends to finish.
+
+    Returns the number of sends still outstanding when the deadline passed.
+    """
+    if not _pending:
+        return 0
+    logger.info("Draining %d in-flight email send(s)", len(_pending))
+    _, not_done = await asyncio.wait(set(_pending), timeout=timeout)
+    return len(not_done)
+
+
+def close():
+    """Close pooled provider connections; call after ``drain``."""
+    if _router is not None:
+        _router.close()
+
+
+router = APIRouter(prefix="/api/admin/mail", dependencies=[Depends(require_admin)])
+
+
+@router.get("/providers")
+async def mail_providers():
+    """Latency, error rate and send counts of each mail provider on this worker."""
+    if _router is None:
+        return {"providers": [], "failovers": 0}
+    return {"providers": [p.stats() for p in _router.providers], "failovers": _router.failovers}
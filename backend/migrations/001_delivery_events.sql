@@ -0,0 +1,23 @@
+-- Delivery events reported by the email provider's webhooks
+-- Written in batches by the backend (see backend/delivery_events.py)
+
+CREATE TABLE IF NOT EXISTS delivery_events (
+    id BIGSERIAL PRIMARY KEY,
+    svix_id VARCHAR(100) UNIQUE NOT NULL, -- Webhook message id; makes redelivered events idempotent
+    event_type VARCHAR(50) NOT NULL,
+    email_id VARCHAR(100),
+    recipient VARCHAR(255),
+    request_id VARCHAR(128),
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    received_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    payload JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_delivery_events_email_id ON delivery_events(email_id);
+CREATE INDEX IF NOT EXISTS idx_delivery_events_recipient ON delivery_events(recipient);
+CREATE INDEX IF NOT EXISTS idx_delivery_events_occurred_at ON delivery_events(occurred_at);
+
+ALTER TABLE delivery_events ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can view delivery events" ON delivery_events FOR SELECT USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
@@ -0,0 +1,42 @@
+-- Addresses the backend must not send to (hard bounces, complaints, manual blocks)
+-- Rows are soft-deleted so every worker can pick up removals incrementally
+
+CREATE TABLE IF NOT EXISTS email_suppressions (
+    email VARCHAR(255) PRIMARY KEY, -- Stored lower-cased
+    reason VARCHAR(20) NOT NULL CHECK (reason IN ('bounced', 'complained', 'manual')),
+    source VARCHAR(100),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    removed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_suppressions_updated_at ON email_suppressions(updated_at);
+
+ALTER TABLE email_suppressions ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can view email suppressions" ON email_suppressions FOR SELECT USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
+
+-- Bounce and complaint webhooks suppress the recipient as soon as they are stored
+CREATE OR REPLACE FUNCTION suppress_from_delivery_event()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO email_suppressions (email, reason, source)
+    VALUES (
+        lower(NEW.recipient),
+        CASE NEW.event_type WHEN 'email.complained' THEN 'complained' ELSE 'bounced' END,
+        NEW.event_type
+    )
+    ON CONFLICT (email) DO UPDATE
+        SET reason = EXCLUDED.reason, source = EXCLUDED.source,
+            updated_at = CURRENT_TIMESTAMP, removed_at = NULL;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_suppress_from_delivery_event ON delivery_events;
+CREATE TRIGGER trigger_suppress_from_delivery_event
+    AFTER INSERT ON delivery_events
+    FOR EACH ROW
+    WHEN (NEW.event_type IN ('email.bounced', 'email.complained') AND NEW.recipient IS NOT NULL)
+    EXECUTE FUNCTION suppress_from_delivery_event();
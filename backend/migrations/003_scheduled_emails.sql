@@ -0,0 +1,25 @@
+-- Durable queue of emails to send at a later time (e.g. course reminders)
+-- Consumed by the backend scheduler (see backend/scheduler.py)
+
+CREATE TABLE IF NOT EXISTS scheduled_emails (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    dedupe_key VARCHAR(255) UNIQUE NOT NULL, -- Re-scheduling the same reminder updates the existing job
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'cancelled')),
+    attempts INTEGER DEFAULT 0,
+    payload JSONB NOT NULL,
+    last_error TEXT,
+    sent_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Only unsent jobs are ever scanned, so keep the index to those rows
+CREATE INDEX IF NOT EXISTS idx_scheduled_emails_pending_run_at ON scheduled_emails(run_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_scheduled_emails_sending ON scheduled_emails(updated_at) WHERE status = 'sending';
+
+ALTER TABLE scheduled_emails ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can view scheduled emails" ON scheduled_emails FOR SELECT USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
@@ -0,0 +1,16 @@
+-- Tell backend workers when a profile's role, company or status changes
+-- so their cached authorization context is dropped immediately
+
+CREATE OR REPLACE FUNCTION notify_profile_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('profile_changes', json_build_object('user_id', OLD.user_id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_profile_change ON profiles;
+CREATE TRIGGER trigger_notify_profile_change
+    AFTER UPDATE OF role, company_id, is_active, user_id OR DELETE ON profiles
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_profile_change();
@@ -0,0 +1,274 @@
+-- Partition support_tickets and ticket_replies so open-ticket queries stop
+-- scanning years of closed tickets. Requires PostgreSQL 15+ (foreign keys
+-- that follow rows moving between partitions).
+--
+-- Layout, for both tables:
+--   LIST (archived)                hot = false, cold = true
+--     RANGE (created_at)           one partition per month, plus a default
+-- Queries filtering on "NOT archived" touch only the hot partitions; a
+-- created_at range touches only the matching months. The archival job
+-- (backend/archival.py) sets archived = true on tickets closed long ago, and
+-- their replies and attachments follow through ON UPDATE CASCADE.
+--
+-- Partitioned tables need the partition keys in every unique constraint, so
+-- the primary keys become (id, archived, created_at) and children reference
+-- tickets by that composite key. The columns are filled in by triggers, so
+-- existing inserts keep working unchanged. ticket_number is indexed but no
+-- longer declared unique; it still comes from ticket_number_seq.
+-- Partitions live in the ticket_partitions schema, which the API does not
+-- expose, so rows are only reachable through the RLS-protected parents.
+
+BEGIN;
+
+CREATE SCHEMA IF NOT EXISTS ticket_partitions;
+
+CREATE TABLE support_tickets_partitioned (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    ticket_number VARCHAR(20) NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    description TEXT NOT NULL,
+    priority VARCHAR(20) DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high', 'urgent')),
+    status VARCHAR(20) DEFAULT 'open' CHECK (status IN ('open', 'in_progress', 'pending', 'resolved', 'closed')),
+    category VARCHAR(50),
+    created_by UUID NOT NULL,
+    assigned_to UUID,
+    company_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    resolved_at TIMESTAMP WITH TIME ZONE,
+    closed_at TIMESTAMP WITH TIME ZONE,
+    archived BOOLEAN NOT NULL DEFAULT false,
+    PRIMARY KEY (id, archived, created_at),
+    CONSTRAINT support_tickets_created_by_fkey FOREIGN KEY (created_by) REFERENCES auth.users(id),
+    CONSTRAINT support_tickets_assigned_to_fkey FOREIGN KEY (assigned_to) REFERENCES auth.users(id),
+    CONSTRAINT support_tickets_company_id_fkey FOREIGN KEY (company_id) REFERENCES companies(id)
+) PARTITION BY LIST (archived);
+
+CREATE TABLE ticket_partitions.support_tickets_hot PARTITION OF support_tickets_partitioned
+    FOR VALUES IN (false) PARTITION BY RANGE (created_at);
+CREATE TABLE ticket_partitions.support_tickets_cold PARTITION OF support_tickets_partitioned
+    FOR VALUES IN (true) PARTITION BY RANGE (created_at);
+CREATE TABLE ticket_partitions.support_tickets_hot_default PARTITION OF ticket_partitions.support_tickets_hot DEFAULT;
+CREATE TABLE ticket_partitions.support_tickets_cold_default PARTITION OF ticket_partitions.support_tickets_cold DEFAULT;
+
+CREATE TABLE ticket_replies_partitioned (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    ticket_id UUID NOT NULL,
+    reply_text TEXT NOT NULL,
+    is_internal BOOLEAN DEFAULT false,
+    created_by UUID NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    ticket_archived BOOLEAN NOT NULL DEFAULT false,
+    ticket_created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (id, ticket_archived, created_at),
+    CONSTRAINT ticket_replies_created_by_fkey FOREIGN KEY (created_by) REFERENCES auth.users(id)
+) PARTITION BY LIST (ticket_archived);
+
+CREATE TABLE ticket_partitions.ticket_replies_hot PARTITION OF ticket_replies_partitioned
+    FOR VALUES IN (false) PARTITION BY RANGE (created_at);
+CREATE TABLE ticket_partitions.ticket_replies_cold PARTITION OF ticket_replies_partitioned
+    FOR VALUES IN (true) PARTITION BY RANGE (created_at);
+CREATE TABLE ticket_partitions.ticket_replies_hot_default PARTITION OF ticket_partitions.ticket_replies_hot DEFAULT;
+CREATE TABLE ticket_partitions.ticket_replies_cold_default PARTITION OF ticket_partitions.ticket_replies_cold DEFAULT;
+
+-- Monthly partitions from start_month through months_ahead months from now.
+-- Run ahead of time (the archival job does) so rows never land in a default
+-- partition; a month whose rows already sit in a default partition is skipped
+-- with a warning.
+CREATE OR REPLACE FUNCTION ensure_ticket_partitions(start_month DATE, months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', start_month);
+    last_month DATE := date_trunc('month', CURRENT_DATE + make_interval(months => months_ahead));
+    parent TEXT;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        FOREACH parent IN ARRAY ARRAY['support_tickets_hot', 'support_tickets_cold', 'ticket_replies_hot', 'ticket_replies_cold'] LOOP
+            partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+            IF to_regclass('ticket_partitions.' || partition_name) IS NULL THEN
+                BEGIN
+                    EXECUTE format(
+                        'CREATE TABLE ticket_partitions.%I PARTITION OF ticket_partitions.%I FOR VALUES FROM (%L) TO (%L)',
+                        partition_name, parent,
+                        month_start::timestamp AT TIME ZONE 'UTC',
+                        (month_start + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'
+                    );
+                    created := created + 1;
+                EXCEPTION WHEN check_violation THEN
+                    RAISE WARNING 'Skipping %: its default partition already holds rows for that month', partition_name;
+                END;
+            END IF;
+        END LOOP;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT ensure_ticket_partitions(coalesce((SELECT min(created_at) FROM support_tickets)::date, CURRENT_DATE));
+
+INSERT INTO support_tickets_partitioned (
+    id, ticket_number, title, description, priority, status, category, created_by, assigned_to, company_id,
+    created_at, updated_at, resolved_at, closed_at
+)
+SELECT id, ticket_number, title, description, priority, status, category, created_by, assigned_to, company_id,
+       coalesce(created_at, CURRENT_TIMESTAMP), updated_at, resolved_at, closed_at
+FROM support_tickets;
+
+INSERT INTO ticket_replies_partitioned (
+    id, ticket_id, reply_text, is_internal, created_by, created_at, updated_at, ticket_created_at
+)
+SELECT r.id, r.ticket_id, r.reply_text, r.is_internal, r.created_by, coalesce(r.created_at, t.created_at),
+       r.updated_at, t.created_at
+FROM ticket_replies r
+JOIN support_tickets_partitioned t ON t.id = r.ticket_id;
+
+-- Attachments stay a plain table but reference tickets and replies by their new composite keys
+ALTER TABLE ticket_attachments
+    ADD COLUMN IF NOT EXISTS ticket_archived BOOLEAN NOT NULL DEFAULT false,
+    ADD COLUMN IF NOT EXISTS ticket_created_at TIMESTAMP WITH TIME ZONE,
+    ADD COLUMN IF NOT EXISTS reply_created_at TIMESTAMP WITH TIME ZONE;
+
+UPDATE ticket_attachments a SET ticket_created_at = t.created_at
+FROM support_tickets_partitioned t WHERE t.id = a.ticket_id;
+UPDATE ticket_attachments a SET reply_created_at = r.created_at
+FROM ticket_replies_partitioned r WHERE r.id = a.reply_id;
+
+DROP TABLE ticket_replies CASCADE;
+DROP TABLE support_tickets CASCADE;
+
+ALTER TABLE support_tickets_partitioned RENAME TO support_tickets;
+ALTER TABLE support_tickets RENAME CONSTRAINT support_tickets_partitioned_pkey TO support_tickets_pkey;
+ALTER TABLE ticket_replies_partitioned RENAME TO ticket_replies;
+ALTER TABLE ticket_replies RENAME CONSTRAINT ticket_replies_partitioned_pkey TO ticket_replies_pkey;
+
+ALTER TABLE ticket_replies ADD CONSTRAINT ticket_replies_ticket_id_fkey
+    FOREIGN KEY (ticket_id, ticket_archived, ticket_created_at)
+    REFERENCES support_tickets(id, archived, created_at) ON UPDATE CASCADE ON DELETE CASCADE;
+ALTER TABLE ticket_attachments ADD CONSTRAINT ticket_attachments_ticket_id_fkey
+    FOREIGN KEY (ticket_id, ticket_archived, ticket_created_at)
+    REFERENCES support_tickets(id, archived, created_at) ON UPDATE CASCADE ON DELETE CASCADE;
+ALTER TABLE ticket_attachments ADD CONSTRAINT ticket_attachments_reply_id_fkey
+    FOREIGN KEY (reply_id, ticket_archived, reply_created_at)
+    REFERENCES ticket_replies(id, ticket_archived, created_at) ON UPDATE CASCADE ON DELETE CASCADE;
+
+CREATE INDEX idx_support_tickets_status ON support_tickets(status);
+CREATE INDEX idx_support_tickets_priority ON support_tickets(priority);
+CREATE INDEX idx_support_tickets_created_by ON support_tickets(created_by);
+CREATE INDEX idx_support_tickets_assigned_to ON support_tickets(assigned_to);
+CREATE INDEX idx_support_tickets_company_id ON support_tickets(company_id);
+CREATE INDEX idx_support_tickets_ticket_number ON support_tickets(ticket_number);
+CREATE INDEX idx_support_tickets_created_at ON support_tickets(created_at);
+-- Candidates for archival; only ever non-empty in the hot partitions
+CREATE INDEX idx_support_tickets_closed_at ON support_tickets(closed_at) WHERE status = 'closed' AND NOT archived;
+CREATE INDEX idx_ticket_replies_ticket_id ON ticket_replies(ticket_id);
+
+-- Children carry their parent's partition key; fill it in for inserts that only name the parent
+CREATE OR REPLACE FUNCTION set_ticket_reply_keys()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.ticket_created_at IS NULL THEN
+        SELECT created_at INTO NEW.ticket_created_at FROM support_tickets WHERE id = NEW.ticket_id AND NOT archived;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_set_ticket_reply_keys
+    BEFORE INSERT ON ticket_replies
+    FOR EACH ROW
+    EXECUTE FUNCTION set_ticket_reply_keys();
+
+CREATE OR REPLACE FUNCTION set_ticket_attachment_keys()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.ticket_id IS NULL AND NEW.reply_id IS NOT NULL THEN
+        SELECT ticket_id INTO NEW.ticket_id FROM ticket_replies WHERE id = NEW.reply_id;
+    END IF;
+    IF NEW.ticket_created_at IS NULL AND NEW.ticket_id IS NOT NULL THEN
+        SELECT created_at, archived INTO NEW.ticket_created_at, NEW.ticket_archived
+        FROM support_tickets WHERE id = NEW.ticket_id;
+    END IF;
+    IF NEW.reply_created_at IS NULL AND NEW.reply_id IS NOT NULL THEN
+        SELECT created_at INTO NEW.reply_created_at FROM ticket_replies WHERE id = NEW.reply_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trigger_set_ticket_attachment_keys
+    BEFORE INSERT ON ticket_attachments
+    FOR EACH ROW
+    EXECUTE FUNCTION set_ticket_attachment_keys();
+
+CREATE TRIGGER trigger_set_ticket_number
+    BEFORE INSERT ON support_tickets
+    FOR EACH ROW
+    EXECUTE FUNCTION set_ticket_number();
+
+-- Policies as before, joined on the full key so each check probes one partition
+ALTER TABLE support_tickets ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Users can view their tickets" ON support_tickets FOR SELECT USING (
+    created_by = auth.uid() OR
+    assigned_to = auth.uid() OR
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin') OR
+    (company_id IS NOT NULL AND company_id IN (SELECT company_id FROM profiles WHERE user_id = auth.uid()))
+);
+CREATE POLICY "Users can create tickets" ON support_tickets FOR INSERT WITH CHECK (
+    created_by = auth.uid()
+);
+CREATE POLICY "Admins can update tickets" ON support_tickets FOR UPDATE USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
+
+ALTER TABLE ticket_replies ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Users can view ticket replies" ON ticket_replies FOR SELECT USING (
+    EXISTS (
+        SELECT 1 FROM support_tickets
+        WHERE support_tickets.id = ticket_replies.ticket_id
+        AND support_tickets.archived = ticket_replies.ticket_archived
+        AND support_tickets.created_at = ticket_replies.ticket_created_at
+        AND (
+            support_tickets.created_by = auth.uid() OR
+            support_tickets.assigned_to = auth.uid() OR
+            EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin') OR
+            (support_tickets.company_id IS NOT NULL AND support_tickets.company_id IN (SELECT company_id FROM profiles WHERE user_id = auth.uid()))
+        )
+    )
+);
+CREATE POLICY "Users can create replies" ON ticket_replies FOR INSERT WITH CHECK (
+    created_by = auth.uid() AND
+    EXISTS (
+        SELECT 1 FROM support_tickets
+        WHERE support_tickets.id = ticket_replies.ticket_id
+        AND NOT support_tickets.archived
+        AND (
+            support_tickets.created_by = auth.uid() OR
+            support_tickets.assigned_to = auth.uid() OR
+            EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin') OR
+            (support_tickets.company_id IS NOT NULL AND support_tickets.company_id IN (SELECT company_id FROM profiles WHERE user_id = auth.uid()))
+        )
+    )
+);
+
+-- Dropping the old tables removed this policy's reference; recreate it against the new key
+DROP POLICY IF EXISTS "Users can view ticket attachments" ON ticket_attachments;
+CREATE POLICY "Users can view ticket attachments" ON ticket_attachments FOR SELECT USING (
+    EXISTS (
+        SELECT 1 FROM support_tickets
+        WHERE support_tickets.id = ticket_attachments.ticket_id
+        AND support_tickets.archived = ticket_attachments.ticket_archived
+        AND support_tickets.created_at = ticket_attachments.ticket_created_at
+        AND (
+            support_tickets.created_by = auth.uid() OR
+            support_tickets.assigned_to = auth.uid() OR
+            EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin') OR
+            (support_tickets.company_id IS NOT NULL AND support_tickets.company_id IN (SELECT company_id FROM profiles WHERE user_id = auth.uid()))
+        )
+    )
+);
+
+COMMIT;
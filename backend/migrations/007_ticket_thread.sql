@@ -0,0 +1,10 @@
+-- Ticket thread pagination and lazy attachment downloads (see backend/tickets.py)
+
+-- Keyset pagination walks a ticket's replies in (created_at, id) order
+CREATE INDEX IF NOT EXISTS idx_ticket_replies_thread ON ticket_replies(ticket_id, created_at, id);
+DROP INDEX IF EXISTS idx_ticket_replies_ticket_id;
+
+-- Keep attachment bodies uncompressed out of line so substr() reads only the
+-- TOAST chunks it needs instead of decompressing the whole value per slice.
+-- Applies to rows written from now on.
+ALTER TABLE ticket_attachments ALTER COLUMN file_data SET STORAGE EXTERNAL;
@@ -0,0 +1,122 @@
+-- Keep courses.current_students and companies.current_support_users in step
+-- with enrollments and profiles. Statement-level triggers read the changed rows
+-- from transition tables and apply one net delta per course or company, so a
+-- bulk insert of N enrollments costs one UPDATE per course rather than N.
+-- backend/counters.py reconciles any drift (e.g. rows loaded with triggers off).
+
+-- Active enrollments hold a seat
+CREATE OR REPLACE FUNCTION apply_course_student_deltas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE courses c SET current_students = coalesce(c.current_students, 0) + d.delta
+        FROM (SELECT course_id, count(*) AS delta FROM new_rows WHERE status = 'enrolled' GROUP BY course_id) d
+        WHERE c.id = d.course_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE courses c SET current_students = coalesce(c.current_students, 0) - d.delta
+        FROM (SELECT course_id, count(*) AS delta FROM old_rows WHERE status = 'enrolled' GROUP BY course_id) d
+        WHERE c.id = d.course_id;
+    ELSE
+        UPDATE courses c SET current_students = coalesce(c.current_students, 0) + d.delta
+        FROM (
+            SELECT course_id, sum(delta) AS delta FROM (
+                SELECT course_id, 1 AS delta FROM new_rows WHERE status = 'enrolled'
+                UNION ALL
+                SELECT course_id, -1 FROM old_rows WHERE status = 'enrolled'
+            ) changes
+            GROUP BY course_id
+            HAVING sum(delta) <> 0
+        ) d
+        WHERE c.id = d.course_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_course_students_insert ON enrollments;
+CREATE TRIGGER trigger_course_students_insert
+    AFTER INSERT ON enrollments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_course_student_deltas();
+
+DROP TRIGGER IF EXISTS trigger_course_students_update ON enrollments;
+CREATE TRIGGER trigger_course_students_update
+    AFTER UPDATE ON enrollments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_course_student_deltas();
+
+DROP TRIGGER IF EXISTS trigger_course_students_delete ON enrollments;
+CREATE TRIGGER trigger_course_students_delete
+    AFTER DELETE ON enrollments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_course_student_deltas();
+
+-- Active client profiles use one of their company's support seats
+CREATE OR REPLACE FUNCTION apply_company_support_user_deltas()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE companies c SET current_support_users = coalesce(c.current_support_users, 0) + d.delta
+        FROM (
+            SELECT company_id, count(*) AS delta FROM new_rows
+            WHERE role = 'client' AND is_active GROUP BY company_id
+        ) d
+        WHERE c.id = d.company_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE companies c SET current_support_users = coalesce(c.current_support_users, 0) - d.delta
+        FROM (
+            SELECT company_id, count(*) AS delta FROM old_rows
+            WHERE role = 'client' AND is_active GROUP BY company_id
+        ) d
+        WHERE c.id = d.company_id;
+    ELSE
+        UPDATE companies c SET current_support_users = coalesce(c.current_support_users, 0) + d.delta
+        FROM (
+            SELECT company_id, sum(delta) AS delta FROM (
+                SELECT company_id, 1 AS delta FROM new_rows WHERE role = 'client' AND is_active
+                UNION ALL
+                SELECT company_id, -1 FROM old_rows WHERE role = 'client' AND is_active
+            ) changes
+            GROUP BY company_id
+            HAVING sum(delta) <> 0
+        ) d
+        WHERE c.id = d.company_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_company_support_users_insert ON profiles;
+CREATE TRIGGER trigger_company_support_users_insert
+    AFTER INSERT ON profiles
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_company_support_user_deltas();
+
+DROP TRIGGER IF EXISTS trigger_company_support_users_update ON profiles;
+CREATE TRIGGER trigger_company_support_users_update
+    AFTER UPDATE ON profiles
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_company_support_user_deltas();
+
+DROP TRIGGER IF EXISTS trigger_company_support_users_delete ON profiles;
+CREATE TRIGGER trigger_company_support_users_delete
+    AFTER DELETE ON profiles
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_company_support_user_deltas();
+
+-- Start from exact values
+UPDATE courses c SET current_students = (
+    SELECT count(*) FROM enrollments e WHERE e.course_id = c.id AND e.status = 'enrolled'
+);
+UPDATE companies c SET current_support_users = (
+    SELECT count(*) FROM profiles p WHERE p.company_id = c.id AND p.role = 'client' AND p.is_active
+);
+
+CREATE INDEX IF NOT EXISTS idx_enrollments_course_id ON enrollments(course_id);
+CREATE INDEX IF NOT EXISTS idx_profiles_company_id ON profiles(company_id);
@@ -0,0 +1,69 @@
+-- Publish ticket and reply changes on the "ticket_events" channel for the
+-- backend's real-time hub (see backend/realtime.py). Payloads carry ids and
+-- the fields the hub needs to decide who may see the event, nothing more;
+-- clients fetch the details they want through the API.
+--
+-- Archiving moves a ticket and its replies to the cold partitions, which
+-- Postgres carries out as a DELETE plus an INSERT and so fires the INSERT
+-- triggers below. New rows are never inserted archived, so an archived INSERT
+-- is treated as that move: one ticket.updated, and nothing for the replies.
+
+CREATE OR REPLACE FUNCTION notify_ticket_event()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (NEW.status, NEW.priority, NEW.assigned_to, NEW.title, NEW.archived)
+        IS NOT DISTINCT FROM (OLD.status, OLD.priority, OLD.assigned_to, OLD.title, OLD.archived) THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('ticket_events', json_build_object(
+        'type', CASE WHEN TG_OP = 'INSERT' AND NOT NEW.archived THEN 'ticket.created' ELSE 'ticket.updated' END,
+        'ticket_id', NEW.id,
+        'ticket_number', NEW.ticket_number,
+        'status', NEW.status,
+        'priority', NEW.priority,
+        'archived', NEW.archived,
+        'company_id', NEW.company_id,
+        'created_by', NEW.created_by,
+        'assigned_to', NEW.assigned_to,
+        'previous_assigned_to', CASE TG_OP WHEN 'UPDATE' THEN OLD.assigned_to END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_ticket_event ON support_tickets;
+CREATE TRIGGER trigger_notify_ticket_event
+    AFTER INSERT OR UPDATE ON support_tickets
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_ticket_event();
+
+CREATE OR REPLACE FUNCTION notify_ticket_reply_event()
+RETURNS TRIGGER AS $$
+DECLARE
+    ticket RECORD;
+BEGIN
+    IF NEW.ticket_archived THEN
+        RETURN NULL;
+    END IF;
+    SELECT company_id, created_by, assigned_to INTO ticket
+    FROM support_tickets
+    WHERE id = NEW.ticket_id AND archived = NEW.ticket_archived AND created_at = NEW.ticket_created_at;
+    PERFORM pg_notify('ticket_events', json_build_object(
+        'type', 'reply.created',
+        'ticket_id', NEW.ticket_id,
+        'reply_id', NEW.id,
+        'author_id', NEW.created_by,
+        'is_internal', NEW.is_internal,
+        'company_id', ticket.company_id,
+        'created_by', ticket.created_by,
+        'assigned_to', ticket.assigned_to
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_notify_ticket_reply_event ON ticket_replies;
+CREATE TRIGGER trigger_notify_ticket_reply_event
+    AFTER INSERT ON ticket_replies
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_ticket_reply_event();
@@ -0,0 +1,75 @@
+-- Delta sync of ticket lists (see the /api/tickets/changes endpoint in backend/tickets.py)
+
+-- updated_at is the sync key, so the database sets it rather than trusting
+-- client clocks. clock_timestamp() is the time of the write itself, which keeps
+-- the gap to commit (covered by the endpoint's overlap window) short.
+CREATE OR REPLACE FUNCTION touch_ticket_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_touch_ticket_updated_at ON support_tickets;
+CREATE TRIGGER trigger_touch_ticket_updated_at
+    BEFORE INSERT OR UPDATE ON support_tickets
+    FOR EACH ROW
+    EXECUTE FUNCTION touch_ticket_updated_at();
+
+UPDATE support_tickets SET updated_at = created_at WHERE updated_at IS NULL;
+
+-- Changes are read per visibility rule in (updated_at, id) order; these replace
+-- the single-column indexes, which they also serve for plain lookups
+CREATE INDEX IF NOT EXISTS idx_support_tickets_sync ON support_tickets(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_support_tickets_company_sync ON support_tickets(company_id, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_support_tickets_created_by_sync ON support_tickets(created_by, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_support_tickets_assigned_to_sync ON support_tickets(assigned_to, updated_at, id);
+DROP INDEX IF EXISTS idx_support_tickets_company_id;
+DROP INDEX IF EXISTS idx_support_tickets_created_by;
+DROP INDEX IF EXISTS idx_support_tickets_assigned_to;
+
+-- A ticket leaving someone's list: deleted, or reassigned away from the
+-- people and company who could see it. Keeps who could see it before.
+CREATE TABLE IF NOT EXISTS ticket_tombstones (
+    id BIGSERIAL PRIMARY KEY,
+    ticket_id UUID NOT NULL,
+    company_id UUID,
+    created_by UUID,
+    assigned_to UUID,
+    reason VARCHAR(20) NOT NULL CHECK (reason IN ('deleted', 'visibility')),
+    removed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_tombstones_removed_at ON ticket_tombstones(removed_at);
+
+ALTER TABLE ticket_tombstones ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can manage ticket tombstones" ON ticket_tombstones FOR ALL USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
+
+CREATE OR REPLACE FUNCTION record_ticket_tombstone()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- Archiving moves the row between partitions as a DELETE plus INSERT;
+        -- by the time AFTER triggers run the moved row is back, so skip it
+        IF EXISTS (SELECT 1 FROM support_tickets WHERE id = OLD.id) THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO ticket_tombstones (ticket_id, company_id, created_by, assigned_to, reason)
+        VALUES (OLD.id, OLD.company_id, OLD.created_by, OLD.assigned_to, 'deleted');
+    ELSIF (NEW.company_id, NEW.created_by, NEW.assigned_to)
+        IS DISTINCT FROM (OLD.company_id, OLD.created_by, OLD.assigned_to) THEN
+        INSERT INTO ticket_tombstones (ticket_id, company_id, created_by, assigned_to, reason)
+        VALUES (OLD.id, OLD.company_id, OLD.created_by, OLD.assigned_to, 'visibility');
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_record_ticket_tombstone ON support_tickets;
+CREATE TRIGGER trigger_record_ticket_tombstone
+    AFTER UPDATE OF company_id, created_by, assigned_to OR DELETE ON support_tickets
+    FOR EACH ROW
+    EXECUTE FUNCTION record_ticket_tombstone();
@@ -0,0 +1,44 @@
+-- Automatic ticket assignment (see backend/assignment.py)
+
+-- Ticket categories each support agent (an admin profile) can take; agents
+-- without rows take tickets of any category
+CREATE TABLE IF NOT EXISTS agent_skills (
+    agent_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (agent_id, category)
+);
+
+ALTER TABLE agent_skills ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can manage agent skills" ON agent_skills FOR ALL USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
+
+-- The engine rebuilds agent load from the open tickets alone
+CREATE INDEX IF NOT EXISTS idx_support_tickets_open_load ON support_tickets(assigned_to, id) INCLUDE (category, status)
+    WHERE status IN ('open', 'in_progress', 'pending') AND NOT archived;
+
+-- Ticket events also carry the category, which the engine routes on, and fire when it changes
+CREATE OR REPLACE FUNCTION notify_ticket_event()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (NEW.status, NEW.priority, NEW.category, NEW.assigned_to, NEW.title, NEW.archived)
+        IS NOT DISTINCT FROM (OLD.status, OLD.priority, OLD.category, OLD.assigned_to, OLD.title, OLD.archived) THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('ticket_events', json_build_object(
+        'type', CASE WHEN TG_OP = 'INSERT' AND NOT NEW.archived THEN 'ticket.created' ELSE 'ticket.updated' END,
+        'ticket_id', NEW.id,
+        'ticket_number', NEW.ticket_number,
+        'status', NEW.status,
+        'priority', NEW.priority,
+        'category', NEW.category,
+        'archived', NEW.archived,
+        'company_id', NEW.company_id,
+        'created_by', NEW.created_by,
+        'assigned_to', NEW.assigned_to,
+        'previous_assigned_to', CASE TG_OP WHEN 'UPDATE' THEN OLD.assigned_to END
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,24 @@
+-- SLA escalation of stale urgent and high priority tickets (see backend/escalation.py)
+
+ALTER TABLE support_tickets ADD COLUMN IF NOT EXISTS escalated_at TIMESTAMP WITH TIME ZONE;
+
+-- Only unfinished urgent/high tickets in the hot partitions can become due, so
+-- the scan reads this small index instead of the ticket history. The
+-- escalator's WHERE clause repeats the predicate so that prepared (generic)
+-- plans can use it too.
+CREATE INDEX IF NOT EXISTS idx_support_tickets_escalation ON support_tickets(priority, updated_at, id)
+    WHERE status IN ('open', 'in_progress', 'pending') AND priority IN ('urgent', 'high') AND NOT archived;
+
+-- How far the escalator has scanned each priority, in (updated_at, id) order
+CREATE TABLE IF NOT EXISTS ticket_escalation_marks (
+    priority VARCHAR(20) PRIMARY KEY,
+    last_updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_ticket_id UUID NOT NULL,
+    escalated BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE ticket_escalation_marks ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Admins can manage ticket escalation marks" ON ticket_escalation_marks FOR ALL USING (
+    EXISTS (SELECT 1 FROM profiles WHERE profiles.user_id = auth.uid() AND profiles.role = 'admin')
+);
@@ -0,0 +1,290 @@
+"""On-demand and slow-request profiling for a running worker.
+
+Both features are off by default. ``PROFILING_ENABLED=true`` exposes the
+admin profiling endpoints; ``SLOW_REQUEST_THRESHOLD_MS`` (optionally
+overridden per route with ``SLOW_REQUEST_ROUTE_THRESHOLDS``, e.g.
+``/api/send-contact-email=2000,/api/health=50``) turns on a background stack
+sampler whose samples are saved whenever a request runs over its threshold.
+"""
+import asyncio
+import collections
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from auth import require_admin
+from request_context import current_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() == "true"
+PROFILING_MAX_SECONDS = float(os.environ.get("PROFILING_MAX_SECONDS", "60"))
+SAMPLE_INTERVAL = float(os.environ.get("PROFILING_SAMPLE_INTERVAL_MS", "10")) / 1000
+
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get("SLOW_REQUEST_THRESHOLD_MS", "0"))
+SLOW_REQUEST_PROFILE_DIR = os.environ.get(
+    "SLOW_REQUEST_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "azellar-slow-requests")
+)
+SLOW_REQUEST_KEEP = int(os.environ.get("SLOW_REQUEST_KEEP", "50"))
+# Seconds of samples kept in memory for slow-request capture
+SLOW_REQUEST_WINDOW = float(os.environ.get("SLOW_REQUEST_WINDOW_SECONDS", "30"))
+
+
+def _parse_route_thresholds(value: str) -> dict:
+    thresholds = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, ms = item.rpartition("=")
+        thresholds[route] = float(ms)
+    return thresholds
+
+
+SLOW_REQUEST_ROUTE_THRESHOLDS = _parse_route_thresholds(os.environ.get("SLOW_REQUEST_ROUTE_THRESHOLDS", ""))
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Periodically record the Python stack of every thread in the process.
+
+    Samples hold code objects only; they are turned into text when collapsed,
+    which keeps the per-tick cost to walking the frames.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, maxlen: int = None):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=maxlen)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                self.samples.append((now, names.get(ident, str(ident)), tuple(stack)))
+
+    def collapse(self, since: float = None, until: float = None) -> str:
+        """Return samples in collapsed-stack format, one ``stack count`` per line."""
+        counts = collections.Counter()
+        for sampled_at, thread_name, stack in list(self.samples):
+            if since is not None and sampled_at < since:
+                continue
+            if until is not None and sampled_at > until:
+                continue
+            counts[(thread_name, stack)] += 1
+        lines = []
+        for (thread_name, stack), count in counts.most_common():
+            frames = ";".join(_frame_label(code) for code in reversed(stack))
+            lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+router = APIRouter(prefix="/api/admin/profile", dependencies=[Depends(require_admin)])
+
+# Output formats of each profiling mode, the default first
+PROFILE_FORMATS = {"sample": ("collapsed",), "cprofile": ("text", "pstats")}
+# Only one on-demand profile may run per worker at a time
+_profile_lock = asyncio.Lock()
+
+
+def _require_enabled():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+@router.post("")
+async def run_profile(
+    seconds: float = Query(10, gt=0),
+    mode: str = Query("sample", pattern="^(sample|cprofile)$"),
+    format: Optional[str] = Query(None, pattern="^(collapsed|pstats|text)$"),
+):
+    """Profile this worker for ``seconds`` and return the result.
+
+    ``sample`` mode records stacks of all threads and returns collapsed stacks.
+    ``cprofile`` mode instruments the event loop thread and returns either a
+    binary pstats dump or a text report sorted by cumulative time (the default).
+    """
+    _require_enabled()
+    format = format or PROFILE_FORMATS[mode][0]
+    if format not in PROFILE_FORMATS[mode]:
+        raise HTTPException(
+            status_code=400, detail=f"{mode} mode supports format={' or '.join(PROFILE_FORMATS[mode])}"
+        )
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    seconds = min(seconds, PROFILING_MAX_SECONDS)
+
+    async with _profile_lock:
+        if mode == "sample":
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                sampler.stop()
+            return Response(sampler.collapse(), media_type="text/plain")
+
+        # cProfile only sees the thread that enabled it, which is the event
+        # loop thread here, so every coroutine step it runs is captured.
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+    if format == "pstats":
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as dump:
+            profiler.dump_stats(dump.name)
+            content = dump.read()
+        return Response(
+            content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="worker-{os.getpid()}.pstats"'},
+        )
+    report = io.StringIO()
+    pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(100)
+    return Response(report.getvalue(), media_type="text/plain")
+
+
+@router.get("/slow")
+async def list_slow_request_profiles():
+    """List slow-request captures saved by this host, newest first."""
+    _require_enabled()
+    if not os.path.isdir(SLOW_REQUEST_PROFILE_DIR):
+        return {"profiles": []}
+    names = sorted(os.listdir(SLOW_REQUEST_PROFILE_DIR), reverse=True)
+    return {"profiles": names}
+
+
+@router.get("/slow/{name}")
+async def get_slow_request_profile(name: str):
+    _require_enabled()
+    path = os.path.join(SLOW_REQUEST_PROFILE_DIR, os.path.basename(name))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain")
+
+
+class SlowRequestProfiler:
+    """Save the sampled stacks covering any request slower than its threshold.
+
+    A single background sampler keeps a rolling window of stacks. Samples are
+    per thread, not per request, so with concurrent traffic a capture shows
+    everything the worker was doing while the slow request was in flight.
+    """
+
+    def __init__(self, default_threshold_ms: float, route_thresholds: dict, directory: str, keep: int):
+        self.default_threshold_ms = default_threshold_ms
+        self.route_thresholds = route_thresholds
+        self.directory = directory
+        self.keep = keep
+        self.sampler = StackSampler(maxlen=int(SLOW_REQUEST_WINDOW / SAMPLE_INTERVAL) * 8)
+
+    def threshold_for(self, route: str) -> float:
+        return self.route_thresholds.get(route, self.default_threshold_ms)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+
+    async def capture(self, route: str, started: float, finished: float):
+        # Collapsing the window and the file writes stay off the event loop
+        await run_in_threadpool(self._save, route, started, finished, current_request_id() or "unknown")
+
+    def _save(self, route: str, started: float, finished: float, request_id: str):
+        collapsed = self.sampler.collapse(since=started, until=finished)
+        elapsed_ms = (finished - started) * 1000
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{request_id}.collapsed"
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(f"# route={route} elapsed_ms={elapsed_ms:.1f}\n")
+            out.write(collapsed)
+        logger.warning("Slow request on %s took %.1f ms; profile saved to %s", route, elapsed_ms, path)
+        self._prune()
+
+    def _prune(self):
+        names = sorted(os.listdir(self.directory))
+        for name in names[: max(0, len(names) - self.keep)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+slow_request_profiler = None
+if SLOW_REQUEST_THRESHOLD_MS > 0 or SLOW_REQUEST_ROUTE_THRESHOLDS:
+    slow_request_profiler = SlowRequestProfiler(
+        SLOW_REQUEST_THRESHOLD_MS or float("inf"),
+        SLOW_REQUEST_ROUTE_THRESHOLDS,
+        SLOW_REQUEST_PROFILE_DIR,
+        SLOW_REQUEST_KEEP,
+    )
+
+
+class SlowRequestMiddleware:
+    """Time each HTTP request and hand slow ones to the slow-request profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or slow_request_profiler is None:
+            await self.app(scope, receive, send)
+            return
+        started = time.monotonic()
+        streaming = False
+
+        async def send_wrapper(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                # Event streams stay open by design; their duration says nothing about speed
+                streaming = (b"content-type", b"text/event-stream") in (
+                    (name.lower(), value.split(b";")[0]) for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.monotonic()
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            if not streaming and (finished - started) * 1000 > slow_request_profiler.threshold_for(route):
+                try:
+                    await slow_request_profiler.capture(route, started, finished)
+                except OSError:
+                    logger.exception("Failed to save slow request profile")
@@ -0,0 +1,244 @@
+"""Bulk provisioning of users and their profiles.
+
+Onboarding a client company means creating dozens of support users. A
+provisioning request creates the missing Supabase auth users through the
+GoTrue admin API, ``PROVISIONING_CONCURRENCY`` at a time, then inserts all of
+their profiles with one multi-row statement; the statement-level counter
+triggers from migration 008 then move each company's
+``current_support_users`` once for the whole batch.
+
+Addresses that already have a profile are left alone, and an auth user that
+already exists is reused rather than created twice, so a request can be
+retried as is. Client users only get a profile while their company has
+support seats left (``max_support_users``); the companies are locked while
+the profiles are inserted, so concurrent requests cannot oversell seats.
+
+New auth users get a random password and a confirmed email; they sign in
+after a password reset.
+"""
+import asyncio
+import logging
+import os
+import secrets
+from typing import List, Literal, Optional
+from uuid import UUID
+
+import requests
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+import db
+from auth import SUPABASE_URL, require_admin
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+PROVISIONING_CONCURRENCY = int(os.environ.get("PROVISIONING_CONCURRENCY", "8"))
+PROVISIONING_MAX_USERS = int(os.environ.get("PROVISIONING_MAX_USERS", "500"))
+PROVISIONING_TIMEOUT_SECONDS = 15
+
+router = APIRouter(prefix="/api/admin/users", dependencies=[Depends(require_admin)])
+
+
+class ProvisionedUser(BaseModel):
+    email: str = Field(min_length=3, max_length=255)
+    full_name: Optional[str] = Field(None, max_length=255)
+    role: Literal["student", "client", "admin"] = "client"
+    # Defaults to the request's company_id
+    company_id: Optional[UUID] = None
+
+
+class ProvisionRequest(BaseModel):
+    users: List[ProvisionedUser] = Field(min_length=1)
+    company_id: Optional[UUID] = None
+
+
+class AuthAdminClient:
+    """Minimal client for the GoTrue admin API; one pooled HTTP session, used from the thread pool."""
+
+    def __init__(self, url: str, service_role_key: str):
+        self.url = f"{url.rstrip('/')}/auth/v1/admin/users"
+        self.session = requests.Session()
+        self.session.headers.update({"apikey": service_role_key, "Authorization": f"Bearer {service_role_key}"})
+
+    def create_user(self, email: str, full_name: Optional[str]) -> str:
+        response = self.session.post(
+            self.url,
+            json={
+                "email": email,
+                "password": secrets.token_urlsafe(24),
+                "email_confirm": True,
+                "user_metadata": {"full_name": full_name} if full_name else {},
+            },
+            timeout=PROVISIONING_TIMEOUT_SECONDS,
+        )
+        if response.status_code >= 400:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            message = body.get("msg") or body.get("message") or body.get("error_description") or response.text
+            raise RuntimeError(f"auth user not created ({response.status_code}): {message}")
+        return response.json()["id"]
+
+
+_auth_admin = None
+
+
+def auth_admin() -> AuthAdminClient:
+    global _auth_admin
+    if not (SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY):
+        raise HTTPException(
+            status_code=503, detail="User provisioning requires SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY"
+        )
+    if _auth_admin is None:
+        _auth_admin = AuthAdminClient(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return _auth_admin
+
+
+async def create_auth_users(users: list) -> dict:
+    """Create auth users with bounded concurrency; returns email -> user id or the exception."""
+    client = auth_admin()
+    limit = asyncio.Semaphore(PROVISIONING_CONCURRENCY)
+
+    async def create(user):
+        async with limit:
+            return await run_in_threadpool(client.create_user, user["email"], user["full_name"])
+
+    results = await asyncio.gather(*(create(user) for user in users), return_exceptions=True)
+    return {user["email"]: result for user, result in zip(users, results)}
+
+
+def _seat_errors(users: list, companies: dict) -> dict:
+    """email -> reason for each user who cannot get a profile in their company."""
+    errors = {}
+    used = {company_id: row["current_support_users"] for company_id, row in companies.items()}
+    for user in users:
+        company_id = user["company_id"]
+        if company_id is None:
+            continue
+        company = companies.get(company_id)
+        if company is None:
+            errors[user["email"]] = "company not found"
+        elif not company["is_active"]:
+            errors[user["email"]] = "company is not active"
+        elif user["role"] == "client":
+            if company["max_support_users"] is not None and used[company_id] >= company["max_support_users"]:
+                errors[user["email"]] = "company has no support seats left"
+            else:
+                used[company_id] += 1
+    return errors
+
+
+COMPANIES_QUERY = """
+    SELECT id, is_active, max_support_users, coalesce(current_support_users, 0) AS current_support_users
+    FROM companies WHERE id = ANY($1::uuid[])
+    ORDER BY id
+"""
+
+
+async def provision_users(pool, users: list, default_company_id: UUID = None) -> list:
+    """Create auth users and profiles; returns one result per requested user, in order.
+
+    ``status`` is ``created`` (new auth user and profile), ``linked`` (profile
+    for an existing auth user), ``exists`` (profile already there), or
+    ``failed`` with an ``error``.
+    """
+    results, pending = [], {}
+    for user in users:
+        user = {
+            "email": user.email.strip().lower(),
+            "full_name": user.full_name,
+            "role": user.role,
+            "company_id": user.company_id or default_company_id,
+        }
+        result = {"email": user["email"], "status": None}
+        results.append(result)
+        if user["email"] in pending:
+            result.update(status="failed", error="duplicate email in request")
+        else:
+            pending[user["email"]] = user
+    emails = list(pending)
+
+    profiles = await pool.fetch("SELECT email, user_id FROM profiles WHERE lower(email) = ANY($1::text[])", emails)
+    existing_profiles = {row["email"].lower(): row["user_id"] for row in profiles}
+    auth_users = await pool.fetch(
+        "SELECT id, lower(email) AS email FROM auth.users WHERE lower(email) = ANY($1::text[])", emails
+    )
+    user_ids = {row["email"]: row["id"] for row in auth_users}
+    company_ids = list({user["company_id"] for user in pending.values() if user["company_id"]})
+    companies = {row["id"]: row for row in await pool.fetch(COMPANIES_QUERY, company_ids)}
+
+    outcome = {
+        email: {"status": "exists", "user_id": existing_profiles[email]} for email in emails if email in existing_profiles
+    }
+    wanted = [user for email, user in pending.items() if email not in outcome]
+    # Turn away users without a seat before creating auth users they could not use
+    for email, error in _seat_errors(wanted, companies).items():
+        outcome[email] = {"status": "failed", "error": error}
+    wanted = [user for user in wanted if user["email"] not in outcome]
+
+    created = await create_auth_users([user for user in wanted if user["email"] not in user_ids]) if wanted else {}
+    for email, result in created.items():
+        if isinstance(result, Exception):
+            logger.warning("Provisioning %s failed: %s", email, result)
+            outcome[email] = {"status": "failed", "error": str(result)}
+        else:
+            user_ids[email] = UUID(str(result))
+    wanted = [user for user in wanted if user["email"] not in outcome]
+
+    if wanted:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Lock the companies and re-check seats: another request may have taken some meanwhile
+                company_ids = list({user["company_id"] for user in wanted if user["company_id"]})
+                companies = {row["id"]: row for row in await conn.fetch(COMPANIES_QUERY + " FOR UPDATE", company_ids)}
+                for email, error in _seat_errors(wanted, companies).items():
+                    outcome[email] = {"status": "failed", "error": error, "user_id": user_ids[email]}
+                wanted = [user for user in wanted if user["email"] not in outcome]
+                inserted = await conn.fetch(
+                    """
+                    INSERT INTO profiles (user_id, email, full_name, role, company_id, is_active)
+                    SELECT u.*, true
+                    FROM unnest($1::uuid[], $2::text[], $3::text[], $4::text[], $5::uuid[])
+                        AS u(user_id, email, full_name, role, company_id)
+                    ON CONFLICT (email) DO NOTHING
+                    RETURNING email
+                    """,
+                    [user_ids[user["email"]] for user in wanted],
+                    [user["email"] for user in wanted],
+                    [user["full_name"] for user in wanted],
+                    [user["role"] for user in wanted],
+                    [user["company_id"] for user in wanted],
+                )
+        inserted = {row["email"] for row in inserted}
+        for user in wanted:
+            email = user["email"]
+            if email not in inserted:
+                # A profile for the address appeared between our check and the insert
+                status = "exists"
+            else:
+                status = "linked" if email not in created else "created"
+            outcome[email] = {"status": status, "user_id": user_ids[email]}
+
+    for result in results:
+        if result["status"] is None:
+            found = outcome[result["email"]]
+            result.update(found, user_id=str(found["user_id"]) if found.get("user_id") else None)
+    return results
+
+
+@router.post("/bulk")
+async def bulk_provision_users(request: ProvisionRequest):
+    """Create up to ``PROVISIONING_MAX_USERS`` users with their profiles and report each outcome."""
+    if len(request.users) > PROVISIONING_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {PROVISIONING_MAX_USERS} users per request")
+    pool = db.require_pool()
+    auth_admin()
+    results = await provision_users(pool, request.users, request.company_id)
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    logger.info("Provisioned users: %s", counts)
+    return {"counts": counts, "results": results}
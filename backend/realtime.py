@@ -0,0 +1,221 @@
+"""Real-time ticket events over Server-Sent Events.
+
+Triggers from migration 009 publish ticket and reply changes on the
+``ticket_events`` channel. Each worker holds one dedicated LISTEN connection
+and fans every event out in-process to the subscribers allowed to see it:
+admins see everything, other users see tickets they opened or are assigned
+to and their company's tickets, and internal notes reach admins only.
+Subscribers are indexed by user and company, so an event only touches the
+queues it is delivered to, however many idle streams the worker holds.
+
+Each subscriber has a queue of at most ``REALTIME_QUEUE_SIZE`` events. A
+client that falls that far behind has its backlog dropped and receives a
+single ``resync`` event telling it to refetch; the same happens to everyone
+after the LISTEN connection has been re-established, since events may have
+been missed in between.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Optional
+from uuid import UUID
+
+import asyncpg
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+import db
+from auth import AuthContext, get_stream_user, require_admin
+
+logger = logging.getLogger(__name__)
+
+TICKET_EVENTS_CHANNEL = "ticket_events"
+# LISTEN needs a session; point this at Postgres directly when DATABASE_URL goes through a transaction pooler
+REALTIME_DATABASE_URL = os.environ.get("REALTIME_DATABASE_URL") or db.DATABASE_URL
+REALTIME_QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "100"))
+REALTIME_HEARTBEAT_SECONDS = float(os.environ.get("REALTIME_HEARTBEAT_SECONDS", "25"))
+REALTIME_RECONNECT_SECONDS = 5.0
+
+RESYNC = {"type": "resync"}
+
+
+class Subscriber:
+    def __init__(self, user: AuthContext, ticket_id: Optional[str] = None):
+        self.user = user
+        self.ticket_id = ticket_id
+        self.queue = asyncio.Queue(maxsize=REALTIME_QUEUE_SIZE)
+        self.dropped = 0
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event; make it refetch instead
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class TicketEventHub:
+    """Fan ``ticket_events`` notifications out to this worker's subscribers."""
+
+    def __init__(self):
+        self.admins = set()
+        self.by_user = {}
+        self.by_company = {}
+        self.delivered = 0
+        # In-process consumers called with every event, before any subscriber filtering
+        self.listeners = []
+        self._conn = None
+        self._task = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.admins) + sum(len(s) for s in self.by_user.values())
+
+    def subscribe(self, user: AuthContext, ticket_id: str = None) -> Subscriber:
+        subscriber = Subscriber(user, ticket_id)
+        if user.role == "admin":
+            self.admins.add(subscriber)
+        else:
+            self.by_user.setdefault(user.user_id, set()).add(subscriber)
+            if user.company_id:
+                self.by_company.setdefault(user.company_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        user = subscriber.user
+        self.admins.discard(subscriber)
+        for index, key in ((self.by_user, user.user_id), (self.by_company, user.company_id)):
+            group = index.get(key)
+            if group is not None:
+                group.discard(subscriber)
+                if not group:
+                    del index[key]
+
+    def recipients(self, event: dict) -> set:
+        """Subscribers allowed to see ``event``; mirrors the ticket row-level security policies."""
+        targets = set(self.admins)
+        if not event.get("is_internal"):
+            for key in ("created_by", "assigned_to", "previous_assigned_to"):
+                targets.update(self.by_user.get(event.get(key), ()))
+            targets.update(self.by_company.get(event.get("company_id"), ()))
+        return targets
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def _notify_listeners(self, event: dict):
+        for callback in self.listeners:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Ticket event listener failed")
+
+    def publish(self, event: dict):
+        self._notify_listeners(event)
+        ticket_id = event.get("ticket_id")
+        for subscriber in self.recipients(event):
+            if subscriber.ticket_id is None or subscriber.ticket_id == ticket_id:
+                subscriber.push(event)
+                self.delivered += 1
+
+    def broadcast(self, event: dict):
+        self._notify_listeners(event)
+        for subscriber in list(self.admins) + [s for group in self.by_user.values() for s in group]:
+            subscriber.push(event)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed ticket event: %r", payload)
+            return
+        self.publish(event)
+
+    def start(self):
+        if REALTIME_DATABASE_URL:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        connected_before = False
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._conn = await asyncpg.connect(REALTIME_DATABASE_URL)
+                self._conn.add_termination_listener(lambda conn: lost.set())
+                await self._conn.add_listener(TICKET_EVENTS_CHANNEL, self._on_notify)
+                if connected_before:
+                    logger.info("Ticket event listener reconnected")
+                    self.broadcast(RESYNC)
+                connected_before = True
+                await lost.wait()
+                logger.warning("Ticket event listener lost its connection")
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.error("Ticket event listener could not connect: %s", e)
+            finally:
+                conn, self._conn = self._conn, None
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(REALTIME_RECONNECT_SECONDS)
+
+
+ticket_event_hub = TicketEventHub()
+
+router = APIRouter(prefix="/api/tickets")
+
+
+def _format(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_events(user: AuthContext, ticket_id: str = None):
+    # Subscribed from inside the stream so the finally below always unsubscribes
+    subscriber = ticket_event_hub.subscribe(user, ticket_id)
+    try:
+        yield f"retry: {int(REALTIME_RECONNECT_SECONDS * 1000)}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), REALTIME_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": ping\n\n"
+                continue
+            yield _format(event)
+    finally:
+        ticket_event_hub.unsubscribe(subscriber)
+
+
+@router.get("/events")
+async def ticket_events(ticket_id: UUID = None, user: AuthContext = Depends(get_stream_user)):
+    """Server-Sent Events stream of ticket changes visible to the caller.
+
+    Optionally limited to one ticket. Events: ``ticket.created``,
+    ``ticket.updated``, ``reply.created`` and ``resync``.
+    """
+    return StreamingResponse(
+        stream_events(user, str(ticket_id) if ticket_id else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/events/stats", dependencies=[Depends(require_admin)])
+async def ticket_event_stats():
+    """Subscriber and delivery counts for this worker."""
+    return {
+        "connected": ticket_event_hub._conn is not None,
+        "subscribers": ticket_event_hub.subscribers,
+        "delivered": ticket_event_hub.delivered,
+    }
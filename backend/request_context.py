@@ -0,0 +1,99 @@
+import contextvars
+import logging
+import re
+import time
+import uuid
+
+access_logger = logging.getLogger("azellar.access")
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._-]{1,128}$")
+
+
+class RequestContext:
+    """Per-request state shared with loggers and tracing through a context variable."""
+
+    __slots__ = ("request_id", "scope", "started")
+
+    def __init__(self, request_id: str, scope: dict, started: float):
+        self.request_id = request_id
+        self.scope = scope
+        self.started = started
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route on the scope, so this resolves to
+        # the path template once routing has happened and the raw path before.
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_current = contextvars.ContextVar("request_context", default=None)
+
+
+def current_request():
+    return _current.get()
+
+
+def current_request_id():
+    ctx = _current.get()
+    return ctx.request_id if ctx is not None else None
+
+
+def _incoming_request_id(scope: dict):
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_ID_HEADER:
+            if _VALID_REQUEST_ID.match(value):
+                return value.decode("ascii")
+            return None
+    return None
+
+
+class RequestContextMiddleware:
+    """Assign a request id to every HTTP request and emit one access record.
+
+    An incoming ``X-Request-ID`` header is reused when it is well formed so ids
+    can be correlated with upstream proxies; it is echoed on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = _incoming_request_id(scope) or uuid.uuid4().hex
+        ctx = RequestContext(request_id, scope, time.perf_counter())
+        token = _current.set(ctx)
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (REQUEST_ID_HEADER, request_id.encode("ascii")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            latency_ms = round((time.perf_counter() - ctx.started) * 1000, 2)
+            access_logger.log(
+                logging.WARNING if status >= 500 else logging.INFO,
+                "%s %s %d",
+                scope["method"],
+                ctx.route,
+                status,
+                extra={
+                    "method": scope["method"],
+                    "status": status,
+                    "latency_ms": latency_ms,
+                    "sample": status < 400,
+                },
+            )
+            _current.reset(token)
@@ -0,0 +1,301 @@
+"""Durable scheduler for emails sent at a later time.
+
+Jobs are rows in ``scheduled_emails``. Each worker keeps an in-memory heap of
+only the jobs due within ``SCHEDULER_HORIZON_SECONDS``, refilled from the
+partial index on pending rows, and sleeps until the earliest one is due. Due
+jobs are claimed in one ``UPDATE ... RETURNING`` so that with several
+workers each job is sent once, then sent concurrently and marked in a single
+statement. Pending jobs further out cost nothing until they enter the
+horizon, so the table can hold hundreds of thousands of them.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+import db
+import email_templates
+import mailer
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_HORIZON_SECONDS = float(os.environ.get("SCHEDULER_HORIZON_SECONDS", "3600"))
+SCHEDULER_BATCH_SIZE = int(os.environ.get("SCHEDULER_BATCH_SIZE", "200"))
+SCHEDULER_SEND_CONCURRENCY = int(os.environ.get("SCHEDULER_SEND_CONCURRENCY", "10"))
+SCHEDULER_MAX_ATTEMPTS = int(os.environ.get("SCHEDULER_MAX_ATTEMPTS", "5"))
+# A job left in 'sending' this long belonged to a worker that died mid-send
+SCHEDULER_STALE_SENDING_SECONDS = 600
+# How long stop() waits for a batch already with the provider to be marked sent
+SCHEDULER_STOP_TIMEOUT_SECONDS = float(os.environ.get("EMAIL_DRAIN_TIMEOUT", "20"))
+REMINDER_LEAD_DAYS = int(os.environ.get("REMINDER_LEAD_DAYS", "7"))
+REMINDER_SEND_HOUR_UTC = int(os.environ.get("REMINDER_SEND_HOUR_UTC", "9"))
+
+
+def _course_reminder_params(payload: dict) -> dict:
+    return {
+        "from": "onboarding@resend.dev",
+        "to": payload["student_email"],
+        "subject": f"Joining Instructions - {payload['course_name']}",
+        "html": email_templates.course_reminder_html(
+            payload["student_name"], payload["course_name"], payload["course_details"]
+        ),
+    }
+
+
+def _ticket_escalation_params(payload: dict) -> dict:
+    return {
+        "from": "onboarding@resend.dev",
+        "to": payload["to"],
+        "subject": f"Escalated: {payload['ticket_number']} - {payload['title']}",
+        "html": email_templates.ticket_escalation_html(payload),
+    }
+
+
+# Jobs store their render context; templates are applied when the job fires
+RENDERERS = {
+    "course_reminder": _course_reminder_params,
+    "ticket_escalation": _ticket_escalation_params,
+}
+
+
+class EmailScheduler:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self._heap = []
+        # job id -> run_at of its live heap entry; entries that disagree are stale
+        self._queued = {}
+        self._horizon_end = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._firing = None
+        self._stopping = False
+
+    def __len__(self):
+        return len(self._queued)
+
+    def _push(self, run_at: datetime, job_id: int) -> None:
+        if self._queued.get(job_id) == run_at:
+            return
+        # A rescheduled job gets a new entry; the old one is skipped when it pops
+        self._queued[job_id] = run_at
+        heapq.heappush(self._heap, (run_at, job_id))
+
+    async def schedule(self, kind: str, run_at: datetime, payload: dict, dedupe_key: str) -> int:
+        """Persist a job and, if it falls inside the current horizon, queue it in memory."""
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown scheduled email kind: {kind}")
+        job_id = await db.require_pool().fetchval(
+            """
+            INSERT INTO scheduled_emails (kind, dedupe_key, run_at, payload) VALUES ($1, $2, $3, $4::jsonb)
+            ON CONFLICT (dedupe_key) DO UPDATE
+                SET run_at = EXCLUDED.run_at, payload = EXCLUDED.payload, updated_at = CURRENT_TIMESTAMP
+                WHERE scheduled_emails.status = 'pending'
+            RETURNING id
+            """,
+            kind,
+            dedupe_key,
+            run_at,
+            json.dumps(payload),
+        )
+        if job_id is not None:
+            self.enqueue(run_at, job_id)
+        return job_id
+
+    def enqueue(self, run_at: datetime, job_id: int) -> None:
+        """Queue a job already committed to ``scheduled_emails`` if it falls inside the current horizon."""
+        if self._horizon_end is not None and run_at <= self._horizon_end:
+            self._push(run_at, job_id)
+            if self._heap[0][1] == job_id:
+                self._wakeup.set()
+        else:
+            # Moved out of the horizon: a refill will queue it again in time
+            self._queued.pop(job_id, None)
+
+    async def schedule_course_reminder(self, student_name: str, student_email: str, course_name: str, course_details: dict):
+        """Queue joining instructions ``REMINDER_LEAD_DAYS`` before the course start date.
+
+        Returns the job id, or None when there is no usable future start date.
+        """
+        try:
+            start_date = date.fromisoformat(str(course_details.get("start_date") or "")[:10])
+        except ValueError:
+            return None
+        now = datetime.now(timezone.utc)
+        starts_at = datetime.combine(start_date, time(0), timezone.utc)
+        if starts_at <= now:
+            return None
+        run_at = datetime.combine(
+            start_date - timedelta(days=REMINDER_LEAD_DAYS), time(REMINDER_SEND_HOUR_UTC), timezone.utc
+        )
+        # Enrolled inside the lead time: send the instructions right away
+        run_at = max(run_at, now)
+        payload = {
+            "student_name": student_name,
+            "student_email": student_email,
+            "course_name": course_name,
+            "course_details": course_details,
+        }
+        dedupe_key = f"course_reminder:{student_email.lower()}:{course_name}:{start_date.isoformat()}"
+        return await self.schedule("course_reminder", run_at, payload, dedupe_key)
+
+    async def refill(self) -> None:
+        """Queue pending jobs that fall inside the next horizon."""
+        pool = db.get_pool()
+        if pool is None:
+            return
+        horizon_end = datetime.now(timezone.utc) + timedelta(seconds=SCHEDULER_HORIZON_SECONDS)
+        async with pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE scheduled_emails SET status = 'pending', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'sending' AND updated_at < CURRENT_TIMESTAMP - make_interval(secs => $1)
+                """,
+                SCHEDULER_STALE_SENDING_SECONDS,
+            )
+            rows = await conn.fetch(
+                "SELECT id, run_at FROM scheduled_emails WHERE status = 'pending' AND run_at <= $1",
+                horizon_end,
+            )
+        for row in rows:
+            self._push(row["run_at"], row["id"])
+        self._horizon_end = horizon_end
+
+    async def _fire(self, job_ids: list) -> None:
+        pool = db.require_pool()
+        async with pool.acquire() as conn:
+            claimed = await conn.fetch(
+                """
+                UPDATE scheduled_emails
+                SET status = 'sending', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ANY($1::bigint[]) AND status = 'pending' AND run_at <= CURRENT_TIMESTAMP
+                RETURNING id, kind, attempts, payload
+                """,
+                job_ids,
+            )
+        if not claimed:
+            return
+
+        limit = asyncio.Semaphore(SCHEDULER_SEND_CONCURRENCY)
+
+        async def send(job):
+            async with limit:
+                await mailer.send_email(RENDERERS[job["kind"]](json.loads(job["payload"])))
+
+        results = await asyncio.gather(*(send(job) for job in claimed), return_exceptions=True)
+
+        sent_ids, retry_ids, retry_delays, failed_ids, errors = [], [], [], [], []
+        for job, result in zip(claimed, results):
+            if not isinstance(result, Exception):
+                sent_ids.append(job["id"])
+            elif job["attempts"] >= SCHEDULER_MAX_ATTEMPTS:
+                failed_ids.append(job["id"])
+                errors.append(str(result))
+            else:
+                retry_ids.append(job["id"])
+                retry_delays.append(60.0 * job["attempts"] ** 2)
+                errors.append(str(result))
+        retried = []
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if sent_ids:
+                    await conn.execute(
+                        """
+                        UPDATE scheduled_emails SET status = 'sent', sent_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ANY($1::bigint[])
+                        """,
+                        sent_ids,
+                    )
+                if retry_ids or failed_ids:
+                    ids = retry_ids + failed_ids
+                    delays = retry_delays + [None] * len(failed_ids)
+                    retried = await conn.fetch(
+                        """
+                        UPDATE scheduled_emails AS job
+                        SET status = CASE WHEN f.delay IS NULL THEN 'failed' ELSE 'pending' END,
+                            run_at = CASE WHEN f.delay IS NULL THEN job.run_at
+                                          ELSE CURRENT_TIMESTAMP + make_interval(secs => f.delay) END,
+                            last_error = f.error,
+                            updated_at = CURRENT_TIMESTAMP
+                        FROM unnest($1::bigint[], $2::float8[], $3::text[]) AS f(id, delay, error)
+                        WHERE job.id = f.id
+                        RETURNING job.id, job.run_at, job.status
+                        """,
+                        ids,
+                        delays,
+                        errors,
+                    )
+        # Retries due before the next refill would otherwise wait for it
+        for job in retried:
+            if job["status"] == "pending":
+                self.enqueue(job["run_at"], job["id"])
+        self.sent += len(sent_ids)
+        self.failed += len(failed_ids)
+        if retry_ids or failed_ids:
+            logger.warning(
+                "Scheduled emails: %d sent, %d will retry, %d failed", len(sent_ids), len(retry_ids), len(failed_ids)
+            )
+
+    def _pop_due(self, now: datetime) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < SCHEDULER_BATCH_SIZE:
+            run_at, job_id = heapq.heappop(self._heap)
+            if self._queued.get(job_id) != run_at:
+                continue
+            del self._queued[job_id]
+            due.append(job_id)
+        return due
+
+    def start(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = SCHEDULER_STOP_TIMEOUT_SECONDS):
+        self._stopping = True
+        if self._firing is not None and not self._firing.done():
+            # Cancelling mid-batch would leave jobs the provider already accepted in
+            # 'sending', and the stale-job reset would send them a second time
+            _, not_done = await asyncio.wait({self._firing}, timeout=timeout)
+            if not_done:
+                logger.warning("Scheduled email batch still sending after %.0f s; abandoning it", timeout)
+                self._firing.cancel()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        next_refill = datetime.now(timezone.utc)
+        while True:
+            now = datetime.now(timezone.utc)
+            try:
+                if now >= next_refill:
+                    await self.refill()
+                    # Refill halfway through the horizon so jobs arrive well before they are due
+                    next_refill = now + timedelta(seconds=SCHEDULER_HORIZON_SECONDS / 2)
+                due = [] if self._stopping else self._pop_due(now)
+                if due:
+                    # Shielded so that stop() can let the batch record its results first
+                    self._firing = asyncio.ensure_future(self._fire(due))
+                    await asyncio.shield(self._firing)
+                    continue
+            except Exception:
+                logger.exception("Scheduler iteration failed")
+                next_refill = now + timedelta(seconds=30)
+
+            wake_at = next_refill
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, (wake_at - now).total_seconds()))
+            except asyncio.TimeoutError:
+                pass
+
+
+email_scheduler = EmailScheduler()
@@ -1,32 +1,118 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import os
-import resend
 from datetime import datetime
 import logging
 
+import analytics
+import archival
+import assignment
+import auth
+import counters
+import dashboards
+import db
+import delivery_events
+import email_templates
+import escalation
+import exports
+import load_shedding
+import mailer
+import profiling
+import provisioning
+import realtime
+import suppression
+import ticket_bulk
+import tickets
+import tracing
+from suppression import suppressions
+from logging_setup import setup_logging
+from digest import ADMIN_NOTIFICATION_ADDRESS, admin_digest
+from intake_filter import INTAKE_FILTER_ENABLED, intake_filter
+from profiling import SlowRequestMiddleware
+from scheduler import email_scheduler
+from request_context import RequestContextMiddleware
+from tracing import TracingMiddleware, get_current_span
+
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
+tracer = tracing.get_tracer(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mailer.configure()
+    await db.connect()
+    delivery_events.buffer.start()
+    suppressions.start()
+    await auth.profile_listener.start()
+    admin_digest.start()
+    email_scheduler.start()
+    archival.ticket_archiver.start()
+    counters.counter_reconciler.start()
+    escalation.ticket_escalator.start()
+    realtime.ticket_event_hub.start()
+    assignment.assignment_engine.start()
+    if profiling.slow_request_profiler is not None:
+        profiling.slow_request_profiler.start()
+    yield
+    if profiling.slow_request_profiler is not None:
+        profiling.slow_request_profiler.stop()
+    await assignment.assignment_engine.stop()
+    await realtime.ticket_event_hub.stop()
+    await escalation.ticket_escalator.stop()
+    await counters.counter_reconciler.stop()
+    await archival.ticket_archiver.stop()
+    await email_scheduler.stop()
+    # Send any half-filled digest window before waiting on in-flight sends
+    await admin_digest.stop()
+    # Uvicorn has already stopped accepting and drained in-flight requests;
+    # give sends still with the provider a bounded amount of time to finish.
+    drain_timeout = float(os.environ.get("EMAIL_DRAIN_TIMEOUT", "20"))
+    abandoned = await mailer.drain(drain_timeout)
+    if abandoned:
+        logger.warning("Shutdown abandoned %d pending email send(s)", abandoned)
+    mailer.close()
+    await auth.profile_listener.stop()
+    await suppressions.stop()
+    await delivery_events.buffer.stop()
+    await db.close()
+    tracing.shutdown()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-# Configure CORS
+app.add_middleware(SlowRequestMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(load_shedding.LoadSheddingMiddleware)
+app.add_middleware(RequestContextMiddleware)
+# Configure CORS; added last so it is the outermost layer and responses the
+# other middleware produce themselves (shed 503s) still carry its headers
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://b91c0085-1ba6-4299-81dc-78e421887aa4.preview.emergentagent.com"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Retry-After"],
 )
 
-# Configure Resend
-resend_api_key = os.environ.get("RESEND_API_KEY")
-if not resend_api_key:
-    logger.error("RESEND_API_KEY environment variable is not set")
-else:
-    resend.api_key = resend_api_key
+app.include_router(profiling.router)
+app.include_router(delivery_events.router)
+app.include_router(suppression.router)
+app.include_router(auth.router)
+app.include_router(dashboards.router)
+app.include_router(exports.router)
+app.include_router(analytics.router)
+app.include_router(realtime.router)
+app.include_router(tickets.router)
+app.include_router(ticket_bulk.router)
+app.include_router(assignment.router)
+app.include_router(counters.router)
+app.include_router(escalation.router)
+app.include_router(provisioning.router)
+app.include_router(mailer.router)
+app.include_router(load_shedding.router)
 
 # Pydantic models
 class ContactEmailRequest(BaseModel):
@@ -45,154 +131,102 @@ class EnrollmentEmailRequest(BaseModel):
 async def root():
     return {"message": "Azellar Backend API"}
 
+def _record_validation_span(name: str):
+    # Body parsing and model validation run before the handler is entered, so
+    # the phase is recorded after the fact from the start of the request span.
+    tracer.start_span(name, start_time=get_current_span().start_time or None).end()
+
 @app.post("/api/send-contact-email")
-async def send_contact_email(request: ContactEmailRequest):
+async def send_contact_email(request: ContactEmailRequest, http_request: Request):
     """Send confirmation email for contact form submission"""
+    _record_validation_span("contact.validate")
+    if INTAKE_FILTER_ENABLED:
+        with tracer.start_as_current_span("contact.intake_filter") as span:
+            client_ip = http_request.client.host if http_request.client else None
+            verdict = intake_filter.check(request.email, request.message, client_ip)
+            span.set_attribute("intake.score", verdict.score)
+        if verdict.rejected:
+            logger.warning(
+                "Rejected contact submission from %s (%s)",
+                request.email,
+                ", ".join(verdict.reasons),
+                extra={"intake_score": verdict.score},
+            )
+            raise HTTPException(status_code=429, detail="Submission rejected")
     try:
+        received_at = datetime.now()
+        send_admin_now = not admin_digest.enabled or admin_digest.is_urgent(request)
+        with tracer.start_as_current_span("contact.render"):
+            user_html = email_templates.contact_confirmation_html(request)
+            if send_admin_now:
+                admin_html = email_templates.contact_admin_notification_html(request, received_at)
+
         # Send confirmation to user
-        user_email = resend.Emails.send({
-            "from": "onboarding@resend.dev",
-            "to": request.email,
-            "subject": "Thank you for contacting Azellar",
-            "html": f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Thank You for Contacting Us</title>
-            </head>
-            <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
-                    <h1 style="color: white; margin: 0;">Thank You for Contacting Azellar</h1>
-                </div>
-                
-                <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
-                    <p>Dear {request.name},</p>
-                    
-                    <p>Thank you for reaching out to Azellar! We have received your message regarding <strong>{request.inquiry_type}</strong>.</p>
-                    
-                    <div style="background: #f8fafc; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <p><strong>Your Message:</strong></p>
-                        <p style="font-style: italic;">{request.message}</p>
-                    </div>
-                    
-                    <p>Our team will review your message and get back to you within 24 hours.</p>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="https://azellar.com" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">Visit Our Website</a>
-                    </div>
-                    
-                    <p>Best regards,<br>
-                    The Azellar Team</p>
-                </div>
-            </body>
-            </html>
-            """
-        })
-        
-        # Send notification to admin
-        admin_email = resend.Emails.send({
-            "from": "onboarding@resend.dev",
-            "to": "delivered@resend.dev",
-            "subject": f"New Contact Form Submission - {request.inquiry_type}",
-            "html": f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>New Contact Form Submission</title>
-            </head>
-            <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
-                    <h1 style="color: white; margin: 0;">New Contact Form Submission</h1>
-                </div>
-                
-                <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
-                    <h2>Contact Details:</h2>
-                    <ul style="list-style: none; padding: 0;">
-                        <li style="margin: 10px 0;"><strong>Name:</strong> {request.name}</li>
-                        <li style="margin: 10px 0;"><strong>Email:</strong> {request.email}</li>
-                        <li style="margin: 10px 0;"><strong>Inquiry Type:</strong> {request.inquiry_type}</li>
-                        <li style="margin: 10px 0;"><strong>Date:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</li>
-                    </ul>
-                    
-                    <h3>Message:</h3>
-                    <div style="background: #f8fafc; padding: 15px; border-radius: 8px; border-left: 4px solid #22d3ee;">
-                        <p>{request.message}</p>
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-        })
+        with tracer.start_as_current_span("contact.send_user"):
+            user_email = await mailer.send_email({
+                "from": "onboarding@resend.dev",
+                "to": request.email,
+                "subject": "Thank you for contacting Azellar",
+                "html": user_html,
+            })
+
+        # Send notification to admin, or leave it for the next digest
+        if send_admin_now:
+            with tracer.start_as_current_span("contact.send_admin"):
+                admin_email = await mailer.send_email({
+                    "from": "onboarding@resend.dev",
+                    "to": ADMIN_NOTIFICATION_ADDRESS,
+                    "subject": f"New Contact Form Submission - {request.inquiry_type}",
+                    "html": admin_html,
+                })
+        else:
+            admin_digest.add(request, received_at)
         
-        logger.info(f"Contact emails sent successfully for {request.email}")
+        logger.info("Contact emails sent successfully for %s", request.email, extra={"sample": True})
         return {"status": "success", "message": "Emails sent successfully"}
         
     except Exception as e:
-        logger.error(f"Error sending contact emails: {str(e)}")
+        logger.error("Error sending contact emails: %s", e)
         raise HTTPException(status_code=500, detail="Failed to send emails")
 
 @app.post("/api/send-enrollment-email")
 async def send_enrollment_email(request: EnrollmentEmailRequest):
     """Send confirmation email when student enrolls in a course"""
+    _record_validation_span("enrollment.validate")
     try:
-        enrollment_email = resend.Emails.send({
-            "from": "onboarding@resend.dev",
-            "to": request.student_email,
-            "subject": f"Enrollment Confirmation - {request.course_name}",
-            "html": f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <title>Course Enrollment Confirmation</title>
-            </head>
-            <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-                <div style="background: linear-gradient(135deg, #1e3a8a, #22d3ee); padding: 40px; text-align: center; border-radius: 10px 10px 0 0;">
-                    <h1 style="color: white; margin: 0;">Welcome to Azellar Academy!</h1>
-                </div>
-                
-                <div style="background: white; padding: 30px; border-radius: 0 0 10px 10px; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
-                    <h2>Enrollment Confirmed!</h2>
-                    <p>Dear {request.student_name},</p>
-                    
-                    <p>Congratulations! You have successfully enrolled in <strong>{request.course_name}</strong>.</p>
-                    
-                    <div style="background: #f0f9ff; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #22d3ee;">
-                        <h3>Course Details:</h3>
-                        <ul style="list-style: none; padding: 0;">
-                            <li style="margin: 8px 0;"><strong>Course Name:</strong> {request.course_name}</li>
-                            <li style="margin: 8px 0;"><strong>Duration:</strong> {request.course_details.get('duration', 'TBD')}</li>
-                            <li style="margin: 8px 0;"><strong>Instructor:</strong> {request.course_details.get('instructor', 'TBD')}</li>
-                            <li style="margin: 8px 0;"><strong>Start Date:</strong> {request.course_details.get('start_date', 'TBD')}</li>
-                        </ul>
-                    </div>
-                    
-                    <p>You will receive course materials and joining instructions 1 week before the start date.</p>
-                    
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="https://azellar.com/dashboard" style="background: #1e3a8a; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px;">View Your Dashboard</a>
-                    </div>
-                    
-                    <p>If you have any questions, please don't hesitate to contact us.</p>
-                    
-                    <p>Best regards,<br>
-                    The Azellar Academy Team</p>
-                </div>
-            </body>
-            </html>
-            """
-        })
+        with tracer.start_as_current_span("enrollment.render"):
+            enrollment_html = email_templates.enrollment_confirmation_html(request)
+
+        with tracer.start_as_current_span("enrollment.send"):
+            enrollment_email = await mailer.send_email({
+                "from": "onboarding@resend.dev",
+                "to": request.student_email,
+                "subject": f"Enrollment Confirmation - {request.course_name}",
+                "html": enrollment_html,
+            })
         
-        logger.info(f"Enrollment email sent successfully for {request.student_email}")
-        return {"status": "success", "message": "Enrollment email sent successfully"}
+        logger.info("Enrollment email sent successfully for %s", request.student_email, extra={"sample": True})
         
     except Exception as e:
-        logger.error(f"Error sending enrollment email: {str(e)}")
+        logger.error("Error sending enrollment email: %s", e)
         raise HTTPException(status_code=500, detail="Failed to send enrollment email")
 
+    # The confirmation has gone out, so a scheduling problem must not fail the request
+    try:
+        with tracer.start_as_current_span("enrollment.schedule_reminder"):
+            await email_scheduler.schedule_course_reminder(
+                request.student_name, request.student_email, request.course_name, request.course_details
+            )
+    except Exception as e:
+        logger.error("Error scheduling course reminder for %s: %s", request.student_email, e)
+
+    return {"status": "success", "message": "Enrollment email sent successfully"}
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    import sys
+    from cli import cli
+    cli(["serve", *sys.argv[1:]])
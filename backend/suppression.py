@@ -0,0 +1,246 @@
+"""Suppression list consulted before every outbound email.
+
+Entries live in ``email_suppressions``; bounce and complaint webhooks add to
+it through a database trigger. Each worker loads the table at startup into a
+Bloom filter backed by an exact set, and picks up changes made elsewhere by
+polling rows updated since its last refresh. The Bloom filter answers the
+common "not suppressed" case from a compact bit array; only its positives
+are confirmed against the set, so there are no false suppressions.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+
+import db
+from auth import require_admin
+
+logger = logging.getLogger(__name__)
+
+SUPPRESSION_BLOOM_CAPACITY = int(os.environ.get("SUPPRESSION_BLOOM_CAPACITY", "1000000"))
+SUPPRESSION_BLOOM_ERROR_RATE = float(os.environ.get("SUPPRESSION_BLOOM_ERROR_RATE", "0.001"))
+SUPPRESSION_REFRESH_INTERVAL = float(os.environ.get("SUPPRESSION_REFRESH_INTERVAL", "30"))
+# Re-read rows this far behind the last refresh to cover commits that landed late
+_REFRESH_OVERLAP_SECONDS = 5
+
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> None:
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class SuppressionList:
+    def __init__(self, capacity: int = SUPPRESSION_BLOOM_CAPACITY, error_rate: float = SUPPRESSION_BLOOM_ERROR_RATE):
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.emails = set()
+        # Removals leave stale bits behind; rebuild once they pile up
+        self._removed_since_rebuild = 0
+        self._since = None
+        self._task = None
+
+    def __len__(self):
+        return len(self.emails)
+
+    def is_suppressed(self, email: str) -> bool:
+        email = normalize_email(email)
+        return email in self.bloom and email in self.emails
+
+    def _add_local(self, email: str) -> None:
+        if email in self.emails:
+            return
+        self.emails.add(email)
+        if len(self.emails) > self.bloom.capacity:
+            self._rebuild()
+        else:
+            self.bloom.add(email)
+
+    def _remove_local(self, email: str) -> None:
+        if email not in self.emails:
+            return
+        self.emails.discard(email)
+        self._removed_since_rebuild += 1
+        if self._removed_since_rebuild > len(self.emails) // 10 + 1000:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        bloom = BloomFilter(max(self.bloom.capacity, len(self.emails) * 2), self.error_rate)
+        for email in self.emails:
+            bloom.add(email)
+        self.bloom = bloom
+        self._removed_since_rebuild = 0
+
+    async def load(self) -> None:
+        """Load all active entries from the database."""
+        pool = db.get_pool()
+        if pool is None:
+            return
+        emails = set()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                self._since = await conn.fetchval("SELECT CURRENT_TIMESTAMP")
+                async for record in conn.cursor(
+                    "SELECT email FROM email_suppressions WHERE removed_at IS NULL", prefetch=10000
+                ):
+                    emails.add(record["email"])
+        self.emails = emails
+        self._rebuild()
+        logger.info("Loaded %d suppressed address(es)", len(emails))
+
+    async def refresh(self) -> None:
+        """Apply entries added or removed since the last load or refresh."""
+        pool = db.get_pool()
+        if pool is None or self._since is None:
+            return
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT email, removed_at, updated_at FROM email_suppressions
+                WHERE updated_at > $1::timestamptz - make_interval(secs => $2)
+                ORDER BY updated_at
+                """,
+                self._since,
+                _REFRESH_OVERLAP_SECONDS,
+            )
+        for row in rows:
+            if row["removed_at"] is None:
+                self._add_local(row["email"])
+            else:
+                self._remove_local(row["email"])
+            self._since = max(self._since, row["updated_at"])
+
+    async def add(self, email: str, reason: str, source: str = None) -> None:
+        email = normalize_email(email)
+        await db.require_pool().execute(
+            """
+            INSERT INTO email_suppressions (email, reason, source) VALUES ($1, $2, $3)
+            ON CONFLICT (email) DO UPDATE
+                SET reason = EXCLUDED.reason, source = EXCLUDED.source,
+                    updated_at = CURRENT_TIMESTAMP, removed_at = NULL
+            """,
+            email,
+            reason,
+            source,
+        )
+        self._add_local(email)
+
+    async def remove(self, email: str) -> bool:
+        email = normalize_email(email)
+        result = await db.require_pool().execute(
+            """
+            UPDATE email_suppressions SET removed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE email = $1 AND removed_at IS NULL
+            """,
+            email,
+        )
+        self._remove_local(email)
+        return result != "UPDATE 0"
+
+    def record_feedback(self, email: str) -> None:
+        """Suppress an address reported by a bounce or complaint webhook.
+
+        The database row is written by a trigger when the delivery event is
+        stored; this only updates the local copy so the next send is blocked
+        without waiting for a refresh.
+        """
+        self._add_local(normalize_email(email))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        try:
+            await self.load()
+        except Exception:
+            logger.exception("Failed to load suppression list")
+        while True:
+            await asyncio.sleep(SUPPRESSION_REFRESH_INTERVAL)
+            try:
+                if self._since is None:
+                    await self.load()
+                else:
+                    await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh suppression list")
+
+
+suppressions = SuppressionList()
+
+router = APIRouter(prefix="/api/admin/suppressions", dependencies=[Depends(require_admin)])
+
+
+class SuppressionRequest(BaseModel):
+    email: str
+    reason: str = "manual"
+
+
+@router.get("")
+async def suppression_stats():
+    return {
+        "entries": len(suppressions),
+        "bloom_bits": suppressions.bloom.size,
+        "bloom_hashes": suppressions.bloom.hash_count,
+        "last_refresh": suppressions._since,
+    }
+
+
+@router.get("/{email}")
+async def check_suppression(email: str):
+    return {"email": normalize_email(email), "suppressed": suppressions.is_suppressed(email)}
+
+
+@router.post("", status_code=201)
+async def add_suppression(request: SuppressionRequest):
+    if request.reason not in ("bounced", "complained", "manual"):
+        raise HTTPException(status_code=422, detail="reason must be bounced, complained or manual")
+    await suppressions.add(request.email, request.reason, source="admin")
+    return {"email": normalize_email(request.email), "suppressed": True}
+
+
+@router.delete("/{email}")
+async def remove_suppression(email: str):
+    if not await suppressions.remove(email):
+        raise HTTPException(status_code=404, detail="Address is not suppressed")
+    return {"email": normalize_email(email), "suppressed": False}
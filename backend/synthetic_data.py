@@ -0,0 +1,375 @@
+"""Reproducible synthetic data for exercising the schema at scale.
+
+Generates companies, users and profiles, courses, enrollments, support
+tickets, replies and attachments and loads them with binary ``COPY``
+(``copy_records_to_table``) one chunk at a time, so tens of millions of rows
+load without holding them in memory. Row ids are derived from the seed, the
+table and the row number, which lets child rows point at their parents
+without keeping the parent ids around, and the same seed always produces the
+same data.
+
+Meant for a local benchmark database: by default triggers and foreign-key
+checks are skipped during the load (``session_replication_role = replica``)
+and the seat and support-user counters are computed once at the end.
+"""
+import base64
+import functools
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import asyncpg
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 50_000
+HISTORY_DAYS = 365
+
+_TABLE_CODES = {
+    "companies": 1,
+    "users": 2,
+    "profiles": 3,
+    "courses": 4,
+    "enrollments": 5,
+    "support_tickets": 6,
+    "ticket_replies": 7,
+    "ticket_attachments": 8,
+}
+
+WORDS = np.array(
+    "database postgres replication backup restore index query plan vacuum lock latency throughput cluster "
+    "failover migration upgrade schema table partition connection pool timeout error slow disk memory cpu "
+    "cache monitoring alert dashboard report export import user role permission audit security training "
+    "course session lab exercise certificate schedule invoice contract support ticket escalation urgent "
+    "production staging deploy release rollback patch version driver client server network".split()
+)
+PRIORITIES = np.array(["low", "medium", "high", "urgent"])
+PRIORITY_WEIGHTS = [0.3, 0.45, 0.18, 0.07]
+TICKET_STATUSES = np.array(["open", "in_progress", "pending", "resolved", "closed"])
+TICKET_STATUS_WEIGHTS = [0.1, 0.1, 0.05, 0.35, 0.4]
+CATEGORIES = np.array(["technical", "billing", "training", "account", "performance", "other"])
+LEVELS = np.array(["beginner", "intermediate", "advanced"])
+FILE_TYPES = np.array(["image/png", "application/pdf", "text/plain", "application/zip"])
+
+
+class DatasetSize(NamedTuple):
+    companies: int
+    admins: int
+    clients_per_company: int
+    students: int
+    courses: int
+    enrollments_per_student: int
+    tickets: int
+    replies_per_ticket: int
+    attachment_share: float
+    attachment_bytes: int
+
+    @classmethod
+    def scaled(cls, scale: float, **overrides) -> "DatasetSize":
+        """Sizes for ``scale``; 1.0 is roughly 40k tickets and 200k replies."""
+        size = cls(
+            companies=max(1, int(200 * scale)),
+            admins=max(1, int(20 * scale)),
+            clients_per_company=5,
+            students=max(1, int(20_000 * scale)),
+            courses=max(1, int(300 * scale)),
+            enrollments_per_student=3,
+            tickets=max(1, int(40_000 * scale)),
+            replies_per_ticket=5,
+            attachment_share=0.05,
+            attachment_bytes=2048,
+        )
+        return size._replace(**{k: v for k, v in overrides.items() if v is not None})
+
+    @property
+    def clients(self) -> int:
+        return self.companies * self.clients_per_company
+
+    @property
+    def users(self) -> int:
+        return self.admins + self.clients + self.students
+
+
+def row_id(seed: int, table: str, n) -> uuid.UUID:
+    return uuid.UUID(int=((seed & 0xFFFFFFFF) << 96) | (_TABLE_CODES[table] << 64) | int(n))
+
+
+class Generator:
+    def __init__(self, size: DatasetSize, seed: int, now: datetime = None):
+        self.size = size
+        self.seed = seed
+        self.now = (now or datetime.now(timezone.utc)).replace(microsecond=0)
+
+    def _rng(self, table: str, chunk: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, _TABLE_CODES[table], chunk])
+
+    def _ago(self, seconds) -> list:
+        return [self.now - timedelta(seconds=float(s)) for s in seconds]
+
+    def _sentences(self, rng: np.random.Generator, count: int, low: int, high: int) -> list:
+        lengths = rng.integers(low, high, count)
+        words = WORDS[rng.integers(0, len(WORDS), int(lengths.sum()))].tolist()
+        sentences, start = [], 0
+        for length in lengths.tolist():
+            sentences.append(" ".join(words[start:start + length]).capitalize())
+            start += length
+        return sentences
+
+    def _chunks(self, total: int):
+        for chunk, start in enumerate(range(0, total, CHUNK_ROWS)):
+            yield chunk, np.arange(start, min(start + CHUNK_ROWS, total))
+
+    # Users are numbered admins first, then clients company by company, then students
+    def user_id(self, n) -> uuid.UUID:
+        return row_id(self.seed, "users", n)
+
+    def companies(self):
+        columns = ("id", "name", "email", "phone", "address", "max_support_users", "is_active", "created_at")
+        for chunk, numbers in self._chunks(self.size.companies):
+            rng = self._rng("companies", chunk)
+            created = self._ago(rng.uniform(HISTORY_DAYS * 86400, 2 * HISTORY_DAYS * 86400, len(numbers)))
+            yield columns, [
+                (row_id(self.seed, "companies", n), f"Company {n}", f"it@company{n}.example", f"+1-555-{n % 10000:04d}",
+                 f"{n} Market Street", self.size.clients_per_company + 2, True, created[i])
+                for i, n in enumerate(numbers.tolist())
+            ]
+
+    def _role_and_company(self, n: int):
+        if n < self.size.admins:
+            return "admin", None
+        if n < self.size.admins + self.size.clients:
+            return "client", row_id(self.seed, "companies", (n - self.size.admins) // self.size.clients_per_company)
+        return "student", None
+
+    def users(self):
+        for _, numbers in self._chunks(self.size.users):
+            yield ("id", "email"), [(self.user_id(n), f"user{n}@synthetic.example") for n in numbers.tolist()]
+
+    def profiles(self):
+        columns = ("id", "user_id", "full_name", "email", "role", "company_id", "is_active", "created_at", "updated_at")
+        for chunk, numbers in self._chunks(self.size.users):
+            rng = self._rng("profiles", chunk)
+            created = self._ago(rng.uniform(0, HISTORY_DAYS * 86400, len(numbers)))
+            active = (rng.random(len(numbers)) > 0.02).tolist()
+            rows = []
+            for i, n in enumerate(numbers.tolist()):
+                role, company_id = self._role_and_company(n)
+                rows.append((row_id(self.seed, "profiles", n), self.user_id(n), f"User {n}", f"user{n}@synthetic.example",
+                             role, company_id, active[i], created[i], created[i]))
+            yield columns, rows
+
+    def courses(self):
+        columns = ("id", "title", "description", "instructor", "duration", "level", "category", "price",
+                   "max_students", "start_date", "end_date", "is_active", "created_at")
+        for chunk, numbers in self._chunks(self.size.courses):
+            rng = self._rng("courses", chunk)
+            count = len(numbers)
+            titles = self._sentences(rng, count, 2, 5)
+            descriptions = self._sentences(rng, count, 20, 60)
+            levels = LEVELS[rng.integers(0, 3, count)].tolist()
+            prices = rng.integers(0, 200, count).tolist()
+            seats = rng.integers(10, 60, count).tolist()
+            starts = (rng.integers(-HISTORY_DAYS, 120, count)).tolist()
+            created = self._ago(rng.uniform(HISTORY_DAYS * 86400, 2 * HISTORY_DAYS * 86400, count))
+            yield columns, [
+                (row_id(self.seed, "courses", n), titles[i], descriptions[i], f"Instructor {n % 50}",
+                 f"{2 + n % 10} weeks", levels[i], "database", prices[i] * 10, seats[i],
+                 (self.now + timedelta(days=starts[i])).date(), (self.now + timedelta(days=starts[i] + 30)).date(),
+                 True, created[i])
+                for i, n in enumerate(numbers.tolist())
+            ]
+
+    def enrollments(self):
+        columns = ("id", "student_id", "course_id", "status", "enrolled_at", "completed_at", "created_at", "updated_at")
+        per_student = min(self.size.enrollments_per_student, self.size.courses)
+        first_student = self.size.admins + self.size.clients
+        for chunk, students in self._chunks(self.size.students):
+            rng = self._rng("enrollments", chunk)
+            count = len(students) * per_student
+            # Distinct courses per student: consecutive offsets from a random start
+            course_numbers = (rng.integers(0, self.size.courses, len(students))[:, None]
+                              + np.arange(per_student)) % self.size.courses
+            enrolled = self._ago(rng.uniform(0, HISTORY_DAYS * 86400, count))
+            completed = (rng.random(count) < 0.3).tolist()
+            rows = []
+            for i, (student, course) in enumerate(zip(np.repeat(students, per_student).tolist(),
+                                                      course_numbers.ravel().tolist())):
+                done_at = enrolled[i] + timedelta(days=30) if completed[i] else None
+                rows.append((row_id(self.seed, "enrollments", student * per_student + i % per_student),
+                             self.user_id(first_student + student), row_id(self.seed, "courses", course),
+                             "completed" if completed[i] else "enrolled", enrolled[i], done_at, enrolled[i],
+                             done_at or enrolled[i]))
+            yield columns, rows
+
+    @functools.cached_property
+    def _ticket_ages(self) -> np.ndarray:
+        # Seconds before ``now`` each ticket was opened; replies and attachments are placed after it
+        rng = np.random.default_rng([self.seed, _TABLE_CODES["support_tickets"]])
+        return rng.uniform(0, HISTORY_DAYS * 86400, self.size.tickets)
+
+    @functools.cached_property
+    def _first_reply_gaps(self) -> np.ndarray:
+        # Kept per ticket so attachments on a ticket's first reply can carry that reply's created_at
+        rng = np.random.default_rng([self.seed, _TABLE_CODES["ticket_replies"]])
+        return rng.exponential(6 * 3600, self.size.tickets)
+
+    def _reply_ages(self, tickets: np.ndarray, gaps: np.ndarray) -> np.ndarray:
+        ticket_ages = self._ticket_ages[tickets]
+        return ticket_ages - np.minimum(ticket_ages, gaps)
+
+    def support_tickets(self):
+        columns = ("id", "ticket_number", "title", "description", "priority", "status", "category", "created_by",
+                   "assigned_to", "company_id", "created_at", "updated_at", "resolved_at", "closed_at")
+        for chunk, numbers in self._chunks(self.size.tickets):
+            rng = self._rng("support_tickets", chunk)
+            count = len(numbers)
+            titles = self._sentences(rng, count, 3, 8)
+            descriptions = self._sentences(rng, count, 20, 120)
+            priorities = PRIORITIES[rng.choice(4, count, p=PRIORITY_WEIGHTS)].tolist()
+            statuses = TICKET_STATUSES[rng.choice(5, count, p=TICKET_STATUS_WEIGHTS)].tolist()
+            categories = CATEGORIES[rng.integers(0, len(CATEGORIES), count)].tolist()
+            clients = rng.integers(0, self.size.clients, count).tolist()
+            admins = rng.integers(0, self.size.admins, count).tolist()
+            unassigned = (rng.random(count) < 0.15).tolist()
+            resolve_after = rng.exponential(2 * 86400, count).tolist()
+            created = self._ago(self._ticket_ages[numbers])
+            rows = []
+            for i, n in enumerate(numbers.tolist()):
+                finished = statuses[i] in ("resolved", "closed")
+                done_at = min(created[i] + timedelta(seconds=resolve_after[i]), self.now) if finished else None
+                rows.append((row_id(self.seed, "support_tickets", n), f"SYN-{n:010d}", titles[i], descriptions[i],
+                             priorities[i], statuses[i], categories[i],
+                             self.user_id(self.size.admins + clients[i]),
+                             None if unassigned[i] else self.user_id(admins[i]),
+                             row_id(self.seed, "companies", clients[i] // self.size.clients_per_company),
+                             created[i], done_at or created[i], done_at if statuses[i] == "resolved" else None,
+                             done_at if statuses[i] == "closed" else None))
+            yield columns, rows
+
+    def ticket_replies(self):
+        columns = ("id", "ticket_id", "ticket_archived", "ticket_created_at", "reply_text", "is_internal",
+                   "created_by", "created_at", "updated_at")
+        total = self.size.tickets * self.size.replies_per_ticket
+        for chunk, numbers in self._chunks(total):
+            rng = self._rng("ticket_replies", chunk)
+            count = len(numbers)
+            tickets = numbers // self.size.replies_per_ticket
+            positions = numbers % self.size.replies_per_ticket
+            # Reply k of a ticket comes about k gaps after it, but never in the future
+            gaps = rng.exponential(6 * 3600, count) * (positions + 1)
+            first = positions == 0
+            gaps[first] = self._first_reply_gaps[tickets[first]]
+            created = self._ago(self._reply_ages(tickets, gaps))
+            ticket_created = self._ago(self._ticket_ages[tickets])
+            texts = self._sentences(rng, count, 5, 60)
+            internal = (rng.random(count) < 0.1).tolist()
+            from_staff = (rng.random(count) < 0.6).tolist()
+            authors = rng.integers(0, self.size.admins, count).tolist()
+            clients = rng.integers(0, self.size.clients, count).tolist()
+            yield columns, [
+                (row_id(self.seed, "ticket_replies", n), row_id(self.seed, "support_tickets", t), False,
+                 ticket_created[i], texts[i], internal[i],
+                 self.user_id(authors[i] if from_staff[i] or internal[i] else self.size.admins + clients[i]),
+                 created[i], created[i])
+                for i, (n, t) in enumerate(zip(numbers.tolist(), tickets.tolist()))
+            ]
+
+    def ticket_attachments(self):
+        columns = ("id", "ticket_id", "reply_id", "ticket_archived", "ticket_created_at", "reply_created_at",
+                   "file_name", "file_size", "file_type", "file_data", "uploaded_by", "created_at")
+        total = int(self.size.tickets * self.size.attachment_share)
+        # One shared payload keeps generation cheap; the stored size is what matters for benchmarks
+        payload = np.random.default_rng(self.seed).bytes(self.size.attachment_bytes)
+        file_data = base64.b64encode(payload).decode()
+        replies = self.size.replies_per_ticket
+        for chunk, numbers in self._chunks(total):
+            rng = self._rng("ticket_attachments", chunk)
+            count = len(numbers)
+            tickets = rng.integers(0, self.size.tickets, count)
+            on_reply = (rng.random(count) < 0.5).tolist() if replies else [False] * count
+            types = FILE_TYPES[rng.integers(0, len(FILE_TYPES), count)].tolist()
+            created = self._ago(self._ticket_ages[tickets])
+            reply_created = self._ago(self._reply_ages(tickets, self._first_reply_gaps[tickets]))
+            yield columns, [
+                (row_id(self.seed, "ticket_attachments", n), row_id(self.seed, "support_tickets", t),
+                 row_id(self.seed, "ticket_replies", t * replies) if on_reply[i] else None, False, created[i],
+                 reply_created[i] if on_reply[i] else None,
+                 f"attachment-{n}.{types[i].rsplit('/', 1)[1]}", self.size.attachment_bytes, types[i], file_data,
+                 self.user_id(self.size.admins + (t % self.size.clients)), created[i])
+                for i, (n, t) in enumerate(zip(numbers.tolist(), tickets.tolist()))
+            ]
+
+
+# Load order respects foreign keys; (schema, table, generator method)
+LOAD_ORDER = (
+    ("public", "companies", "companies"),
+    ("auth", "users", "users"),
+    ("public", "profiles", "profiles"),
+    ("public", "courses", "courses"),
+    ("public", "enrollments", "enrollments"),
+    ("public", "support_tickets", "support_tickets"),
+    ("public", "ticket_replies", "ticket_replies"),
+    ("public", "ticket_attachments", "ticket_attachments"),
+)
+
+RECOUNT_QUERIES = (
+    """
+    UPDATE courses c SET current_students = counts.students
+    FROM (SELECT course_id, count(*) AS students FROM enrollments WHERE status = 'enrolled' GROUP BY course_id) counts
+    WHERE c.id = counts.course_id
+    """,
+    """
+    UPDATE companies c SET current_support_users = counts.users
+    FROM (SELECT company_id, count(*) AS users FROM profiles WHERE role = 'client' AND is_active GROUP BY company_id) counts
+    WHERE c.id = counts.company_id
+    """,
+)
+
+
+async def generate(
+    database_url: str,
+    size: DatasetSize,
+    seed: int = 1,
+    truncate: bool = False,
+    skip_auth_users: bool = False,
+    disable_triggers: bool = True,
+    progress=None,
+) -> dict:
+    """Load a synthetic dataset into ``database_url`` and return rows written per table."""
+    generator = Generator(size, seed)
+    report = progress or (lambda table, rows, seconds: None)
+    written = {}
+    conn = await asyncpg.connect(database_url)
+    try:
+        if disable_triggers:
+            try:
+                await conn.execute("SET session_replication_role = replica")
+            except asyncpg.InsufficientPrivilegeError:
+                logger.warning("Not a superuser; loading with triggers and foreign-key checks enabled")
+        if await conn.fetchval("SELECT to_regproc('ensure_ticket_partitions')") is not None:
+            # Monthly partitions for the whole history, so rows don't pile up in the default partitions
+            start = (generator.now - timedelta(days=HISTORY_DAYS)).date()
+            await conn.execute("SELECT ensure_ticket_partitions($1)", start)
+        if truncate:
+            tables = [f"{schema}.{table}" for schema, table, _ in LOAD_ORDER if not (skip_auth_users and schema == "auth")]
+            await conn.execute(f"TRUNCATE {', '.join(reversed(tables))} CASCADE")
+        for schema, table, method in LOAD_ORDER:
+            if skip_auth_users and schema == "auth":
+                continue
+            started = time.perf_counter()
+            rows = 0
+            async with conn.transaction():
+                for columns, records in getattr(generator, method)():
+                    await conn.copy_records_to_table(table, records=records, columns=columns, schema_name=schema)
+                    rows += len(records)
+            written[f"{schema}.{table}"] = rows
+            report(f"{schema}.{table}", rows, time.perf_counter() - started)
+        for query in RECOUNT_QUERIES:
+            await conn.execute(query)
+        await conn.execute("ANALYZE")
+    finally:
+        await conn.close()
+    return written
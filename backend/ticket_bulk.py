@@ -0,0 +1,161 @@
+"""Bulk ticket operations for admins triaging the queue.
+
+One request assigns, reprioritizes, changes the status of or closes up to
+``TICKET_BULK_MAX`` tickets. The tickets are locked in id order (so two
+overlapping bulk requests cannot deadlock) and changed with one set-based
+UPDATE in a single transaction; tickets already in the requested state are
+left alone. The response reports what happened to every requested id, and
+after commit each affected assignee gets one email listing all of their
+tickets the operation changed.
+"""
+import asyncio
+import logging
+import os
+from typing import List, Literal, Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+import db
+import email_templates
+import mailer
+from auth import require_admin
+from dashboards import Loaders
+
+logger = logging.getLogger(__name__)
+
+TICKET_BULK_MAX = int(os.environ.get("TICKET_BULK_MAX", "1000"))
+TICKET_STATUSES = ("open", "in_progress", "pending", "resolved", "closed")
+TICKET_PRIORITIES = ("low", "medium", "high", "urgent")
+
+router = APIRouter(prefix="/api/admin/tickets")
+
+
+class BulkTicketRequest(BaseModel):
+    ticket_ids: List[UUID] = Field(min_length=1)
+    operation: Literal["assign", "set_status", "set_priority", "close"]
+    # assign: the agent to assign to, or null to unassign
+    assigned_to: Optional[UUID] = None
+    status: Optional[Literal[TICKET_STATUSES]] = None
+    priority: Optional[Literal[TICKET_PRIORITIES]] = None
+
+
+# operation -> (SET clause, condition for a row to need the change); $2 is the operation's value
+STATUS_ASSIGNMENTS = """
+    status = $2,
+    resolved_at = CASE WHEN $2 IN ('resolved', 'closed') THEN coalesce(t.resolved_at, CURRENT_TIMESTAMP) END,
+    closed_at = CASE WHEN $2 = 'closed' THEN coalesce(t.closed_at, CURRENT_TIMESTAMP) END
+"""
+OPERATIONS = {
+    "assign": ("assigned_to = $2", "t.assigned_to IS DISTINCT FROM $2"),
+    "set_priority": ("priority = $2", "t.priority IS DISTINCT FROM $2"),
+    "set_status": (STATUS_ASSIGNMENTS, "t.status IS DISTINCT FROM $2"),
+    "close": (STATUS_ASSIGNMENTS, "t.status IS DISTINCT FROM $2"),
+}
+
+SUMMARIES = {
+    "assign": "The following tickets have been assigned to you:",
+    "set_priority": "The priority of the following tickets assigned to you was changed to {value}:",
+    "set_status": "The status of the following tickets assigned to you was changed to {value}:",
+    "close": "The following tickets assigned to you have been closed:",
+}
+
+
+def bulk_update_query(operation: str) -> str:
+    assignments, needs_change = OPERATIONS[operation]
+    return f"""
+        WITH locked AS (
+            SELECT id, archived, created_at FROM support_tickets
+            WHERE id = ANY($1::uuid[]) AND NOT archived
+            ORDER BY id
+            FOR UPDATE
+        )
+        UPDATE support_tickets t SET {assignments}
+        FROM locked
+        WHERE (t.id, t.archived, t.created_at) = (locked.id, locked.archived, locked.created_at) AND {needs_change}
+        RETURNING t.id, t.ticket_number, t.title, t.status, t.priority, t.assigned_to
+    """
+
+
+def _operation_value(request: BulkTicketRequest):
+    if request.operation == "assign":
+        return request.assigned_to
+    if request.operation == "close":
+        return "closed"
+    value = request.status if request.operation == "set_status" else request.priority
+    if value is None:
+        field = "status" if request.operation == "set_status" else "priority"
+        raise HTTPException(status_code=400, detail=f"{request.operation} requires {field}")
+    return value
+
+
+async def notify_assignees(pool, operation: str, value, tickets: list, actor_id: str = None) -> int:
+    """Send each assignee one email about all of their changed tickets; returns how many were sent."""
+    by_assignee = {}
+    for ticket in tickets:
+        if ticket["assigned_to"] is not None and str(ticket["assigned_to"]) != actor_id:
+            by_assignee.setdefault(str(ticket["assigned_to"]), []).append(ticket)
+    if not by_assignee:
+        return 0
+    profiles = await Loaders(pool).profiles.load_many(list(by_assignee))
+    summary = SUMMARIES[operation].format(value=str(value).replace("_", " "))
+    sends = [
+        mailer.send_email({
+            "from": "onboarding@resend.dev",
+            "to": profile["email"],
+            "subject": f"{len(by_assignee[str(profile['user_id'])])} ticket(s) updated",
+            "html": email_templates.ticket_bulk_update_html(
+                profile["full_name"] or profile["email"], summary, by_assignee[str(profile["user_id"])]
+            ),
+        })
+        for profile in profiles
+        if profile is not None and profile["email"]
+    ]
+    results = await asyncio.gather(*sends, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Error sending bulk ticket notification: %s", result)
+    return sum(not isinstance(result, Exception) for result in results)
+
+
+@router.post("/bulk")
+async def bulk_update_tickets(request: BulkTicketRequest, admin=Depends(require_admin)):
+    """Apply one operation to many tickets at once.
+
+    ``results`` maps every requested id to ``updated``, ``unchanged``
+    (already in that state), ``archived`` or ``not_found``.
+    """
+    ticket_ids = list(dict.fromkeys(request.ticket_ids))
+    if len(ticket_ids) > TICKET_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TICKET_BULK_MAX} tickets per request")
+    value = _operation_value(request)
+    pool = db.require_pool()
+    if request.operation == "assign" and value is not None:
+        agent = await pool.fetchval("SELECT role FROM profiles WHERE user_id = $1 AND is_active", value)
+        if agent != "admin":
+            raise HTTPException(status_code=400, detail="Tickets can only be assigned to an active admin")
+
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            updated = await conn.fetch(bulk_update_query(request.operation), ticket_ids, value)
+            existing = await conn.fetch(
+                "SELECT id, archived FROM support_tickets WHERE id = ANY($1::uuid[])", ticket_ids
+            )
+
+    archived = {row["id"] for row in existing if row["archived"]}
+    found = {row["id"] for row in existing}
+    changed = {row["id"] for row in updated}
+    results = {
+        str(ticket_id): (
+            "updated" if ticket_id in changed
+            else "archived" if ticket_id in archived
+            else "unchanged" if ticket_id in found
+            else "not_found"
+        )
+        for ticket_id in ticket_ids
+    }
+    notified = await notify_assignees(
+        pool, request.operation, value, [dict(row) for row in updated], admin.user_id if admin else None
+    )
+    return {"updated": len(changed), "results": results, "notified": notified}
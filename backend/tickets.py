@@ -0,0 +1,307 @@
+"""Ticket conversation thread with lazily downloaded attachments.
+
+The thread endpoint returns a ticket's replies a page at a time, keyset
+paginated on ``(created_at, id)`` through an opaque cursor, with the authors
+resolved once into a ``profiles`` map and attachments described by metadata
+and a download URL only. ``file_data`` is never selected there.
+
+The changes endpoint lets a client keep a local copy of its ticket list:
+the first call pages through every visible ticket, later calls with the
+returned cursor get only the tickets changed since (by ``updated_at``, set
+by the database) and the ids of tickets that left the list, deleted,
+archived or reassigned away (``ticket_tombstones``). Visibility is applied
+with one index range scan per rule (own company, opened by, assigned to).
+
+Attachment bodies are stored base64 encoded. The download endpoint reads them
+``ATTACHMENT_CHUNK_BYTES`` at a time with ``substr`` over slices whose length
+is a multiple of four characters, so every slice decodes on its own and a
+large file is streamed without ever being held in memory whole.
+"""
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from urllib.parse import quote
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import db
+from auth import AuthContext, get_current_user
+from dashboards import TICKET_COLUMNS, Loaders
+
+THREAD_PAGE_SIZE = int(os.environ.get("THREAD_PAGE_SIZE", "50"))
+THREAD_MAX_PAGE_SIZE = 200
+ATTACHMENT_CHUNK_BYTES = int(os.environ.get("ATTACHMENT_CHUNK_BYTES", str(256 * 1024)))
+# Base64 turns every 3 bytes into 4 characters; slices must stay on that boundary
+ATTACHMENT_CHUNK_CHARS = max(4, ATTACHMENT_CHUNK_BYTES // 3 * 4)
+
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", "500"))
+SYNC_MAX_PAGE_SIZE = 2000
+# A caught-up cursor is held this far behind the database clock so rows from
+# transactions that committed after a later-stamped one are not skipped; the
+# client just sees those recent rows twice
+SYNC_OVERLAP_SECONDS = float(os.environ.get("SYNC_OVERLAP_SECONDS", "15"))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+NIL_UUID = UUID(int=0)
+
+ATTACHMENT_COLUMNS = "id, ticket_id, reply_id, file_name, file_size, file_type, uploaded_by, created_at"
+
+router = APIRouter(prefix="/api/tickets")
+
+
+def encode_cursor(created_at: datetime, reply_id) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{reply_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, reply_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(reply_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_sync_cursor(updated_at: datetime, ticket_id: UUID, removed_after: datetime) -> str:
+    raw = json.dumps([updated_at.isoformat(), str(ticket_id), removed_after.isoformat()])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor: str):
+    try:
+        updated_at, ticket_id, removed_after = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(updated_at), UUID(ticket_id), datetime.fromisoformat(removed_after)
+    except (ValueError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def can_view(user: AuthContext, ticket) -> bool:
+    """Same rule as the "Users can view their tickets" policy."""
+    return (
+        user.role == "admin"
+        or user.user_id in (str(ticket["created_by"]), str(ticket["assigned_to"]))
+        or (ticket["company_id"] is not None and str(ticket["company_id"]) == user.company_id)
+    )
+
+
+async def load_ticket(pool, ticket_id: UUID, user: AuthContext):
+    ticket = await pool.fetchrow(f"SELECT {TICKET_COLUMNS}, archived FROM support_tickets WHERE id = $1", ticket_id)
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    if not can_view(user, ticket):
+        raise HTTPException(status_code=403, detail="Not allowed to view this ticket")
+    return ticket
+
+
+def _attachment(row) -> dict:
+    attachment = dict(row)
+    attachment["url"] = f"{router.prefix}/{row['ticket_id']}/attachments/{row['id']}"
+    return attachment
+
+
+@router.get("/{ticket_id}/thread")
+async def ticket_thread(
+    ticket_id: UUID,
+    cursor: str = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(THREAD_PAGE_SIZE, ge=1, le=THREAD_MAX_PAGE_SIZE),
+    user: AuthContext = Depends(get_current_user),
+):
+    """One page of a ticket's replies, oldest first, with attachment metadata.
+
+    The ticket itself and its ticket-level attachments come with the first page only.
+    """
+    pool = db.require_pool()
+    ticket = await load_ticket(pool, ticket_id, user)
+    after = decode_cursor(cursor) if cursor else None
+    # Internal notes are for staff only
+    staff = user.role == "admin"
+    args = [ticket_id, staff, limit + 1]
+    condition = ""
+    if after is not None:
+        args.extend(after)
+        condition = "AND (created_at, id) > ($4, $5)"
+    replies = await pool.fetch(
+        f"""
+        SELECT id, reply_text, is_internal, created_by, created_at, updated_at
+        FROM ticket_replies
+        WHERE ticket_id = $1 AND ($2 OR NOT is_internal) {condition}
+        ORDER BY created_at, id
+        LIMIT $3
+        """,
+        *args,
+    )
+    has_more = len(replies) > limit
+    replies = [dict(row) for row in replies[:limit]]
+
+    attachments = await pool.fetch(
+        f"""
+        SELECT {ATTACHMENT_COLUMNS} FROM ticket_attachments
+        WHERE ticket_id = $1 AND (reply_id = ANY($2::uuid[]) OR ($3 AND reply_id IS NULL))
+        ORDER BY created_at, id
+        """,
+        ticket_id,
+        [reply["id"] for reply in replies],
+        cursor is None,
+    )
+    by_reply = {}
+    for row in attachments:
+        by_reply.setdefault(row["reply_id"], []).append(_attachment(row))
+    for reply in replies:
+        reply["attachments"] = by_reply.get(reply["id"], [])
+
+    loaders = Loaders(pool)
+    authors = await loaders.profiles.load_many({str(reply["created_by"]) for reply in replies if reply["created_by"]})
+    page = {
+        "replies": replies,
+        "profiles": {str(p["user_id"]): p for p in authors if p is not None},
+        "next_cursor": encode_cursor(replies[-1]["created_at"], replies[-1]["id"]) if has_more else None,
+    }
+    if cursor is None:
+        page["ticket"] = dict(ticket)
+        page["attachments"] = by_reply.get(None, [])
+    return page
+
+
+def _visibility_rules(user: AuthContext, args: list) -> list:
+    """SQL conditions, one per way ``user`` can see a ticket, appending their arguments; [] for admins."""
+    if user.role == "admin":
+        return []
+    args.append(user.user_id)
+    rules = [f"created_by = ${len(args)}", f"assigned_to = ${len(args)}"]
+    if user.company_id:
+        args.append(user.company_id)
+        rules.append(f"company_id = ${len(args)}")
+    return rules
+
+
+def changed_tickets_query(user: AuthContext, after=None, limit: int = SYNC_PAGE_SIZE):
+    """Tickets visible to ``user`` past the (updated_at, id) key ``after``, oldest change first.
+
+    Without ``after`` it is the initial listing and archived tickets are left out.
+    """
+    args = [limit]
+    condition = "NOT archived"
+    if after is not None:
+        args.extend(after)
+        condition = "(updated_at, id) > ($2, $3)"
+    rules = _visibility_rules(user, args) or ["true"]
+    # One branch per rule so each is a range scan on its own (column, updated_at, id) index
+    branches = [
+        f"""(SELECT {TICKET_COLUMNS}, archived FROM support_tickets
+             WHERE {rule} AND {condition} ORDER BY updated_at, id LIMIT $1)"""
+        for rule in rules
+    ]
+    if len(branches) == 1:
+        return branches[0][1:-1], args
+    return f"SELECT * FROM ({' UNION '.join(branches)}) changes ORDER BY updated_at, id LIMIT $1", args
+
+
+def removed_tickets_query(user: AuthContext, removed_after: datetime):
+    """Ids of tickets ``user`` could see that were deleted or reassigned out of their view since ``removed_after``."""
+    args = [removed_after]
+    rules = _visibility_rules(user, args)
+    could_see = f"AND ({' OR '.join('tomb.' + rule for rule in rules)})" if rules else ""
+    still_sees = f"AND ({' OR '.join('t.' + rule for rule in rules)})" if rules else ""
+    query = f"""
+        SELECT DISTINCT tomb.ticket_id FROM ticket_tombstones tomb
+        WHERE tomb.removed_at > $1 {could_see}
+          AND NOT EXISTS (SELECT 1 FROM support_tickets t WHERE t.id = tomb.ticket_id AND NOT t.archived {still_sees})
+    """
+    return query, args
+
+
+@router.get("/changes")
+async def ticket_changes(
+    cursor: str = Query(None, description="next_cursor from the previous call; omit for a full listing"),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_MAX_PAGE_SIZE),
+    user: AuthContext = Depends(get_current_user),
+):
+    """Tickets changed since ``cursor`` and ids of tickets removed from the caller's view.
+
+    Apply ``removed`` then upsert ``tickets`` by id, and keep calling with
+    ``next_cursor`` while ``has_more``. ``reset`` means the cursor is too old
+    to compute removals; drop the local copy and start again without one.
+    """
+    pool = db.require_pool()
+    now = await pool.fetchval("SELECT clock_timestamp()")
+    horizon = now - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+    if cursor:
+        updated_at, ticket_id, removed_after = decode_sync_cursor(cursor)
+        after = (updated_at, ticket_id)
+        if removed_after < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS):
+            return {"reset": True, "tickets": [], "removed": [], "next_cursor": None, "has_more": False}
+    else:
+        after, removed_after = None, horizon
+
+    query, args = changed_tickets_query(user, after, limit + 1)
+    rows = await pool.fetch(query, *args)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    tickets = [dict(row) for row in rows if not row["archived"]]
+    removed = [row["id"] for row in rows if row["archived"]]
+
+    if has_more:
+        next_key, next_removed_after = (rows[-1]["updated_at"], rows[-1]["id"]), removed_after
+    else:
+        query, args = removed_tickets_query(user, removed_after)
+        removed.extend(row["ticket_id"] for row in await pool.fetch(query, *args))
+        last = (rows[-1]["updated_at"], rows[-1]["id"]) if rows else after
+        next_key = min(last, (horizon, NIL_UUID)) if last else (horizon, NIL_UUID)
+        if after is not None:
+            next_key = max(next_key, after)
+        next_removed_after = max(removed_after, horizon)
+
+    return {
+        "reset": False,
+        "tickets": tickets,
+        "removed": removed,
+        **await Loaders(pool).referenced(tickets),
+        "next_cursor": encode_sync_cursor(*next_key, next_removed_after),
+        "has_more": has_more,
+    }
+
+
+async def _attachment_chunks(attachment_id: UUID, encoded_length: int):
+    pool = db.require_pool()
+    async with pool.acquire() as conn:
+        statement = await conn.prepare("SELECT substr(file_data, $2, $3) FROM ticket_attachments WHERE id = $1")
+        for start in range(1, encoded_length + 1, ATTACHMENT_CHUNK_CHARS):
+            piece = await statement.fetchval(attachment_id, start, ATTACHMENT_CHUNK_CHARS)
+            if not piece:
+                return
+            # Only the last slice can be short; pad it in case the value was stored unpadded
+            yield base64.b64decode(piece + "=" * (-len(piece) % 4))
+
+
+@router.get("/{ticket_id}/attachments/{attachment_id}")
+async def download_attachment(
+    ticket_id: UUID, attachment_id: UUID, user: AuthContext = Depends(get_current_user)
+):
+    """Stream one attachment's decoded bytes."""
+    pool = db.require_pool()
+    await load_ticket(pool, ticket_id, user)
+    attachment = await pool.fetchrow(
+        """
+        SELECT a.file_name, a.file_type, length(a.file_data) AS encoded_length, right(a.file_data, 2) AS tail,
+               r.is_internal
+        FROM ticket_attachments a LEFT JOIN ticket_replies r ON r.id = a.reply_id
+        WHERE a.id = $1 AND a.ticket_id = $2
+        """,
+        attachment_id,
+        ticket_id,
+    )
+    if attachment is None or (attachment["is_internal"] and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+
+    encoded_length = attachment["encoded_length"]
+    headers = {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(attachment['file_name'])}"}
+    if encoded_length % 4 == 0:
+        headers["Content-Length"] = str(encoded_length // 4 * 3 - attachment["tail"].count("="))
+    return StreamingResponse(
+        _attachment_chunks(attachment_id, encoded_length),
+        media_type=attachment["file_type"] or "application/octet-stream",
+        headers=headers,
+    )
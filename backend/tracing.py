@@ -0,0 +1,361 @@
+"""Lightweight span tracing.
+
+The surface mirrors the OpenTelemetry tracing API (``get_tracer``,
+``start_as_current_span``, ``set_attribute``, ``record_exception``,
+``set_status``, ``update_name``) so call sites can move to the OpenTelemetry
+SDK without changes. Finished spans are handed to a background thread and
+written as JSON lines to stdout or a file, which works without a collector.
+
+Configure with ``TRACING_EXPORTER`` (``none``, ``console`` or ``file``) and
+``TRACING_FILE``. With the default ``none`` spans are not recorded at all.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+from request_context import current_request_id
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTER = os.environ.get("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = os.environ.get("TRACING_FILE", "traces.jsonl")
+TRACING_QUEUE_SIZE = int(os.environ.get("TRACING_QUEUE_SIZE", "4096"))
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class StatusCode:
+    UNSET = "UNSET"
+    OK = "OK"
+    ERROR = "ERROR"
+
+
+class SpanContext:
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "context",
+        "parent_id",
+        "start_time",
+        "end_time",
+        "attributes",
+        "events",
+        "status",
+        "status_description",
+        "request_id",
+        "_processor",
+    )
+
+    def __init__(self, name, context, parent_id, processor, attributes=None, start_time=None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.start_time = start_time or time.time_ns()
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = StatusCode.UNSET
+        self.status_description = None
+        self.request_id = current_request_id()
+        self._processor = processor
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def is_recording(self) -> bool:
+        return self.end_time is None
+
+    def update_name(self, name: str) -> None:
+        self.name = name
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, attributes=None) -> None:
+        self.events.append({"name": name, "ts": time.time_ns(), "attributes": attributes or {}})
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.add_event(
+            "exception",
+            {"exception.type": type(exception).__name__, "exception.message": str(exception)},
+        )
+
+    def set_status(self, status: str, description: str = None) -> None:
+        self.status = status
+        self.status_description = description
+
+    def end(self, end_time: int = None) -> None:
+        if self.end_time is not None:
+            return
+        self.end_time = end_time or time.time_ns()
+        self._processor.on_end(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round((self.end_time - self.start_time) / 1e6, 3),
+            "status": self.status,
+            "status_description": self.status_description,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NonRecordingSpan:
+    """Span returned while tracing is disabled; every operation is a no-op."""
+
+    context = None
+    start_time = 0
+
+    def get_span_context(self):
+        return None
+
+    def is_recording(self) -> bool:
+        return False
+
+    def update_name(self, name):
+        pass
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def add_event(self, name, attributes=None):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def set_status(self, status, description=None):
+        pass
+
+    def end(self, end_time=None):
+        pass
+
+
+INVALID_SPAN = _NonRecordingSpan()
+
+
+class ConsoleSpanExporter:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+
+    def export(self, spans):
+        self.out.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+        self.out.flush()
+
+    def shutdown(self):
+        pass
+
+
+class FileSpanExporter:
+    def __init__(self, path: str):
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, spans):
+        self._file.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+        self._file.flush()
+
+    def shutdown(self):
+        self._file.close()
+
+
+class BatchSpanProcessor:
+    """Export finished spans from a background thread in batches.
+
+    Spans are dropped, and counted, if the queue is full so that a slow
+    exporter never stalls request handling.
+    """
+
+    def __init__(self, exporter, max_queue_size=TRACING_QUEUE_SIZE, max_batch_size=512, schedule_delay=1.0):
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue_size)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._worker, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.max_batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _worker(self):
+        while not self._stopped.is_set() or not self._queue.empty():
+            batch = self._drain_batch(self.schedule_delay)
+            if not batch:
+                continue
+            try:
+                self.exporter.export(batch)
+            except Exception:
+                logger.exception("Span export failed; dropped %d span(s)", len(batch))
+
+    def shutdown(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+        self.exporter.shutdown()
+
+
+class Tracer:
+    def __init__(self, name: str, processor):
+        self.name = name
+        self._processor = processor
+
+    def start_span(self, name: str, attributes=None, start_time: int = None, parent=None):
+        if self._processor is None:
+            return INVALID_SPAN
+        if parent is None:
+            parent = _current_span.get()
+        if parent is not None and parent.context is not None:
+            trace_id, parent_id = parent.context.trace_id, parent.context.span_id
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+        context = SpanContext(trace_id, os.urandom(8).hex())
+        return Span(name, context, parent_id, self._processor, attributes, start_time)
+
+    @contextlib.contextmanager
+    def start_as_current_span(self, name: str, attributes=None, start_time: int = None, parent=None):
+        span = self.start_span(name, attributes, start_time, parent)
+        if span is INVALID_SPAN:
+            yield span
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.record_exception(exc)
+            span.set_status(StatusCode.ERROR, str(exc))
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+
+def _build_processor():
+    if TRACING_EXPORTER == "console":
+        return BatchSpanProcessor(ConsoleSpanExporter())
+    if TRACING_EXPORTER == "file":
+        return BatchSpanProcessor(FileSpanExporter(TRACING_FILE))
+    return None
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def _get_processor():
+    global _processor
+    if _processor is None and TRACING_EXPORTER != "none":
+        with _processor_lock:
+            if _processor is None:
+                _processor = _build_processor()
+                if _processor is not None:
+                    atexit.register(_processor.shutdown)
+    return _processor
+
+
+def get_tracer(name: str) -> Tracer:
+    return Tracer(name, _get_processor())
+
+
+def get_current_span():
+    return _current_span.get() or INVALID_SPAN
+
+
+def parse_traceparent(value: str):
+    """Return a remote parent span for a W3C ``traceparent`` header, or None."""
+    match = _TRACEPARENT.match(value or "")
+    if not match:
+        return None
+    span = _NonRecordingSpan()
+    span.context = SpanContext(match.group(1), match.group(2))
+    return span
+
+
+def shutdown():
+    if _processor is not None:
+        _processor.shutdown()
+
+
+class TracingMiddleware:
+    """Open a server span around each HTTP request.
+
+    Continues the trace from an incoming W3C ``traceparent`` header when one is
+    present. The span is renamed to the matched route template once routing
+    has happened.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.tracer = get_tracer("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.tracer._processor is None:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        method = scope["method"]
+        attributes = {"http.method": method, "http.target": scope.get("path", "")}
+        with self.tracer.start_as_current_span(f"{method} {scope.get('path', '')}", attributes, parent=parent) as span:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(StatusCode.ERROR)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{method} {route.path}")
+                    span.set_attribute("http.route", route.path)
@@ -47,6 +47,9 @@ export const auth = {
   }
 };
 
+// Attachment metadata only; file bodies are downloaded on demand from the backend
+const ATTACHMENT_METADATA = 'id, ticket_id, reply_id, file_name, file_size, file_type, uploaded_by, created_at';
+
 // Database helper functions
 export const db = {
   // Profiles
@@ -141,11 +144,30 @@ export const db = {
     if (filters.assigned_to) {
       query = query.eq('assigned_to', filters.assigned_to);
     }
+    // Archived tickets live in separate partitions; leave them out unless asked for
+    if (!filters.include_archived) {
+      query = query.eq('archived', false);
+    }
 
     const { data, error } = await query;
     return { data, error };
   },
 
+  // Incremental ticket list: pass null for a full listing, then the previous next_cursor.
+  // Apply `removed`, upsert `tickets` by id, repeat while has_more; on `reset` start over with null.
+  syncTickets: async (cursor = null) => {
+    const { data: { session } } = await supabase.auth.getSession();
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/tickets/changes?${params}`, {
+      headers: { Authorization: `Bearer ${session?.access_token}` }
+    });
+    if (!response.ok) {
+      return { data: null, error: new Error(`Failed to sync tickets (${response.status})`) };
+    }
+    return { data: await response.json(), error: null };
+  },
+
   getTicket: async (ticketId) => {
     const { data, error } = await supabase
       .from('support_tickets')
@@ -157,9 +179,9 @@ export const db = {
         replies:ticket_replies(
           *,
           created_by_profile:profiles(full_name, email),
-          attachments:ticket_attachments(*)
+          attachments:ticket_attachments(${ATTACHMENT_METADATA})
         ),
-        attachments:ticket_attachments(*)
+        attachments:ticket_attachments(${ATTACHMENT_METADATA})
       `)
       .eq('id', ticketId)
       .single();
@@ -185,6 +207,24 @@ export const db = {
     return { data, error };
   },
 
+  // Admin: apply one operation ('assign', 'set_status', 'set_priority' or 'close') to many tickets,
+  // e.g. bulkUpdateTickets(ids, 'assign', { assigned_to: agentId })
+  bulkUpdateTickets: async (ticketIds, operation, values = {}) => {
+    const { data: { session } } = await supabase.auth.getSession();
+    const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/admin/tickets/bulk`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Authorization: `Bearer ${session?.access_token}`
+      },
+      body: JSON.stringify({ ticket_ids: ticketIds, operation, ...values })
+    });
+    if (!response.ok) {
+      return { data: null, error: new Error(`Bulk update failed (${response.status})`) };
+    }
+    return { data: await response.json(), error: null };
+  },
+
   // Ticket Replies
   getTicketReplies: async (ticketId) => {
     const { data, error } = await supabase
@@ -192,13 +232,39 @@ export const db = {
       .select(`
         *,
         created_by_profile:profiles(full_name, email),
-        attachments:ticket_attachments(*)
+        attachments:ticket_attachments(${ATTACHMENT_METADATA})
       `)
       .eq('ticket_id', ticketId)
       .order('created_at', { ascending: true });
     return { data, error };
   },
 
+  // Paginated thread from the backend: pass the previous page's next_cursor to continue
+  getTicketThread: async (ticketId, cursor = null) => {
+    const { data: { session } } = await supabase.auth.getSession();
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/tickets/${ticketId}/thread?${params}`, {
+      headers: { Authorization: `Bearer ${session?.access_token}` }
+    });
+    if (!response.ok) {
+      return { data: null, error: new Error(`Failed to load ticket thread (${response.status})`) };
+    }
+    return { data: await response.json(), error: null };
+  },
+
+  // Live ticket changes; returns a function that closes the stream. On 'resync' the caller should refetch.
+  subscribeToTicketEvents: async (onEvent, ticketId = null) => {
+    const { data: { session } } = await supabase.auth.getSession();
+    const params = new URLSearchParams({ access_token: session?.access_token || '' });
+    if (ticketId) params.set('ticket_id', ticketId);
+    const source = new EventSource(`${process.env.REACT_APP_BACKEND_URL}/api/tickets/events?${params}`);
+    ['ticket.created', 'ticket.updated', 'reply.created', 'resync'].forEach((type) => {
+      source.addEventListener(type, (message) => onEvent(JSON.parse(message.data)));
+    });
+    return () => source.close();
+  },
+
   createTicketReply: async (replyData) => {
     const { data, error } = await supabase
       .from('ticket_replies')
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from analytics import compute_sla
+
+HOUR = 3600.0
+
+
+def sample_tickets() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "company_id": ["acme", "acme", None],
+            "priority": ["high", "high", None],
+            "created_at": [0.0, 0.0, 0.0],
+            "done_at": [2 * HOUR, 4 * HOUR, np.nan],
+            "closed": [True, True, False],
+        }
+    )
+
+
+def by_group(results: list) -> dict:
+    return {(entry["company_id"], entry["priority"]): entry for entry in results}
+
+
+def test_compute_sla_per_group_and_overall():
+    # Replies: ticket 0 after 1h; ticket 1 after 3h and 2h (the earliest counts)
+    reply_ticket = np.array([0, 1, 1])
+    reply_at = np.array([1 * HOUR, 3 * HOUR, 2 * HOUR])
+    results = by_group(compute_sla(sample_tickets(), reply_ticket, reply_at, now=10 * HOUR))
+
+    assert set(results) == {("acme", "high"), (None, "medium"), ("*", "*")}
+
+    acme = results[("acme", "high")]
+    assert (acme["tickets"], acme["open"]) == (2, 0)
+    assert acme["first_reply_hours"]["p50"] == 1.5
+    assert acme["resolution_hours"]["p90"] == 3.8
+    assert acme["backlog_age_hours"] == {"p50": None, "p90": None, "p95": None}
+
+    unassigned = results[(None, "medium")]
+    assert (unassigned["tickets"], unassigned["open"]) == (1, 1)
+    assert unassigned["first_reply_hours"]["p50"] is None
+    assert unassigned["backlog_age_hours"]["p50"] == 10.0
+
+    overall = results[("*", "*")]
+    assert (overall["tickets"], overall["open"]) == (3, 1)
+    assert overall["resolution_hours"]["p50"] == 3.0
+
+
+def test_compute_sla_without_replies():
+    results = by_group(compute_sla(sample_tickets(), np.array([], dtype=int), np.array([]), now=10 * HOUR))
+    assert results[("*", "*")]["first_reply_hours"] == {"p50": None, "p90": None, "p95": None}
@@ -0,0 +1,96 @@
+from assignment import AssignmentEngine, LoadBalancer, Tracked
+
+
+def balancer_with(*agents) -> LoadBalancer:
+    balancer = LoadBalancer()
+    for agent, skills, load in agents:
+        balancer.add_agent(agent, skills, load)
+    return balancer
+
+
+def test_pick_least_loaded_agent():
+    balancer = balancer_with(("a", (), 3), ("b", (), 1), ("c", (), 2))
+    assert balancer.pick() == "b"
+    balancer.adjust("b", 5)
+    assert balancer.pick() == "c"
+
+
+def test_pick_breaks_ties_by_oldest_change():
+    balancer = balancer_with(("a", (), 0), ("b", (), 0), ("c", (), 0))
+    assert [balancer.assign() for _ in range(6)] == ["a", "b", "c", "a", "b", "c"]
+    assert balancer.load == {"a": 2, "b": 2, "c": 2}
+
+
+def test_pick_prefers_skilled_agents_and_generalists():
+    balancer = balancer_with(("billing", ["billing"], 2), ("generalist", (), 3), ("network", ["network"], 0))
+    # The network specialist is idle but does not take billing tickets
+    assert balancer.pick("billing") == "billing"
+    balancer.adjust("billing", 2)
+    assert balancer.pick("billing") == "generalist"
+    # Without a category only generalists are eligible
+    assert balancer.pick() == "generalist"
+
+
+def test_pick_falls_back_to_all_agents_when_nobody_takes_category():
+    balancer = balancer_with(("billing", ["billing"], 4), ("network", ["network"], 1))
+    assert balancer.pick("hardware") == "network"
+    assert LoadBalancer().pick("hardware") is None
+
+
+def test_removed_agent_is_never_picked():
+    balancer = balancer_with(("a", (), 0), ("b", (), 5))
+    balancer.remove_agent("a")
+    assert balancer.pick() == "b"
+    balancer.remove_agent("b")
+    assert balancer.pick() is None
+    assert len(balancer) == 0
+
+
+def test_set_skills_moves_agent_between_categories():
+    balancer = balancer_with(("a", (), 0), ("b", ["billing"], 2))
+    balancer.set_skills("a", ["network"])
+    assert balancer.pick("billing") == "b"
+    assert balancer.pick("network") == "a"
+
+
+def test_load_never_goes_negative():
+    balancer = balancer_with(("a", (), 0))
+    balancer.adjust("a", -1)
+    assert balancer.load["a"] == 0
+
+
+def engine_with(agents, tickets) -> AssignmentEngine:
+    engine = AssignmentEngine()
+    for agent, skills in agents:
+        engine.balancer.add_agent(agent, skills)
+    for ticket_id, ticket in tickets.items():
+        engine._track(ticket_id, ticket)
+    return engine
+
+
+def test_plan_rebalance_evens_out_open_tickets():
+    tickets = {f"t{i}": Tracked("busy", None, "open") for i in range(6)}
+    engine = engine_with([("busy", ()), ("idle", ())], tickets)
+
+    moves = engine.plan_rebalance()
+    assert len(moves) == 3
+    assert all(donor == "busy" and target == "idle" for _, donor, target in moves)
+    # Planning works on a copy; nothing moves until the plan is applied
+    assert engine.balancer.load == {"busy": 6, "idle": 0}
+
+
+def test_plan_rebalance_keeps_started_tickets_and_respects_skills():
+    tickets = {
+        **{f"started{i}": Tracked("busy", None, "in_progress") for i in range(4)},
+        "billing": Tracked("busy", "billing", "open"),
+        "network": Tracked("busy", "network", "open"),
+    }
+    engine = engine_with([("busy", ()), ("network-desk", ["network"])], tickets)
+
+    assert engine.plan_rebalance() == [("network", "busy", "network-desk")]
+
+
+def test_plan_rebalance_respects_max_moves():
+    tickets = {f"t{i}": Tracked("busy", None, "open") for i in range(10)}
+    engine = engine_with([("busy", ()), ("idle", ())], tickets)
+    assert len(engine.plan_rebalance(max_moves=2)) == 2
@@ -0,0 +1,80 @@
+from intake_filter import INTAKE_MAX_PER_SENDER, INTAKE_WINDOW_SECONDS, IntakeFilter
+
+
+def distinct_message(i: int) -> str:
+    return f"question {i} about migrating cluster {i * 7} to postgres version {i % 5 + 12} with minimal downtime please"
+
+
+def test_sender_over_limit_is_rejected():
+    intake = IntakeFilter()
+    for i in range(INTAKE_MAX_PER_SENDER):
+        verdict = intake.check("Sender@Example.com", distinct_message(i), now=float(i))
+        assert not verdict.rejected, verdict
+
+    verdict = intake.check("sender@example.com ", distinct_message(99), now=float(INTAKE_MAX_PER_SENDER))
+    assert verdict.rejected
+    assert verdict.reasons == ("sender_rate",)
+    assert verdict.sender_count == INTAKE_MAX_PER_SENDER + 1
+
+
+def test_sender_limit_resets_after_window():
+    intake = IntakeFilter()
+    for i in range(INTAKE_MAX_PER_SENDER):
+        intake.check("sender@example.com", distinct_message(i), now=float(i))
+
+    verdict = intake.check("sender@example.com", distinct_message(99), now=INTAKE_WINDOW_SECONDS + 10)
+    assert not verdict.rejected
+    assert verdict.sender_count == 1
+
+
+CAMPAIGN = (
+    "limited offer get premium database consulting at half price today only "
+    "visit our site and claim your discount before the offer ends"
+)
+
+
+def test_near_duplicates_flood_is_rejected():
+    intake = IntakeFilter()
+    verdicts = [
+        intake.check(f"bot{i}@spam.example", CAMPAIGN.replace("today", f"today {i}"), now=float(i)) for i in range(5)
+    ]
+    assert [v.near_duplicates for v in verdicts] == [0, 1, 2, 3, 4]
+    assert [v.rejected for v in verdicts] == [False, False, False, True, True]
+    assert verdicts[1].reasons == ("near_duplicate",)
+    assert verdicts[3].reasons == ("duplicate_flood",)
+
+
+def test_distinct_messages_are_not_near_duplicates():
+    intake = IntakeFilter()
+    for i in range(20):
+        verdict = intake.check(f"user{i}@example.com", distinct_message(i), now=float(i))
+        assert verdict.near_duplicates == 0
+        assert not verdict.rejected
+
+
+def test_short_and_empty_messages_skip_duplicate_check():
+    intake = IntakeFilter()
+    for i, message in enumerate(["", "call me back", "", "call me back", "", "call me back"] * 2):
+        verdict = intake.check(f"user{i}@example.com", message, now=float(i))
+        assert verdict.near_duplicates == 0
+        assert not verdict.rejected
+    assert len(intake) == 0
+
+
+def test_signatures_expire_with_window():
+    intake = IntakeFilter(window_seconds=60)
+    for i in range(3):
+        intake.check(f"bot{i}@spam.example", CAMPAIGN, now=float(i))
+    assert len(intake) == 3
+
+    verdict = intake.check("late@spam.example", CAMPAIGN, now=120.0)
+    assert verdict.near_duplicates == 0
+    assert len(intake) == 1
+
+
+def test_links_add_to_score():
+    intake = IntakeFilter()
+    message = distinct_message(1) + " http://a.example http://b.example www.c.example https://d.example"
+    verdict = intake.check("user@example.com", message, now=0.0)
+    assert verdict.reasons == ("links",)
+    assert not verdict.rejected
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+import load_shedding
+from load_shedding import Limiter
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_acquire_within_limit_and_release():
+    async def scenario():
+        limiter = Limiter("test", 2, 10)
+        assert await limiter.acquire(0)
+        assert await limiter.acquire(0)
+        assert limiter.in_flight == 2
+        limiter.release()
+        limiter.release()
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0
+    assert limiter.admitted == 2
+
+
+def test_sheds_when_full_without_waiting():
+    async def scenario():
+        limiter = Limiter("test", 1, 10)
+        await limiter.acquire(0)
+        return limiter, await limiter.acquire(0)
+
+    limiter, admitted = run(scenario())
+    assert not admitted
+    assert limiter.shed_queue_full == 1
+
+
+def test_sheds_when_queue_is_full():
+    async def scenario():
+        limiter = Limiter("test", 1, 1)
+        await limiter.acquire(0)
+        waiting = asyncio.ensure_future(limiter.acquire(5))
+        await asyncio.sleep(0)
+        shed = await limiter.acquire(5)
+        limiter.release()
+        return limiter, shed, await waiting
+
+    limiter, shed, handed_over = run(scenario())
+    assert not shed
+    assert handed_over
+    assert limiter.shed_queue_full == 1
+
+
+def test_sheds_after_queue_timeout():
+    async def scenario():
+        limiter = Limiter("test", 1, 10)
+        await limiter.acquire(0)
+        return limiter, await limiter.acquire(0.01)
+
+    limiter, admitted = run(scenario())
+    assert not admitted
+    assert limiter.shed_timeout == 1
+    assert limiter.queue_depth == 0
+    assert limiter.in_flight == 1
+
+
+def test_release_hands_slot_to_waiters_in_order():
+    async def scenario():
+        limiter = Limiter("test", 1, 10)
+        await limiter.acquire(0)
+        order = []
+
+        async def wait(name):
+            assert await limiter.acquire(5)
+            order.append(name)
+
+        waiters = [asyncio.ensure_future(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        limiter.release()
+        # A newcomer cannot take the slot that was handed to the queue
+        assert not await limiter.acquire(0)
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*waiters)
+        return limiter, order
+
+    limiter, order = run(scenario())
+    assert order == ["first", "second"]
+    assert limiter.in_flight == 1
+
+
+def test_keeps_slot_handed_over_as_wait_times_out(monkeypatch):
+    limiter = Limiter("test", 1, 10)
+
+    async def wait_for_that_times_out(future, timeout):
+        # The holder releases just as the deadline passes
+        limiter.release()
+        raise asyncio.TimeoutError
+
+    async def scenario():
+        await limiter.acquire(0)
+        monkeypatch.setattr(load_shedding.asyncio, "wait_for", wait_for_that_times_out)
+        return await limiter.acquire(0.01)
+
+    assert run(scenario())
+    assert limiter.in_flight == 1
+    assert limiter.shed_timeout == 0
+    assert limiter.queue_depth == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        limiter = Limiter("test", 1, 10)
+        await limiter.acquire(0)
+        waiter = asyncio.ensure_future(limiter.acquire(5))
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        depth = limiter.queue_depth
+        limiter.release()
+        return limiter, depth
+
+    limiter, depth = run(scenario())
+    assert depth == 0
+    assert limiter.in_flight == 0
+
+
+def test_cancel_after_hand_off_does_not_leak_slot():
+    async def scenario():
+        limiter = Limiter("test", 1, 10)
+        await limiter.acquire(0)
+        cancelled = asyncio.ensure_future(limiter.acquire(5))
+        next_in_line = asyncio.ensure_future(limiter.acquire(5))
+        await asyncio.sleep(0)
+        # Hand the slot to the first waiter, then cancel it before it resumes
+        limiter.release()
+        cancelled.cancel()
+        (outcome,) = await asyncio.gather(cancelled, return_exceptions=True)
+        if outcome is True:
+            # Python < 3.12 wait_for may swallow the cancel and keep the slot; the caller releases it
+            limiter.release()
+        else:
+            assert isinstance(outcome, asyncio.CancelledError)
+        return limiter, await next_in_line
+
+    limiter, admitted = run(scenario())
+    assert admitted
+    assert limiter.in_flight == 1
+    assert limiter.queue_depth == 0
@@ -0,0 +1,148 @@
+import asyncio
+import smtplib
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from mailer import MailRouter, Provider, SmtpTransport
+
+
+class RecordingHandler:
+    """Accepts every message unless ``rcpt_reply`` is set, in which case RCPT TO gets that reply."""
+
+    def __init__(self, rcpt_reply: str = None):
+        self.rcpt_reply = rcpt_reply
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.rcpt_reply:
+            return self.rcpt_reply
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+class StubTransport:
+    name = "stub"
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, params: dict) -> dict:
+        self.sent.append(params)
+        return {"id": f"stub-{len(self.sent)}"}
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(handler, port: int) -> Controller:
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = start_server(handler, free_port())
+    yield handler, controller
+    controller.stop()
+
+
+def email(i: int = 0) -> dict:
+    return {
+        "from": "onboarding@example.com",
+        "to": [f"student{i}@example.com"],
+        "subject": f"Joining instructions {i}",
+        "html": f"<p>Welcome {i}</p>",
+    }
+
+
+def transport_for(controller: Controller) -> SmtpTransport:
+    return SmtpTransport(controller.hostname, controller.port, starttls=False, pool_size=1)
+
+
+def test_smtp_reuses_connection(smtp_server):
+    handler, controller = smtp_server
+    transport = transport_for(controller)
+
+    async def send_all():
+        for i in range(5):
+            await transport.send(email(i))
+
+    try:
+        asyncio.run(send_all())
+    finally:
+        transport.close()
+    assert len(handler.messages) == 5
+    assert handler.messages[4].rcpt_tos == ["student4@example.com"]
+    assert transport.connections_opened == 1
+
+
+def test_smtp_reconnects_after_server_drops_connection():
+    port = free_port()
+    first, second = RecordingHandler(), RecordingHandler()
+    controller = start_server(first, port)
+    transport = SmtpTransport("127.0.0.1", port, starttls=False, pool_size=1)
+    try:
+        asyncio.run(transport.send(email(1)))
+        # Restarting the server closes the pooled connection under the transport
+        controller.stop()
+        controller = start_server(second, port)
+        asyncio.run(transport.send(email(2)))
+    finally:
+        transport.close()
+        controller.stop()
+    assert len(first.messages) == 1
+    assert len(second.messages) == 1
+    assert transport.connections_opened == 2
+
+
+def router_with_stub(controller: Controller) -> tuple:
+    smtp, stub = Provider(transport_for(controller), 1.0), Provider(StubTransport(), 0.0)
+    # A zero weight keeps the stub out of the weighted draw, so SMTP is always tried first
+    return MailRouter([smtp, stub]), smtp, stub
+
+
+def test_router_fails_over_on_temporary_smtp_refusal():
+    handler = RecordingHandler(rcpt_reply="450 Mailbox busy, try again later")
+    controller = start_server(handler, free_port())
+    router, smtp, stub = router_with_stub(controller)
+    try:
+        result = asyncio.run(router.send(email()))
+    finally:
+        router.close()
+        controller.stop()
+    assert result == {"id": "stub-1", "provider": "stub"}
+    assert router.failovers == 1
+    assert smtp.failed == 1
+    assert stub.transport.sent == [email()]
+
+
+def test_router_raises_permanent_smtp_refusal_without_failover():
+    handler = RecordingHandler(rcpt_reply="550 No such user")
+    controller = start_server(handler, free_port())
+    router, smtp, stub = router_with_stub(controller)
+    try:
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            asyncio.run(router.send(email()))
+    finally:
+        router.close()
+        controller.stop()
+    assert router.failovers == 0
+    assert smtp.failed == 0
+    assert stub.transport.sent == []
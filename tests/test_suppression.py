@@ -0,0 +1,23 @@
+from suppression import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    emails = [f"user{i}@example.com" for i in range(1000)]
+    for email in emails:
+        bloom.add(email)
+    assert all(email in bloom for email in emails)
+
+
+def test_bloom_filter_false_positive_rate_near_target():
+    bloom = BloomFilter(10_000, 0.01)
+    for i in range(10_000):
+        bloom.add(f"member{i}@example.com")
+    false_positives = sum(f"outsider{i}@example.com" in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.02
+
+
+def test_empty_bloom_filter_contains_nothing():
+    bloom = BloomFilter(0, 0.01)
+    assert bloom.capacity == 1
+    assert "anyone@example.com" not in bloom
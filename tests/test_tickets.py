@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from tickets import decode_cursor, decode_sync_cursor, encode_cursor, encode_sync_cursor
+
+CREATED_AT = datetime(2024, 5, 17, 9, 30, 12, 345678, tzinfo=timezone.utc)
+
+
+def test_reply_cursor_round_trip():
+    reply_id = uuid4()
+    cursor = encode_cursor(CREATED_AT, reply_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (CREATED_AT, reply_id)
+
+
+def test_reply_cursor_keeps_utc_offset():
+    created_at = CREATED_AT.astimezone(timezone(timedelta(hours=-5)))
+    decoded, _ = decode_cursor(encode_cursor(created_at, uuid4()))
+    assert decoded == CREATED_AT
+    assert decoded.utcoffset() == timedelta(hours=-5)
+
+
+def test_sync_cursor_round_trip():
+    ticket_id = uuid4()
+    removed_after = CREATED_AT - timedelta(days=1)
+    cursor = encode_sync_cursor(CREATED_AT, ticket_id, removed_after)
+    assert "=" not in cursor
+    assert decode_sync_cursor(cursor) == (CREATED_AT, ticket_id, removed_after)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "AAAA", encode_sync_cursor(CREATED_AT, uuid4(), CREATED_AT)])
+def test_invalid_reply_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", "NQ", encode_cursor(CREATED_AT, uuid4())])
+def test_invalid_sync_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_sync_cursor(cursor)
+    assert raised.value.status_code == 400